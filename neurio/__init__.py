@@ -14,10 +14,11 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import requests
 from base64 import b64encode
 import re
 
+from neurio.transport import RequestsTransport, get_transport
+
 try:
   from urllib import urlencode
 except ImportError:
@@ -35,15 +36,21 @@ class TokenProvider(object):
   __secret = None
   __token = None
 
-  def __init__(self, key, secret):
+  def __init__(self, key, secret, token=None, transport=None):
     """Handles token authentication for Neurio Client.
 
     Args:
       key (string): your Neurio API key
       secret (string): your Neurio API secret
+      token (string, optional): previously issued access token to reuse,
+        e.g. one shared with worker processes, instead of requesting a new one
+      transport (Transport or string, optional): HTTP backend, see
+        ``neurio.transport.get_transport`` (default: "requests")
     """
     self.__key = key
     self.__secret = secret
+    self.__token = token
+    self.__transport = transport
 
     if self.__key is None or self.__secret is None:
       raise ValueError("Key and secret must be set.")
@@ -72,7 +79,8 @@ class TokenProvider(object):
       "grant_type": "client_credentials"
     }
 
-    r = requests.post(url, data=payload, headers=headers)
+    r = get_transport(self.__transport).post(url, data=payload,
+                                             headers=headers)
 
     self.__token = r.json()["access_token"]
 
@@ -81,12 +89,22 @@ class TokenProvider(object):
 
 class Client(object):
   __token = None
+  __transport = None
+  __typed = False
 
-  def __init__(self, token_provider):
+  def __init__(self, token_provider, session=None, transport=None,
+               typed=False):
     """The Neurio API client.
 
     Args:
       token_provider (TokenProvider): object providing authentication services
+      session (requests.Session, optional): session used for API requests by
+        the default "requests" transport
+      transport (Transport or string, optional): HTTP backend, either a
+        ``neurio.transport.Transport`` or the name of one, "requests" or
+        "http2" (default: "requests")
+      typed (bool, optional): return ``neurio.models`` objects instead of
+        dictionaries (default: False)
     """
     if token_provider is None:
       raise ValueError("token_provider is required")
@@ -94,6 +112,10 @@ class Client(object):
       raise ValueError("token_provider must be instance of TokenProvider")
 
     self.__token = token_provider.get_token()
+    if transport is None and session is not None:
+      transport = RequestsTransport(session=session)
+    self.__transport = get_transport(transport)
+    self.__typed = typed
 
   def __gen_headers(self):
     """Utility method adding authentication token to requests."""
@@ -112,6 +134,14 @@ class Client(object):
 
     return urlunparse(url_parts)
 
+  def __decode(self, r, model):
+    """Utility method decoding a response, as the ``neurio.models`` class
+    named ``model`` if typed."""
+    if self.__typed:
+      from neurio import models
+      return models.decode(r.json(), getattr(models, model))
+    return r.json()
+
   def get_appliance(self, appliance_id):
     """Get the information for a specified appliance
 
@@ -126,8 +156,8 @@ class Client(object):
     headers = self.__gen_headers()
     headers["Content-Type"] = "application/json"
 
-    r = requests.get(url, headers=headers)
-    return r.json()
+    r = self.__transport.get(url, headers=headers)
+    return self.__decode(r, "Appliance")
 
   def get_appliances(self, location_id):
     """Get the appliances added for a specified location.
@@ -148,8 +178,8 @@ class Client(object):
     }
     url = self.__append_url_params(url, params)
 
-    r = requests.get(url, headers=headers)
-    return r.json()
+    r = self.__transport.get(url, headers=headers)
+    return self.__decode(r, "Appliance")
 
   def get_appliance_event_by_location(self, location_id, start, end, per_page=None, page=None, min_power=None):
     """Get appliance events by location Id.
@@ -189,8 +219,8 @@ class Client(object):
       params["page"] = page
     url = self.__append_url_params(url, params)
 
-    r = requests.get(url, headers=headers)
-    return r.json()
+    r = self.__transport.get(url, headers=headers)
+    return self.__decode(r, "ApplianceEvent")
 
   def get_appliance_event_after_time(self, location_id, since, per_page=None, page=None, min_power=None):
     """Get appliance events by location Id after defined time.
@@ -228,8 +258,8 @@ class Client(object):
       params["page"] = page
     url = self.__append_url_params(url, params)
 
-    r = requests.get(url, headers=headers)
-    return r.json()
+    r = self.__transport.get(url, headers=headers)
+    return self.__decode(r, "ApplianceEvent")
 
   def get_appliance_event_by_appliance(self, appliance_id, start, end, per_page=None, page=None, min_power=None):
     """Get appliance events by appliance Id.
@@ -269,8 +299,8 @@ class Client(object):
       params["page"] = page
     url = self.__append_url_params(url, params)
 
-    r = requests.get(url, headers=headers)
-    return r.json()
+    r = self.__transport.get(url, headers=headers)
+    return self.__decode(r, "ApplianceEvent")
 
   def get_appliance_stats_by_appliance(self, appliance_id, start, end, granularity=None, per_page=None, page=None,
                                       min_power=None):
@@ -326,7 +356,7 @@ class Client(object):
       params["page"] = page
     url = self.__append_url_params(url, params)
 
-    r = requests.get(url, headers=headers)
+    r = self.__transport.get(url, headers=headers)
     return r.json()
 
   def get_appliance_stats_by_location(self, location_id, start, end, granularity=None, per_page=None, page=None,
@@ -383,14 +413,16 @@ class Client(object):
       params["page"] = page
     url = self.__append_url_params(url, params)
 
-    r = requests.get(url, headers=headers)
+    r = self.__transport.get(url, headers=headers)
     return r.json()
 
   @staticmethod
   def get_local_current_sample(ip):
     """Gets current sample from *local* Neurio device IP address.
 
-    This is a static method. It doesn't require a token to authenticate.
+    This is a static method. It doesn't require a token to authenticate,
+    and uses only the standard library, keeping one connection open to the
+    device per thread.
 
     Note, call get_user_information to determine local Neurio IP addresses.
 
@@ -406,11 +438,8 @@ class Client(object):
     if not valid_ip_pat.match(ip):
       raise ValueError("ip address invalid")
 
-    url = "http://%s/current-sample" % (ip)
-    headers = { "Content-Type": "application/json" }
-
-    r = requests.get(url, headers=headers)
-    return r.json()
+    from neurio.local import get_current_sample
+    return get_current_sample(ip)
 
   def get_samples_live(self, sensor_id, last=None):
     """Get recent samples, one sample per second for up to the last 2 minutes.
@@ -433,8 +462,8 @@ class Client(object):
       params["last"] = last
     url = self.__append_url_params(url, params)
 
-    r = requests.get(url, headers=headers)
-    return r.json()
+    r = self.__transport.get(url, headers=headers)
+    return self.__decode(r, "Sample")
 
   def get_samples_live_last(self, sensor_id):
     """Get the last sample recorded by the sensor.
@@ -454,8 +483,8 @@ class Client(object):
     params = { "sensorId": sensor_id }
     url = self.__append_url_params(url, params)
 
-    r = requests.get(url, headers=headers)
-    return r.json()
+    r = self.__transport.get(url, headers=headers)
+    return self.__decode(r, "Sample")
 
   def get_samples(self, sensor_id, start, granularity, end=None,
                   frequency=None, per_page=None, page=None,
@@ -510,8 +539,8 @@ class Client(object):
       params["page"] = page
     url = self.__append_url_params(url, params)
 
-    r = requests.get(url, headers=headers)
-    return r.json()
+    r = self.__transport.get(url, headers=headers)
+    return self.__decode(r, "FullSample" if full else "Sample")
 
   def get_samples_stats(self, sensor_id, start, granularity, end=None,
                   frequency=None, per_page=None, page=None):
@@ -566,8 +595,8 @@ class Client(object):
       params["page"] = page
     url = self.__append_url_params(url, params)
 
-    r = requests.get(url, headers=headers)
-    return r.json()
+    r = self.__transport.get(url, headers=headers)
+    return self.__decode(r, "SampleStats")
 
   def get_user_information(self):
     """Gets the current user information, including sensor ID
@@ -583,5 +612,5 @@ class Client(object):
     headers = self.__gen_headers()
     headers["Content-Type"] = "application/json"
 
-    r = requests.get(url, headers=headers)
-    return r.json()
+    r = self.__transport.get(url, headers=headers)
+    return self.__decode(r, "UserInfo")
@@ -0,0 +1,148 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import calendar
+from datetime import datetime
+import re
+import time
+
+DAY = 86400
+
+# Widest window a single get_samples query may span, per granularity.
+MAX_RANGE = {
+  "minutes": DAY,
+  "hours": DAY,
+  "days": 28 * DAY,
+  "weeks": 182 * DAY,
+  "months": 365 * DAY,
+  "years": 3650 * DAY,
+}
+
+_iso_pat = re.compile(
+  r"^(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(\.\d+)?"
+  r"(Z|[+-]\d{2}:?\d{2})?$"
+)
+
+def parse_timestamp(value):
+  """Converts an ISO 8601 timestamp as returned by the Neurio API to seconds
+  since the epoch (UTC).
+
+  Args:
+    value (string): timestamp, e.g. ``2015-03-19T21:00:00.000Z``; numbers
+      are assumed to already be epoch seconds and are returned as-is
+
+  Returns:
+    float: seconds since the epoch
+  """
+  if isinstance(value, (int, float)):
+    return float(value)
+
+  m = _iso_pat.match(value)
+  if m is None:
+    raise ValueError("invalid timestamp: %r" % (value,))
+
+  fields = [int(g) for g in m.groups()[:6]]
+  seconds = float(calendar.timegm(fields))
+  if m.group(7):
+    seconds += float(m.group(7))
+
+  tz = m.group(8)
+  if tz and tz != "Z":
+    sign = -1 if tz[0] == "-" else 1
+    tz = tz[1:].replace(":", "")
+    seconds -= sign * (int(tz[:2]) * 3600 + int(tz[2:]) * 60)
+
+  return seconds
+
+def format_timestamp(seconds):
+  """Formats seconds since the epoch as an ISO 8601 UTC timestamp accepted by
+  the Neurio API, e.g. ``2015-03-19T21:00:00Z``."""
+  return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
+
+def _plain(value):
+  if hasattr(value, "to_dict"):
+    return as_dict(value)
+  if isinstance(value, list):
+    return [_plain(v) for v in value]
+  if isinstance(value, datetime):
+    return value.strftime("%Y-%m-%dT%H:%M:%S") + \
+      ".%03dZ" % (value.microsecond // 1000,)
+  return value
+
+def as_dict(obj):
+  """Returns a typed result (see ``neurio.models``) as a dictionary keyed by
+  API field names, with timestamps back in ISO 8601 so that it can be used
+  wherever a plain response is expected; anything else is returned as-is.
+  """
+  if isinstance(obj, dict) or not hasattr(obj, "to_dict"):
+    return obj
+  return dict((k, _plain(v)) for k, v in obj.to_dict().items())
+
+def split_range(start, end, width):
+  """Splits ``[start, end)``, in epoch seconds, into windows at most
+  ``width`` seconds wide (e.g. ``MAX_RANGE[granularity]``), with boundaries
+  counted from UTC midnight so that one-day windows are calendar days.
+
+  Returns:
+    list: ``(start, end)`` pairs, in epoch seconds
+  """
+  windows = []
+  window = start
+  while window < end:
+    window_end = min((window // DAY) * DAY + width, end)
+    windows.append((window, window_end))
+    window = window_end
+  return windows
+
+def normalize_local_sample(sample):
+  """Maps a sample from a *local* Neurio device onto the field names used by
+  the cloud samples API.
+
+  The local ``/current-sample`` endpoint reports per-channel readings with
+  energy in watt-seconds; the ``CONSUMPTION`` and ``GENERATION`` channels
+  carry the same quantities as the cloud ``consumption*``/``generation*``
+  fields.
+
+  Args:
+    sample (dict): as returned by ``Client.get_local_current_sample``; other
+      samples, including typed ones, are returned as dictionaries
+
+  Returns:
+    dict: sample with ``timestamp``, ``consumptionPower``,
+      ``consumptionEnergy``, ``generationPower`` and ``generationEnergy``
+      keys, plus the original ``channels`` list
+  """
+  sample = as_dict(sample)
+  if "channels" not in sample:
+    return sample
+
+  out = {
+    "timestamp": sample.get("timestamp"),
+    "consumptionPower": 0,
+    "consumptionEnergy": 0,
+    "generationPower": 0,
+    "generationEnergy": 0,
+    "channels": sample["channels"],
+  }
+  for channel in sample["channels"]:
+    if channel.get("type") == "CONSUMPTION":
+      out["consumptionPower"] = channel.get("p_W", 0)
+      out["consumptionEnergy"] = channel.get("eImp_Ws", 0)
+    elif channel.get("type") == "GENERATION":
+      out["generationPower"] = channel.get("p_W", 0)
+      out["generationEnergy"] = channel.get("eImp_Ws", 0)
+
+  return out
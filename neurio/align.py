@@ -0,0 +1,351 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Alignment of several sensors' samples onto a common time grid.
+
+Each sensor's value at a grid point is taken from its samples on either side
+of that point: power is held from the previous sample (``fill="previous"``)
+or linearly interpolated (``fill="linear"``), while cumulative energy
+counters, after undoing counter resets, are always interpolated linearly, so
+per-interval energy is the counter increase between consecutive grid points.
+A sensor has no value at a grid point outside its first and last sample, or
+where its surrounding samples are more than ``max_gap`` seconds apart.
+"""
+
+from collections import deque
+import heapq
+import math
+
+from neurio._samples import (parse_timestamp, format_timestamp,
+                             normalize_local_sample)
+
+FILLS = ("previous", "linear")
+
+
+class _Unwrap(object):
+  """Makes a cumulative counter monotonic across resets."""
+  def __init__(self):
+    self.last = None
+    self.offset = 0
+
+  def update(self, value):
+    if value is None:
+      value = 0
+    if self.last is not None and value < self.last:
+      self.offset += self.last
+    self.last = value
+    return value + self.offset
+
+
+def _points(samples):
+  """Yields ``(t, consumption, generation, c_counter, g_counter)``."""
+  c_counter = _Unwrap()
+  g_counter = _Unwrap()
+  for sample in samples:
+    sample = normalize_local_sample(sample)
+    yield (parse_timestamp(sample["timestamp"]),
+           sample.get("consumptionPower") or 0,
+           sample.get("generationPower") or 0,
+           c_counter.update(sample.get("consumptionEnergy")),
+           g_counter.update(sample.get("generationEnergy")))
+
+def _value_at(prev, cur, x, fill, max_gap):
+  """Interpolates a sensor at ``x``, with ``prev[0] <= x <= cur[0]``.
+
+  Returns ``(consumption, generation, c_counter, g_counter)`` or None.
+  """
+  if x == cur[0]:
+    return cur[1:]
+  if prev is None:
+    return None
+  if x == prev[0]:
+    return prev[1:]
+  span = cur[0] - prev[0]
+  if max_gap is not None and span > max_gap:
+    return None
+  f = (x - prev[0]) / span
+  c_counter = prev[3] + (cur[3] - prev[3]) * f
+  g_counter = prev[4] + (cur[4] - prev[4]) * f
+  if fill == "linear":
+    return (prev[1] + (cur[1] - prev[1]) * f,
+            prev[2] + (cur[2] - prev[2]) * f, c_counter, g_counter)
+  return prev[1], prev[2], c_counter, g_counter
+
+def _first_grid_point(t, step):
+  return math.ceil(t / step) * step
+
+
+class _Row(object):
+  __slots__ = ("x", "values")
+
+  def __init__(self, x):
+    self.x = x
+    self.values = {}
+
+
+def align_streams(series, step, start=None, end=None, fill="previous",
+                  max_gap=None, gap_value=None):
+  """Aligns sample iterators onto a grid, consuming them incrementally.
+
+  The iterators are merged in time order (a k-way merge), and each grid
+  point is yielded as soon as every sensor has a sample at or after it, so
+  arbitrarily long streams are aligned in bounded memory.
+
+  Args:
+    series (dict): sensor id to an iterable of samples in time order, e.g.
+      from ``get_samples`` or ``neurio.export.iter_pages``
+    step (float): grid spacing, in seconds
+    start (string or float, optional): first grid point (default: the
+      earliest sample, rounded up to a multiple of ``step``)
+    end (string or float, optional): last grid point (default: the latest
+      sample)
+    fill (string): "previous" or "linear" power filling
+    max_gap (float, optional): seconds between samples beyond which a
+      sensor is treated as missing
+    gap_value (float, optional): power reported for a missing sensor
+      (default: None, i.e. left out of the site totals)
+
+  Yields:
+    dict: ``timestamp``, site ``consumptionPower``, ``generationPower`` and
+      ``netPower``, site ``consumptionEnergy`` and ``generationEnergy`` since
+      the previous grid point, ``sensors`` (number of sensors with data) and
+      ``bySensor`` (per-sensor ``consumptionPower``/``generationPower``)
+  """
+  if fill not in FILLS:
+    raise ValueError("fill must be one of %s" % (", ".join(FILLS),))
+  keys = list(series)
+  lo = None if start is None else parse_timestamp(start)
+  hi = None if end is None else parse_timestamp(end)
+
+  def tagged(i, samples):
+    t = float("-inf")
+    for point in _points(samples):
+      t = point[0]
+      yield t, i, point
+    # Marks the stream as finished, right after its last sample.
+    yield t, i, None
+
+  merged = heapq.merge(*[tagged(i, series[k]) for i, k in enumerate(keys)])
+
+  prev = [None] * len(keys)
+  next_x = [None] * len(keys)
+  finished = [False] * len(keys)
+  rows = deque()
+  emitted = [0, None]  # number of rows yielded, previous row's counters
+
+  def row_at(x):
+    index = int(round((x - lo) / step))
+    while len(rows) + emitted[0] <= index:
+      rows.append(_Row(lo + (len(rows) + emitted[0]) * step))
+    return rows[index - emitted[0]]
+
+  def emit(upto):
+    while rows and rows[0].x < upto:
+      yield _finish(keys, rows.popleft(), emitted, gap_value)
+
+  for t, i, point in merged:
+    if point is None:
+      finished[i] = True
+    else:
+      if lo is None:
+        lo = _first_grid_point(t, step)
+      if next_x[i] is None:
+        next_x[i] = lo
+      x = next_x[i]
+      while x <= t and (hi is None or x <= hi):
+        if x >= t or prev[i] is not None:
+          value = _value_at(prev[i], point, x, fill, max_gap)
+        else:
+          value = None
+        row_at(x).values[i] = value
+        x += step
+      next_x[i] = x
+      prev[i] = point
+    # Every sensor still streaming has either resolved up to next_x, or not
+    # started yet and will resolve everything from its own first sample on;
+    # finished sensors have no value at later grid points.
+    waiting = [n for n, done in zip(next_x, finished) if not done]
+    if waiting and None not in waiting:
+      for row in emit(min(waiting)):
+        yield row
+
+  if lo is None:
+    return
+  last = hi
+  if last is None:
+    last = max(p[0] for p in prev if p is not None)
+  x = lo + (emitted[0] + len(rows)) * step
+  while x <= last:
+    row_at(x)
+    x += step
+  for row in emit(float("inf")):
+    yield row
+
+def _finish(keys, row, emitted, gap_value):
+  consumption = generation = 0
+  counters = {}
+  by_sensor = {}
+  sensors = 0
+  for i, key in enumerate(keys):
+    value = row.values.get(i)
+    if value is None:
+      by_sensor[key] = {"consumptionPower": gap_value,
+                        "generationPower": gap_value}
+      if gap_value is not None:
+        consumption += gap_value
+        generation += gap_value
+      continue
+    sensors += 1
+    consumption += value[0]
+    generation += value[1]
+    counters[i] = (value[2], value[3])
+    by_sensor[key] = {"consumptionPower": value[0],
+                      "generationPower": value[1]}
+
+  previous = emitted[1] or {}
+  c_energy = g_energy = 0.0
+  for i, (c, g) in counters.items():
+    if i in previous:
+      c_energy += c - previous[i][0]
+      g_energy += g - previous[i][1]
+  emitted[0] += 1
+  emitted[1] = counters
+
+  return {
+    "timestamp": format_timestamp(row.x),
+    "consumptionPower": consumption,
+    "generationPower": generation,
+    "netPower": consumption - generation,
+    "consumptionEnergy": c_energy,
+    "generationEnergy": g_energy,
+    "sensors": sensors,
+    "bySensor": by_sensor,
+  }
+
+def _columns_from_rows(rows, keys):
+  columns = {
+    "timestamp": [parse_timestamp(r["timestamp"]) for r in rows],
+    "bySensor": dict((k, {"consumptionPower": [], "generationPower": []})
+                     for k in keys),
+  }
+  for name in ("consumptionPower", "generationPower", "netPower",
+               "consumptionEnergy", "generationEnergy", "sensors"):
+    columns[name] = [r[name] for r in rows]
+  for r in rows:
+    for k in keys:
+      for name in ("consumptionPower", "generationPower"):
+        columns["bySensor"][k][name].append(r["bySensor"][k][name])
+  return columns
+
+def _align_numpy(numpy, series, step, start, end, fill, max_gap, gap_value):
+  keys = list(series)
+  data = {}
+  for k in keys:
+    points = list(_points(series[k]))
+    if points:
+      data[k] = numpy.array(points, dtype=float).T
+
+  if not data:
+    x = numpy.zeros(0)
+  else:
+    lo = parse_timestamp(start) if start is not None else \
+      _first_grid_point(min(d[0][0] for d in data.values()), step)
+    hi = parse_timestamp(end) if end is not None else \
+      max(d[0][-1] for d in data.values())
+    x = lo + step * numpy.arange(max(0, int(math.floor((hi - lo) / step)) + 1))
+
+  columns = {"timestamp": x, "bySensor": {}}
+  totals = numpy.zeros((2, len(x)))
+  energy = numpy.zeros((2, len(x)))
+  sensors = numpy.zeros(len(x), dtype=int)
+  for k in keys:
+    power = numpy.full((2, len(x)), numpy.nan)
+    if k in data:
+      t = data[k][0]
+      j = numpy.searchsorted(t, x, side="right") - 1
+      valid = (j >= 0) & (x <= t[-1])
+      j = numpy.clip(j, 0, len(t) - 1)
+      j1 = numpy.minimum(j + 1, len(t) - 1)
+      exact = valid & (t[j] == x)
+      span = t[j1] - t[j]
+      if max_gap is not None:
+        valid &= exact | (span <= max_gap)
+      f = numpy.where(span > 0, (x - t[j]) / numpy.where(span > 0, span, 1), 0)
+      f = numpy.where(exact, 0, f)
+
+      def interpolate(row):
+        return data[k][row][j] + (data[k][row][j1] - data[k][row][j]) * f
+
+      if fill == "linear":
+        values = numpy.vstack([interpolate(1), interpolate(2)])
+      else:
+        values = data[k][1:3, j]
+      power = numpy.where(valid, values, numpy.nan)
+      counters = numpy.where(valid, numpy.vstack([interpolate(3),
+                                                  interpolate(4)]), numpy.nan)
+      delta = numpy.zeros((2, len(x)))
+      if len(x) > 1:
+        delta[:, 1:] = numpy.nan_to_num(numpy.diff(counters, axis=1))
+      energy += delta
+      sensors += valid
+
+    has = ~numpy.isnan(power)
+    filled = power if gap_value is None else numpy.where(has, power,
+                                                         gap_value)
+    totals += numpy.nan_to_num(filled)
+    columns["bySensor"][k] = {
+      "consumptionPower": filled[0],
+      "generationPower": filled[1],
+    }
+
+  columns.update({
+    "consumptionPower": totals[0],
+    "generationPower": totals[1],
+    "netPower": totals[0] - totals[1],
+    "consumptionEnergy": energy[0],
+    "generationEnergy": energy[1],
+    "sensors": sensors,
+  })
+  return columns
+
+def align(series, step, start=None, end=None, fill="previous", max_gap=None,
+          gap_value=None):
+  """Aligns materialized sample lists onto a grid and returns columns.
+
+  Uses vectorized NumPy operations when NumPy is installed (columns are then
+  arrays, with NaN for missing per-sensor values); otherwise falls back to
+  ``align_streams`` (columns are lists, with None).
+
+  Args:
+    series (dict): sensor id to a list of samples in time order
+    step, start, end, fill, max_gap, gap_value: see ``align_streams``
+
+  Returns:
+    dict: ``timestamp`` (epoch seconds) and the site columns yielded by
+      ``align_streams``, plus ``bySensor``, mapping each sensor id to its
+      ``consumptionPower`` and ``generationPower`` columns
+  """
+  if fill not in FILLS:
+    raise ValueError("fill must be one of %s" % (", ".join(FILLS),))
+  try:
+    import numpy
+  except ImportError:
+    numpy = None
+  if numpy is not None:
+    return _align_numpy(numpy, series, step, start, end, fill, max_gap,
+                        gap_value)
+  rows = list(align_streams(series, step, start, end, fill, max_gap,
+                            gap_value))
+  return _columns_from_rows(rows, list(series))
@@ -0,0 +1,289 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from neurio import Client, TokenProvider
+from neurio.transport import get_transport
+from neurio._samples import (MAX_RANGE, parse_timestamp, format_timestamp,
+                             split_range)
+from neurio.export import iter_pages, open_writer, default_format
+
+MANIFEST = "manifest.jsonl"
+
+_client = None
+
+def _init_worker(key, secret, token, transport):
+  """Creates the per-process client, with its own pooled transport."""
+  global _client
+  tp = TokenProvider(key=key, secret=secret, token=token)
+  _client = Client(token_provider=tp, transport=get_transport(transport))
+
+def _unit_key(unit):
+  # Leaves out ``end``: a unit re-planned with a later end is the same unit
+  # (and file), downloaded again if it was recorded with an earlier one.
+  return "|".join([unit["sensor_id"], unit["start"], unit["granularity"],
+                   str(unit["frequency"]), str(unit["full"])])
+
+def _run_unit(unit):
+  """Downloads one (sensor, window) work unit into its own file."""
+  began = time.time()
+  directory = os.path.join(unit["root"], unit["sensor_id"])
+  if not os.path.isdir(directory):
+    try:
+      os.makedirs(directory)
+    except OSError:
+      if not os.path.isdir(directory):
+        raise
+  name = unit["start"].replace(":", "")
+  path = os.path.join(directory, "%s.%s" % (name, unit["format"]))
+  partial = path + ".partial"
+
+  writer = open_writer(partial, unit["format"], unit["chunk_size"])
+  rows = 0
+  try:
+    for sample in iter_pages(_client.get_samples, sensor_id=unit["sensor_id"],
+                             start=unit["start"], end=unit["end"],
+                             granularity=unit["granularity"],
+                             frequency=unit["frequency"], full=unit["full"]):
+      writer.write(sample)
+      rows += 1
+  finally:
+    writer.close()
+
+  if os.path.exists(partial):
+    os.rename(partial, path)
+  else:
+    path = None
+
+  return {
+    "key": _unit_key(unit),
+    "sensor_id": unit["sensor_id"],
+    "start": unit["start"],
+    "end": unit["end"],
+    "rows": rows,
+    "path": path,
+    "elapsed": time.time() - began,
+  }
+
+
+class Backfill(object):
+  def __init__(self, key, secret, root, processes=None, format=None,
+               chunk_size=10000, token=None, transport=None):
+    """Downloads historical samples for many sensors across a process pool.
+
+    Work is split into (sensor, time window) units no wider than the API
+    allows for the requested granularity. Each worker process has its own
+    pooled session and reuses a single access token fetched up front.
+    Completed units are appended to ``<root>/manifest.jsonl`` so that an
+    interrupted run skips them when restarted; a unit that now ends later
+    than recorded, e.g. today's in a daily run, is downloaded again.
+
+    Args:
+      key (string): your Neurio API key
+      secret (string): your Neurio API secret
+      root (string): output directory
+      processes (int, optional): worker processes (default: CPU count); with
+        1, units are run in the calling process
+      format (string, optional): "parquet", "arrow" or "csv"
+      chunk_size (int): rows per row group / CSV chunk
+      token (string, optional): access token to share with the workers
+      transport (string, optional): name of the HTTP backend each worker
+        uses, "requests" or "http2" (default: "requests")
+    """
+    self.key = key
+    self.secret = secret
+    self.root = root
+    self.processes = processes or multiprocessing.cpu_count()
+    self.format = format or default_format()
+    self.chunk_size = chunk_size
+    self.token = token
+    self.transport = transport
+    self.manifest = os.path.join(root, MANIFEST)
+
+  def plan(self, sensor_ids, start, end, granularity="minutes",
+           frequency=None, full=False):
+    """Splits a backfill into work units.
+
+    Windows are aligned to UTC midnight so minute and hour data lands in one
+    file per sensor and day.
+
+    Args:
+      sensor_ids (list): sensor ids to download
+      start (string): ISO 8601 start time
+      end (string): ISO 8601 stop time
+      granularity (string): see ``Client.get_samples``
+      frequency (string, optional): see ``Client.get_samples``
+      full (bool, optional): download full samples
+
+    Returns:
+      list: work unit dictionaries
+    """
+    if granularity not in MAX_RANGE:
+      raise ValueError("granularity must be one of %s" %
+                       (", ".join(sorted(MAX_RANGE)),))
+    step = MAX_RANGE[granularity]
+    first = parse_timestamp(start)
+    last = parse_timestamp(end)
+    if last <= first:
+      raise ValueError("end must be later than start")
+
+    units = []
+    for sensor_id in sensor_ids:
+      for window, window_end in split_range(first, last, step):
+        units.append({
+          "sensor_id": sensor_id,
+          "start": format_timestamp(window),
+          "end": format_timestamp(window_end),
+          "granularity": granularity,
+          "frequency": frequency,
+          "full": full,
+          "root": self.root,
+          "format": self.format,
+          "chunk_size": self.chunk_size,
+        })
+    return units
+
+  def completed(self):
+    """Returns the units recorded in the manifest, as a dict of unit key to
+    the latest end (epoch seconds) each was downloaded up to."""
+    done = {}
+    if not os.path.exists(self.manifest):
+      return done
+    with open(self.manifest) as f:
+      for line in f:
+        line = line.strip()
+        if line:
+          record = json.loads(line)
+          end = parse_timestamp(record["end"])
+          done[record["key"]] = max(end, done.get(record["key"], end))
+    return done
+
+  def run(self, units, progress=None):
+    """Runs work units not already in the manifest up to their end.
+
+    Args:
+      units (list): work units from ``plan``
+      progress (callable, optional): called with each unit's result and the
+        running summary as units complete
+
+    Returns:
+      dict: summary with ``units``, ``skipped``, ``rows``, ``elapsed``,
+        ``rows_per_second`` and ``units_per_second``
+    """
+    if not os.path.isdir(self.root):
+      os.makedirs(self.root)
+    done = self.completed()
+    pending = [u for u in units
+               if done.get(_unit_key(u), float("-inf")) <
+               parse_timestamp(u["end"])]
+
+    summary = {
+      "units": 0,
+      "skipped": len(units) - len(pending),
+      "rows": 0,
+      "elapsed": 0.0,
+      "rows_per_second": 0.0,
+      "units_per_second": 0.0,
+    }
+    if not pending:
+      return summary
+
+    token = self.token
+    if token is None:
+      token = TokenProvider(key=self.key, secret=self.secret,
+                            transport=self.transport).get_token()
+    init_args = (self.key, self.secret, token, self.transport)
+
+    began = time.time()
+    pool = None
+    if self.processes == 1:
+      _init_worker(*init_args)
+      results = (_run_unit(u) for u in pending)
+    else:
+      pool = multiprocessing.Pool(min(self.processes, len(pending)),
+                                  _init_worker, init_args)
+      results = pool.imap_unordered(_run_unit, pending)
+
+    try:
+      with open(self.manifest, "a") as manifest:
+        for result in results:
+          manifest.write(json.dumps(result, sort_keys=True) + "\n")
+          manifest.flush()
+          elapsed = time.time() - began
+          summary["units"] += 1
+          summary["rows"] += result["rows"]
+          summary["elapsed"] = elapsed
+          if elapsed > 0:
+            summary["rows_per_second"] = summary["rows"] / elapsed
+            summary["units_per_second"] = summary["units"] / elapsed
+          if progress is not None:
+            progress(result, summary)
+    finally:
+      if pool is not None:
+        pool.terminate()
+        pool.join()
+
+    return summary
+
+
+def _print_progress(result, summary):
+  sys.stderr.write("%s %s: %d rows (%d units, %.0f rows/s)\n" % (
+    result["sensor_id"], result["start"], result["rows"], summary["units"],
+    summary["rows_per_second"]))
+
+def add_arguments(parser):
+  """Adds the backfill options to an ``argparse`` parser."""
+  from neurio.cli import add_backfill_arguments
+  add_backfill_arguments(parser)
+
+def run_from_args(args):
+  """Runs a backfill described by parsed ``add_arguments`` options."""
+  backfill = Backfill(args.key, args.secret, args.output,
+                      processes=args.processes, format=args.format,
+                      transport=args.transport)
+  units = backfill.plan(args.sensors, args.start, args.end,
+                        granularity=args.granularity,
+                        frequency=args.frequency, full=args.full)
+  summary = backfill.run(units, progress=_print_progress)
+  sys.stderr.write(
+    "done: %d units (%d skipped), %d rows in %.1fs, %.0f rows/s\n" % (
+      summary["units"], summary["skipped"], summary["rows"],
+      summary["elapsed"], summary["rows_per_second"]))
+  return 0
+
+def main(argv=None):
+  """Entry point of the ``neurio-backfill`` console script."""
+  import argparse
+  parser = argparse.ArgumentParser(
+    prog="neurio-backfill",
+    description="Download historical Neurio samples for many sensors.")
+  parser.add_argument("--key", default=os.environ.get("NEURIO_KEY"),
+                      help="API key (default: $NEURIO_KEY)")
+  parser.add_argument("--secret", default=os.environ.get("NEURIO_SECRET"),
+                      help="API secret (default: $NEURIO_SECRET)")
+  add_arguments(parser)
+  args = parser.parse_args(argv)
+  if not args.key or not args.secret:
+    parser.error("--key and --secret (or NEURIO_KEY/NEURIO_SECRET) required")
+  return run_from_args(args)
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+The ``neurio`` command line tool.
+
+Subcommands import what they need when they run, so that ``neurio --help``
+and quick queries stay fast enough for shell loops and cron jobs.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+
+class NdjsonWriter(object):
+  """Writes one compact JSON document per line."""
+  def __init__(self, target):
+    self.__file = target
+
+  def write(self, row):
+    self.__file.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+  def flush(self):
+    self.__file.flush()
+
+  def close(self):
+    self.__file.flush()
+
+def _open_output(args):
+  if args.output_format == "csv":
+    from neurio.export import CsvWriter
+    return CsvWriter(sys.stdout)
+  return NdjsonWriter(sys.stdout)
+
+def _client(args):
+  if not args.key or not args.secret:
+    raise SystemExit("neurio: --key and --secret (or NEURIO_KEY and "
+                     "NEURIO_SECRET) are required")
+  import neurio
+  tp = neurio.TokenProvider(key=args.key, secret=args.secret)
+  return neurio.Client(token_provider=tp)
+
+def _iter_windows(fetch, args, **kwargs):
+  """Queries ``[start, end]`` in windows the API accepts for the
+  granularity, dropping points repeated on window boundaries."""
+  from neurio._samples import MAX_RANGE, parse_timestamp
+  from neurio.export import iter_pages, _windows
+  field = "start" if args.stats else "timestamp"
+  last = None
+  for start, end in _windows(args.start, args.end,
+                             MAX_RANGE[args.granularity]):
+    for sample in iter_pages(fetch, sensor_id=args.sensor, start=start,
+                             end=end, granularity=args.granularity,
+                             frequency=args.frequency, **kwargs):
+      ts = parse_timestamp(sample[field])
+      if last is None or ts > last:
+        last = ts
+        yield sample
+
+def _cmd_samples(args):
+  client = _client(args)
+  fetch = client.get_samples_stats if args.stats else client.get_samples
+  kwargs = {}
+  if not args.stats:
+    kwargs["full"] = args.full
+  out = _open_output(args)
+  if args.max_points:
+    from neurio.planner import plan_query
+    plan = plan_query(args.sensor, args.start, args.end or time.time(),
+                      args.max_points, stats=args.stats, full=args.full)
+    samples = plan.execute(client)
+  else:
+    samples = _iter_windows(fetch, args, **kwargs)
+  try:
+    for sample in samples:
+      out.write(sample)
+  except ValueError as e:
+    # iter_pages reports API errors, e.g. an unknown sensor
+    raise SystemExit("neurio: %s" % (e,))
+  finally:
+    out.close()
+  return 0
+
+def _cmd_live(args):
+  from neurio._samples import parse_timestamp
+  client = _client(args)
+  out = _open_output(args)
+  last = None
+  polls = 0
+  while True:
+    if last is None:
+      samples = client.get_samples_live(args.sensor)
+    else:
+      samples = client.get_samples_live(args.sensor, last=last)
+    if isinstance(samples, dict):
+      raise SystemExit("neurio: %s" % (samples.get("errors", samples),))
+    newest = parse_timestamp(last) if last else None
+    for sample in samples:
+      if newest is None or parse_timestamp(sample["timestamp"]) > newest:
+        out.write(sample)
+    if samples:
+      last = max(samples, key=lambda s: parse_timestamp(s["timestamp"]))
+      last = last["timestamp"]
+    out.flush()
+    polls += 1
+    if args.count and polls >= args.count:
+      break
+    time.sleep(args.interval)
+  out.close()
+  return 0
+
+def _cmd_local(args):
+  import neurio
+  from neurio._samples import normalize_local_sample
+  out = _open_output(args)
+  polls = 0
+  while True:
+    sample = neurio.Client.get_local_current_sample(args.ip)
+    if args.normalize:
+      sample = normalize_local_sample(sample)
+      sample.pop("channels", None)
+    out.write(sample)
+    out.flush()
+    polls += 1
+    if args.count and polls >= args.count:
+      break
+    time.sleep(args.interval)
+  out.close()
+  return 0
+
+def _cmd_export(args):
+  from neurio.export import export_samples
+  paths = export_samples(_client(args), args.sensors, args.start,
+                         args.granularity, args.directory, end=args.end,
+                         frequency=args.frequency, full=args.full,
+                         format=args.format)
+  for path in paths:
+    sys.stdout.write(path + "\n")
+  return 0
+
+def add_backfill_arguments(parser):
+  """Adds the ``neurio.backfill`` options to an ``argparse`` parser; they
+  are declared here so that building the parser does not import the
+  backfill machinery."""
+  from neurio._samples import MAX_RANGE
+  parser.add_argument("--sensor", dest="sensors", action="append",
+                      required=True, help="sensor id (may be repeated)")
+  parser.add_argument("--start", required=True, help="ISO 8601 start time")
+  parser.add_argument("--end", required=True, help="ISO 8601 stop time")
+  parser.add_argument("--granularity", default="minutes",
+                      choices=sorted(MAX_RANGE))
+  parser.add_argument("--frequency")
+  parser.add_argument("--full", action="store_true")
+  parser.add_argument("--format", choices=["parquet", "arrow", "csv"])
+  parser.add_argument("--processes", type=int)
+  parser.add_argument("--transport", choices=["requests", "http2"])
+  parser.add_argument("--output", required=True, help="output directory")
+
+def _cmd_backfill(args):
+  if not args.key or not args.secret:
+    raise SystemExit("neurio: --key and --secret (or NEURIO_KEY and "
+                     "NEURIO_SECRET) are required")
+  from neurio.backfill import run_from_args
+  return run_from_args(args)
+
+def _cmd_metrics(args):
+  from neurio.hub import Hub
+  from neurio.openmetrics import OpenMetricsServer
+  if not args.sensors and not args.ips:
+    raise SystemExit("neurio: at least one --sensor or --ip is required")
+  hub = Hub()
+  if args.sensors:
+    client = _client(args)
+    for sensor_id in args.sensors:
+      hub.add_sensor(sensor_id, client, args.interval)
+  for ip in args.ips or []:
+    hub.add_local(ip, args.interval)
+  server = OpenMetricsServer(hub, args.host, args.port, args.stale_after)
+  hub.start()
+  server.start()
+  sys.stderr.write("serving http://%s:%d/metrics\n" % server.address)
+  try:
+    while True:
+      time.sleep(3600)
+  finally:
+    server.stop()
+    hub.stop()
+
+GRANULARITIES = ["minutes", "hours", "days", "weeks", "months", "years"]
+
+def _add_query_arguments(parser):
+  parser.add_argument("--start", required=True, help="ISO 8601 start time")
+  parser.add_argument("--end", help="ISO 8601 stop time (default: now)")
+  parser.add_argument("--granularity", default="minutes",
+                      choices=GRANULARITIES)
+  parser.add_argument("--frequency")
+
+def build_parser():
+  """Returns the ``argparse`` parser for the ``neurio`` command."""
+  common = argparse.ArgumentParser(add_help=False)
+  common.add_argument("--key", default=os.environ.get("NEURIO_KEY"),
+                      help="API key (default: $NEURIO_KEY)")
+  common.add_argument("--secret", default=os.environ.get("NEURIO_SECRET"),
+                      help="API secret (default: $NEURIO_SECRET)")
+  common.add_argument("--output-format", choices=["ndjson", "csv"],
+                      default="ndjson", help="stdout format (default: ndjson)")
+
+  parser = argparse.ArgumentParser(
+    prog="neurio", description="Query Neurio energy sensors.")
+  commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+  commands.required = True
+
+  p = commands.add_parser("samples", parents=[common],
+                          help="print historical samples")
+  p.add_argument("--sensor", required=True)
+  _add_query_arguments(p)
+  p.add_argument("--full", action="store_true",
+                 help="include per-channel samples")
+  p.add_argument("--stats", action="store_true",
+                 help="print energy stats instead of samples")
+  p.add_argument("--max-points", type=int,
+                 help="choose granularity and frequency to return at most "
+                      "this many points")
+  p.set_defaults(func=_cmd_samples)
+
+  p = commands.add_parser("live", parents=[common],
+                          help="tail live samples")
+  p.add_argument("--sensor", required=True)
+  p.add_argument("--interval", type=float, default=5.0,
+                 help="seconds between polls (default: 5)")
+  p.add_argument("--count", type=int, help="stop after this many polls")
+  p.set_defaults(func=_cmd_live)
+
+  p = commands.add_parser("local", parents=[common],
+                          help="poll a sensor on the local network")
+  p.add_argument("--ip", required=True)
+  p.add_argument("--interval", type=float, default=1.0,
+                 help="seconds between polls (default: 1)")
+  p.add_argument("--count", type=int, help="stop after this many polls")
+  p.add_argument("--normalize", action="store_true",
+                 help="print cloud-style consumption/generation fields")
+  p.set_defaults(func=_cmd_local)
+
+  p = commands.add_parser("export", parents=[common],
+                          help="export samples to files by sensor and day")
+  p.add_argument("--sensor", dest="sensors", action="append", required=True,
+                 help="sensor id (may be repeated)")
+  _add_query_arguments(p)
+  p.add_argument("--full", action="store_true")
+  p.add_argument("--format", choices=["parquet", "arrow", "csv"])
+  p.add_argument("--directory", required=True, help="output directory")
+  p.set_defaults(func=_cmd_export)
+
+  p = commands.add_parser("metrics", parents=[common],
+                          help="serve readings to Prometheus")
+  p.add_argument("--sensor", dest="sensors", action="append",
+                 help="cloud sensor id (may be repeated)")
+  p.add_argument("--ip", dest="ips", action="append",
+                 help="local sensor address (may be repeated)")
+  p.add_argument("--interval", type=float, default=5.0,
+                 help="seconds between polls (default: 5)")
+  p.add_argument("--stale-after", type=float,
+                 help="seconds without a poll before readings are dropped "
+                      "(default: three intervals)")
+  p.add_argument("--host", default="127.0.0.1")
+  p.add_argument("--port", type=int, default=9500)
+  p.set_defaults(func=_cmd_metrics)
+
+  p = commands.add_parser("backfill", parents=[common],
+                          help="multi-process historical download")
+  add_backfill_arguments(p)
+  p.set_defaults(func=_cmd_backfill)
+
+  return parser
+
+def main(argv=None):
+  """Entry point of the ``neurio`` console script."""
+  args = build_parser().parse_args(argv)
+  try:
+    return args.func(args)
+  except KeyboardInterrupt:
+    return 130
+  except IOError as e:
+    # Quietly stop when piped into e.g. ``head``.
+    if getattr(e, "errno", None) == 32:
+      return 0
+    raise
+
+if __name__ == "__main__":
+  sys.exit(main())
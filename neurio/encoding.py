@@ -0,0 +1,353 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Compact encoding for series of samples.
+
+Samples are grouped into blocks. Within a block timestamps are stored as
+delta-of-deltas, cumulative energy counters as delta-of-deltas, and power
+values as deltas when they are whole numbers or as XOR of successive IEEE 754
+doubles otherwise; all integers are zigzag varints. Each block starts with
+an index header (sample count, time range and per-field min/max) that can be
+read without decoding the block.
+"""
+
+from bisect import bisect_left
+import struct
+
+from neurio._samples import parse_timestamp, format_timestamp
+
+FIELDS = ("consumptionPower", "generationPower",
+          "consumptionEnergy", "generationEnergy")
+
+# Fields encoded as delta-of-deltas rather than deltas.
+_COUNTERS = ("consumptionEnergy", "generationEnergy")
+
+MAGIC = b"NRTS1"
+
+
+def _zigzag(n):
+  return n * 2 if n >= 0 else -n * 2 - 1
+
+def _unzigzag(n):
+  return n // 2 if not n & 1 else -(n + 1) // 2
+
+def _put(out, n):
+  """Appends a signed integer as a zigzag varint."""
+  n = _zigzag(n)
+  while n >= 0x80:
+    out.append((n & 0x7f) | 0x80)
+    n >>= 7
+  out.append(n)
+
+def _put_unsigned(out, n):
+  while n >= 0x80:
+    out.append((n & 0x7f) | 0x80)
+    n >>= 7
+  out.append(n)
+
+def _get_unsigned(data, pos):
+  n = 0
+  shift = 0
+  while True:
+    b = data[pos]
+    pos += 1
+    n |= (b & 0x7f) << shift
+    if b < 0x80:
+      return n, pos
+    shift += 7
+
+def _get(data, pos):
+  n, pos = _get_unsigned(data, pos)
+  return _unzigzag(n), pos
+
+def _float_bits(value):
+  return struct.unpack("<Q", struct.pack("<d", value))[0]
+
+def _bits_float(bits):
+  return struct.unpack("<d", struct.pack("<Q", bits))[0]
+
+def _is_integral(values):
+  for v in values:
+    if isinstance(v, float) and not v.is_integer():
+      return False
+  return True
+
+def _encode_deltas(out, values, order):
+  prev = prev_delta = 0
+  for v in values:
+    delta = v - prev
+    _put(out, delta - prev_delta if order == 2 else delta)
+    prev = v
+    prev_delta = delta
+
+def _decode_deltas(data, pos, count, order):
+  values = []
+  prev = prev_delta = 0
+  for _ in range(count):
+    n, pos = _get(data, pos)
+    delta = n + prev_delta if order == 2 else n
+    prev += delta
+    prev_delta = delta
+    values.append(prev)
+  return values, pos
+
+def _encode_xor(out, values):
+  prev = 0
+  for v in values:
+    bits = _float_bits(v)
+    xor = bits ^ prev
+    prev = bits
+    # Successive readings tend to share high bits, and their low mantissa
+    # bits are often zero; store the trailing zero count, then what's left.
+    trailing = 0
+    if xor:
+      while not (xor >> trailing) & 1:
+        trailing += 1
+    out.append(trailing)
+    _put_unsigned(out, xor >> trailing)
+
+def _decode_xor(data, pos, count):
+  values = []
+  prev = 0
+  for _ in range(count):
+    trailing = data[pos]
+    xor, pos = _get_unsigned(data, pos + 1)
+    prev ^= xor << trailing
+    values.append(_bits_float(prev))
+  return values, pos
+
+def _format_ms(ms):
+  if ms % 1000 == 0:
+    return format_timestamp(ms // 1000)
+  return "%s.%03dZ" % (format_timestamp(ms // 1000)[:-1], ms % 1000)
+
+def _project(sample):
+  """Keeps what a block stores: the timestamp, as formatted by
+  ``decode_block``, and the fields in ``FIELDS``."""
+  ms = int(round(parse_timestamp(sample["timestamp"]) * 1000))
+  out = {"timestamp": _format_ms(ms)}
+  for field in FIELDS:
+    out[field] = sample.get(field) or 0
+  return out
+
+
+class BlockIndex(object):
+  """Header of an encoded block: ``count``, ``start`` and ``end`` (epoch
+  milliseconds) and ``stats``, a dict of ``(min, max)`` per field."""
+  __slots__ = ("count", "start", "end", "stats", "floats", "size")
+
+  def __init__(self, count, start, end, stats, floats, size=None):
+    self.count = count
+    self.start = start
+    self.end = end
+    self.stats = stats
+    self.floats = floats
+    self.size = size
+
+
+def _put_value(out, value, is_float):
+  if is_float:
+    out.extend(struct.pack("<d", value))
+  else:
+    _put(out, int(value))
+
+def _get_value(data, pos, is_float):
+  if is_float:
+    return struct.unpack("<d", bytes(data[pos:pos + 8]))[0], pos + 8
+  return _get(data, pos)
+
+def encode_block(samples):
+  """Encodes samples, oldest first, as one block.
+
+  Only ``timestamp`` and the fields in ``FIELDS`` are kept; missing values
+  are stored as 0.
+
+  Args:
+    samples (list): sample dictionaries, e.g. from ``Client.get_samples``
+
+  Returns:
+    bytes: the encoded block
+  """
+  if not samples:
+    raise ValueError("cannot encode an empty block")
+  times = [int(round(parse_timestamp(s["timestamp"]) * 1000))
+           for s in samples]
+  columns = [[s.get(f) or 0 for s in samples] for f in FIELDS]
+  floats = [not _is_integral(c) for c in columns]
+
+  out = bytearray()
+  _put_unsigned(out, len(samples))
+  _put_unsigned(out, sum(1 << i for i, f in enumerate(floats) if f))
+  _put(out, min(times))
+  _put(out, max(times))
+  for column, is_float in zip(columns, floats):
+    _put_value(out, min(column), is_float)
+    _put_value(out, max(column), is_float)
+
+  _encode_deltas(out, times, 2)
+  for field, column, is_float in zip(FIELDS, columns, floats):
+    if is_float:
+      _encode_xor(out, [float(v) for v in column])
+    else:
+      _encode_deltas(out, [int(v) for v in column],
+                     2 if field in _COUNTERS else 1)
+  return bytes(out)
+
+def _read_header(data, pos=0):
+  count, pos = _get_unsigned(data, pos)
+  flags, pos = _get_unsigned(data, pos)
+  floats = [bool(flags & (1 << i)) for i in range(len(FIELDS))]
+  start, pos = _get(data, pos)
+  end, pos = _get(data, pos)
+  stats = {}
+  for field, is_float in zip(FIELDS, floats):
+    lo, pos = _get_value(data, pos, is_float)
+    hi, pos = _get_value(data, pos, is_float)
+    stats[field] = (lo, hi)
+  return BlockIndex(count, start, end, stats, floats), pos
+
+def read_block_index(data):
+  """Reads a block's header without decoding its samples."""
+  index, _ = _read_header(bytearray(data))
+  index.size = len(data)
+  return index
+
+def decode_block(data):
+  """Decodes a block produced by ``encode_block``.
+
+  Returns:
+    list: sample dictionaries with an ISO 8601 ``timestamp`` and the fields
+      in ``FIELDS``
+  """
+  data = bytearray(data)
+  index, pos = _read_header(data)
+  times, pos = _decode_deltas(data, pos, index.count, 2)
+  columns = []
+  for field, is_float in zip(FIELDS, index.floats):
+    if is_float:
+      column, pos = _decode_xor(data, pos, index.count)
+    else:
+      column, pos = _decode_deltas(data, pos, index.count,
+                                   2 if field in _COUNTERS else 1)
+    columns.append(column)
+
+  samples = []
+  for i, ms in enumerate(times):
+    sample = {"timestamp": _format_ms(ms)}
+    for field, column in zip(FIELDS, columns):
+      sample[field] = column[i]
+    samples.append(sample)
+  return samples
+
+
+class SeriesStore(object):
+  def __init__(self, block_size=1024):
+    """Compressed, append-only in-memory series of samples for one sensor.
+
+    Appended samples are buffered until ``block_size`` of them can be
+    encoded into a block. Queries use the block headers to skip blocks
+    outside the requested time range, and the results can be passed
+    straight to ``neurio.export`` writers.
+
+    Args:
+      block_size (int): samples per encoded block
+    """
+    self.block_size = block_size
+    self.blocks = []
+    self.index = []
+    self.__pending = []
+
+  def __len__(self):
+    return sum(i.count for i in self.index) + len(self.__pending)
+
+  @property
+  def nbytes(self):
+    """Size of the encoded blocks, in bytes."""
+    return sum(len(b) for b in self.blocks)
+
+  def append(self, sample):
+    """Adds a sample; samples must be appended in time order. Only the
+    fields a block stores are kept, so queries return the same shape
+    whether or not a sample has been encoded yet."""
+    self.__pending.append(_project(sample))
+    if len(self.__pending) >= self.block_size:
+      self.flush()
+
+  def extend(self, samples):
+    for sample in samples:
+      self.append(sample)
+
+  def flush(self):
+    """Encodes any buffered samples into a (possibly short) block."""
+    if not self.__pending:
+      return
+    block = encode_block(self.__pending)
+    self.blocks.append(block)
+    self.index.append(read_block_index(block))
+    self.__pending = []
+
+  def query(self, start=None, end=None):
+    """Yields samples with ``start <= timestamp < end``.
+
+    Args:
+      start (string or float, optional): ISO 8601 time or epoch seconds
+      end (string or float, optional): ISO 8601 time or epoch seconds
+    """
+    lo = None if start is None else int(round(parse_timestamp(start) * 1000))
+    hi = None if end is None else int(round(parse_timestamp(end) * 1000))
+    first = 0
+    if lo is not None:
+      first = bisect_left([i.end for i in self.index], lo)
+    for block, index in zip(self.blocks[first:], self.index[first:]):
+      if hi is not None and index.start >= hi:
+        return
+      for sample in self.__filter(decode_block(block), lo, hi):
+        yield sample
+    for sample in self.__filter(self.__pending, lo, hi):
+      yield sample
+
+  @staticmethod
+  def __filter(samples, lo, hi):
+    for sample in samples:
+      ms = int(round(parse_timestamp(sample["timestamp"]) * 1000))
+      if (lo is None or ms >= lo) and (hi is None or ms < hi):
+        yield sample
+
+  def dumps(self):
+    """Serializes the store, flushing buffered samples first."""
+    self.flush()
+    out = bytearray(MAGIC)
+    _put_unsigned(out, len(self.blocks))
+    for block in self.blocks:
+      _put_unsigned(out, len(block))
+      out.extend(block)
+    return bytes(out)
+
+  @classmethod
+  def loads(cls, data, block_size=1024):
+    """Restores a store serialized by ``dumps``; only block headers are
+    read."""
+    data = bytearray(data)
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+      raise ValueError("not an encoded sample series")
+    store = cls(block_size)
+    count, pos = _get_unsigned(data, len(MAGIC))
+    for _ in range(count):
+      size, pos = _get_unsigned(data, pos)
+      block = bytes(data[pos:pos + size])
+      pos += size
+      store.blocks.append(block)
+      store.index.append(read_block_index(block))
+    return store
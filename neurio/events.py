@@ -0,0 +1,230 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Local on/off edge detection over 1 Hz power samples.
+
+Sample ``i`` is an edge when:
+
+  - power changed by at least ``threshold`` watts from sample ``i - 1``,
+  - the ``settle`` samples starting at ``i`` stay within ``tolerance`` watts
+    of each other (the new level is steady), and
+  - the mean of those samples differs by at least ``threshold`` from the
+    mean of the ``settle`` samples before ``i``.
+
+The edge's ``delta`` is the difference of those two means; positive deltas
+are "on" edges and negative ones "off". An edge is reported ``settle - 1``
+samples after it happens, i.e. immediately with ``settle=1``.
+"""
+
+from collections import deque
+
+from neurio._samples import as_dict, parse_timestamp
+
+
+def _edge(channel, timestamp, before, after):
+  delta = after - before
+  return {
+    "timestamp": timestamp,
+    "channel": channel,
+    "type": "on" if delta > 0 else "off",
+    "delta": delta,
+    "before": before,
+    "after": after,
+  }
+
+
+class _ChannelDetector(object):
+  def __init__(self, channel, threshold, settle, tolerance):
+    self.channel = channel
+    self.threshold = threshold
+    self.settle = settle
+    self.tolerance = tolerance
+    self.__window = deque(maxlen=2 * settle)
+
+  def update(self, timestamp, power):
+    window = self.__window
+    window.append((timestamp, power))
+    if len(window) < window.maxlen:
+      return None
+    values = [p for _, p in window]
+    before = values[:self.settle]
+    after = values[self.settle:]
+    if abs(after[0] - before[-1]) < self.threshold:
+      return None
+    if max(after) - min(after) > self.tolerance:
+      return None
+    mean_before = float(sum(before)) / self.settle
+    mean_after = float(sum(after)) / self.settle
+    if abs(mean_after - mean_before) < self.threshold:
+      return None
+    return _edge(self.channel, window[self.settle][0], mean_before, mean_after)
+
+
+class EdgeDetector(object):
+  def __init__(self, threshold=100, settle=2, tolerance=None):
+    """Detects appliance on/off edges in a stream of samples, per channel.
+
+    Samples from ``get_local_current_sample`` are checked on every channel
+    (by ``type``, e.g. ``PHASE_A_CONSUMPTION``); cloud samples from
+    ``get_samples_live`` only carry site totals, checked as the
+    ``consumptionPower`` and ``generationPower`` channels.
+
+    Args:
+      threshold (float): smallest power step, in watts (default: 100)
+      settle (int): samples the new level must hold (default: 2)
+      tolerance (float, optional): allowed spread of the new level, in watts
+        (default: half of ``threshold``)
+    """
+    if settle < 1:
+      raise ValueError("settle must be at least 1")
+    self.threshold = threshold
+    self.settle = settle
+    self.tolerance = threshold / 2.0 if tolerance is None else tolerance
+    self.__channels = {}
+
+  def __channel(self, name):
+    detector = self.__channels.get(name)
+    if detector is None:
+      detector = self.__channels[name] = _ChannelDetector(
+        name, self.threshold, self.settle, self.tolerance)
+    return detector
+
+  def update(self, sample):
+    """Feeds one sample and returns the edges it confirms.
+
+    Returns:
+      list: edge dictionaries with ``timestamp``, ``channel``, ``type`` ("on"
+        or "off"), ``delta``, ``before`` and ``after`` (mean power, watts)
+    """
+    sample = as_dict(sample)
+    timestamp = sample.get("timestamp")
+    if "channels" in sample:
+      readings = [(c.get("type") or str(c.get("ch")), c.get("p_W") or 0)
+                  for c in sample["channels"]]
+    else:
+      readings = [("consumptionPower", sample.get("consumptionPower") or 0),
+                  ("generationPower", sample.get("generationPower") or 0)]
+    edges = []
+    for name, power in readings:
+      edge = self.__channel(name).update(timestamp, power)
+      if edge is not None:
+        edges.append(edge)
+    return edges
+
+  def process(self, samples):
+    """Feeds an iterable of samples, yielding edges as they are confirmed."""
+    for sample in samples:
+      for edge in self.update(sample):
+        yield edge
+
+
+def detect_edges(timestamps, power, threshold=100, settle=2, tolerance=None,
+                 channel=None):
+  """Detects edges in a whole power series at once.
+
+  Vectorized with NumPy when it is installed; otherwise each value is fed
+  through the same logic as ``EdgeDetector``. Both give identical results.
+
+  Args:
+    timestamps (sequence): sample timestamps, reported with each edge
+    power (sequence): power, in watts, one value per timestamp
+    threshold, settle, tolerance: see ``EdgeDetector``
+    channel (string, optional): channel name reported with each edge
+
+  Returns:
+    list: edge dictionaries, see ``EdgeDetector.update``
+  """
+  if tolerance is None:
+    tolerance = threshold / 2.0
+  try:
+    import numpy
+  except ImportError:
+    numpy = None
+
+  if numpy is None or len(power) < 2 * settle:
+    detector = _ChannelDetector(channel, threshold, settle, tolerance)
+    edges = []
+    for timestamp, p in zip(timestamps, power):
+      edge = detector.update(timestamp, p)
+      if edge is not None:
+        edges.append(edge)
+    return edges
+
+  p = numpy.asarray(power, dtype=float)
+  n = len(p)
+  # Means and spreads of every run of `settle` samples; run k is p[k:k+settle].
+  runs = numpy.lib.stride_tricks.sliding_window_view(p, settle)
+  means = runs.mean(axis=1)
+  spread = runs.max(axis=1) - runs.min(axis=1)
+
+  i = numpy.arange(settle, n - settle + 1)
+  step = numpy.abs(p[i] - p[i - 1])
+  delta = means[i] - means[i - settle]
+  hits = i[(step >= threshold) & (spread[i] <= tolerance) &
+           (numpy.abs(delta) >= threshold)]
+  return [_edge(channel, timestamps[k], float(means[k - settle]),
+                float(means[k])) for k in hits]
+
+
+def match_events(edges, api_events, window=60):
+  """Compares detected edges with appliance events from the Neurio API, e.g.
+  from ``Client.get_appliance_event_by_location``.
+
+  An "on" edge matches an event starting within ``window`` seconds of it, an
+  "off" edge an event ending within ``window`` seconds; each event start and
+  end is matched at most once.
+
+  Args:
+    edges (list): edges from ``EdgeDetector`` or ``detect_edges``
+    api_events (list): appliance event dictionaries with ``start``/``end``
+    window (float): largest time difference for a match, in seconds
+
+  Returns:
+    dict: ``matched`` (list of ``(edge, event)`` pairs), ``unmatched_edges``,
+      ``unmatched_events`` (events with neither end matched), ``precision``
+      and ``recall``
+  """
+  boundaries = []
+  for n, event in enumerate(api_events):
+    for kind, field in (("on", "start"), ("off", "end")):
+      if event.get(field):
+        boundaries.append((kind, parse_timestamp(event[field]), n))
+
+  used = set()
+  matched = []
+  unmatched_edges = []
+  for edge in edges:
+    t = parse_timestamp(edge["timestamp"])
+    best = None
+    for b, (kind, bt, n) in enumerate(boundaries):
+      if kind != edge["type"] or b in used or abs(bt - t) > window:
+        continue
+      if best is None or abs(bt - t) < abs(boundaries[best][1] - t):
+        best = b
+    if best is None:
+      unmatched_edges.append(edge)
+    else:
+      used.add(best)
+      matched.append((edge, api_events[boundaries[best][2]]))
+
+  hit_events = set(boundaries[b][2] for b in used)
+  return {
+    "matched": matched,
+    "unmatched_edges": unmatched_edges,
+    "unmatched_events": [e for n, e in enumerate(api_events)
+                         if n not in hit_events],
+    "precision": float(len(matched)) / len(edges) if edges else None,
+    "recall": float(len(used)) / len(boundaries) if boundaries else None,
+  }
@@ -0,0 +1,364 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import csv
+import json
+import os
+import time
+
+from neurio._samples import (DAY, MAX_RANGE, as_dict, parse_timestamp,
+                             format_timestamp, split_range)
+
+pyarrow = None
+_pyarrow_checked = False
+
+FORMATS = ("parquet", "arrow", "csv")
+
+def _load_pyarrow():
+  """Imports pyarrow on first use, since it is optional and slow to import.
+
+  Returns:
+    module: ``pyarrow``, or None if it is not installed
+  """
+  global pyarrow, _pyarrow_checked
+  if not _pyarrow_checked:
+    _pyarrow_checked = True
+    try:
+      import pyarrow
+      import pyarrow.ipc
+      import pyarrow.parquet
+    except ImportError:
+      pyarrow = None
+  return pyarrow
+
+def default_format():
+  """Returns "parquet" when pyarrow is installed, otherwise "csv"."""
+  if _load_pyarrow() is not None:
+    return "parquet"
+  return "csv"
+
+def iter_pages(fetch, per_page=500, **kwargs):
+  """Iterates over every item of a paginated Neurio endpoint.
+
+  Pages are requested one at a time, so only a single page is held in memory.
+
+  Args:
+    fetch (callable): a ``Client`` method accepting ``per_page`` and ``page``
+      keyword arguments, e.g. ``client.get_samples``
+    per_page (int): results requested per page (max 500)
+    **kwargs: remaining arguments passed to ``fetch``
+
+  Yields:
+    dict: each result, in the order returned by the API; typed results
+      (``Client(typed=True)``) are converted to dictionaries
+  """
+  page = 1
+  while True:
+    results = fetch(per_page=per_page, page=page, **kwargs)
+    if isinstance(results, dict):
+      raise ValueError("request failed: %s" % (results.get("errors", results),))
+    for result in results:
+      yield as_dict(result)
+    if len(results) < per_page:
+      return
+    page += 1
+
+def _flatten(row):
+  """Encodes nested values (e.g. ``channelSamples``) as JSON strings so that
+  every column is a scalar."""
+  out = {}
+  for k, v in row.items():
+    if isinstance(v, (dict, list)):
+      v = json.dumps(v, sort_keys=True)
+    out[k] = v
+  return out
+
+
+class CsvWriter(object):
+  def __init__(self, target, chunk_size=10000, fieldnames=None):
+    """Writes dictionaries as CSV, in chunks of ``chunk_size`` rows.
+
+    Columns are taken from ``fieldnames`` or, failing that, from the keys of
+    the first chunk; keys not among them are dropped.
+
+    Args:
+      target (string or file): path or open text file to write to
+      chunk_size (int): rows buffered before they are written out
+      fieldnames (list, optional): column names
+    """
+    self.chunk_size = chunk_size
+    self.fieldnames = fieldnames
+    self.rows_written = 0
+    self.__owned = not hasattr(target, "write")
+    if self.__owned:
+      try:
+        target = open(target, "w", newline="")
+      except TypeError:
+        target = open(target, "wb")
+    self.__file = target
+    self.__writer = None
+    self.__buffer = []
+
+  def write(self, row):
+    self.__buffer.append(_flatten(row))
+    if len(self.__buffer) >= self.chunk_size:
+      self.flush()
+
+  def flush(self):
+    if not self.__buffer:
+      return
+    if self.__writer is None:
+      if self.fieldnames is None:
+        names = set()
+        for row in self.__buffer:
+          names.update(row)
+        self.fieldnames = sorted(names)
+      self.__writer = csv.DictWriter(self.__file, self.fieldnames,
+                                     extrasaction="ignore")
+      self.__writer.writeheader()
+    self.__writer.writerows(self.__buffer)
+    self.rows_written += len(self.__buffer)
+    self.__buffer = []
+    self.__file.flush()
+
+  def close(self):
+    self.flush()
+    if self.__owned:
+      self.__file.close()
+    else:
+      self.__file.flush()
+
+
+class ArrowWriter(object):
+  def __init__(self, target, format="parquet", chunk_size=10000):
+    """Writes dictionaries to a Parquet or Arrow IPC file, one row group
+    (or record batch) per ``chunk_size`` rows.
+
+    The schema is inferred from the first row group; later row groups are
+    cast to it.
+
+    Args:
+      target (string): path of the file to write
+      format (string): "parquet" or "arrow"
+      chunk_size (int): rows per row group
+    """
+    if _load_pyarrow() is None:
+      raise ImportError("pyarrow is required for %s export" % (format,))
+    if format not in ("parquet", "arrow"):
+      raise ValueError("format must be parquet or arrow")
+    self.format = format
+    self.chunk_size = chunk_size
+    self.rows_written = 0
+    self.__target = target
+    self.__writer = None
+    self.__schema = None
+    self.__buffer = []
+
+  def write(self, row):
+    self.__buffer.append(_flatten(row))
+    if len(self.__buffer) >= self.chunk_size:
+      self.flush()
+
+  def flush(self):
+    if not self.__buffer:
+      return
+    if self.__schema is None:
+      table = pyarrow.Table.from_pylist(self.__buffer)
+      self.__schema = table.schema
+      if self.format == "parquet":
+        self.__writer = pyarrow.parquet.ParquetWriter(self.__target,
+                                                      self.__schema)
+      else:
+        self.__writer = pyarrow.ipc.new_file(self.__target, self.__schema)
+    else:
+      table = pyarrow.Table.from_pylist(self.__buffer, schema=self.__schema)
+    self.__writer.write_table(table)
+    self.rows_written += len(self.__buffer)
+    self.__buffer = []
+
+  def close(self):
+    self.flush()
+    if self.__writer is not None:
+      self.__writer.close()
+
+
+def open_writer(target, format=None, chunk_size=10000):
+  """Returns a writer for ``format`` (default: see ``default_format``)."""
+  format = format or default_format()
+  if format not in FORMATS:
+    raise ValueError("format must be one of %s" % (", ".join(FORMATS),))
+  if format == "csv":
+    return CsvWriter(target, chunk_size=chunk_size)
+  return ArrowWriter(target, format=format, chunk_size=chunk_size)
+
+
+class PartitionedExporter(object):
+  def __init__(self, root, format=None, chunk_size=10000,
+               time_field="timestamp"):
+    """Writes rows into one file per key (e.g. sensor) and UTC day:
+    ``<root>/<key>/<YYYY-MM-DD>.<format>``.
+
+    Rows for a key must be in time order: when a row for a new day arrives,
+    that key's previous day is closed, so at most one file per key is open
+    and buffered at a time. A row for a day already closed raises
+    ValueError, since its file cannot be reopened without losing rows.
+
+    Args:
+      root (string): output directory
+      format (string, optional): "parquet", "arrow" or "csv"
+      chunk_size (int): rows per row group / CSV chunk
+      time_field (string): row field holding the ISO 8601 timestamp
+    """
+    self.root = root
+    self.format = format or default_format()
+    self.chunk_size = chunk_size
+    self.time_field = time_field
+    self.paths = []
+    self.__open = {}
+
+  def write(self, key, row):
+    day = time.strftime("%Y-%m-%d",
+                        time.gmtime(parse_timestamp(row[self.time_field])))
+    current = self.__open.get(key)
+    if current is not None and day < current[0]:
+      raise ValueError("rows for %s are out of order: %s after %s" %
+                       (key, day, current[0]))
+    if current is None or current[0] != day:
+      if current is not None:
+        current[1].close()
+      directory = os.path.join(self.root, str(key))
+      if not os.path.isdir(directory):
+        os.makedirs(directory)
+      path = os.path.join(directory, "%s.%s" % (day, self.format))
+      current = self.__open[key] = (day, open_writer(path, self.format,
+                                                     self.chunk_size))
+      self.paths.append(path)
+    current[1].write(row)
+
+  def write_all(self, key, rows):
+    """Writes every row of an iterable; returns the number written."""
+    n = 0
+    for row in rows:
+      self.write(key, row)
+      n += 1
+    return n
+
+  def close(self):
+    for day, writer in self.__open.values():
+      writer.close()
+    self.__open = {}
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+def export_samples(client, sensor_ids, start, granularity, root, end=None,
+                   frequency=None, full=False, format=None, chunk_size=10000):
+  """Streams ``get_samples`` results for one or more sensors to disk,
+  partitioned by sensor and day.
+
+  Args:
+    client (Client): authenticated Neurio client
+    sensor_ids (string or list): sensor id(s) to export
+    start (string): ISO 8601 start time; longer ranges than the API allows
+      per request for ``granularity`` are split into several requests
+    granularity (string): see ``Client.get_samples``
+    root (string): output directory
+    end (string, optional): ISO 8601 stop time (default: now)
+    frequency (string, optional): see ``Client.get_samples``
+    full (bool, optional): export full samples
+    format (string, optional): "parquet", "arrow" or "csv"
+    chunk_size (int): rows per row group / CSV chunk
+
+  Returns:
+    list: paths of the files written
+  """
+  if not isinstance(sensor_ids, (list, tuple)):
+    sensor_ids = [sensor_ids]
+  if granularity not in MAX_RANGE:
+    raise ValueError("granularity must be one of %s" %
+                     (", ".join(sorted(MAX_RANGE)),))
+  windows = _windows(start, end, MAX_RANGE[granularity])
+
+  def samples(sensor_id):
+    last = None
+    for window_start, window_end in windows:
+      for sample in iter_pages(client.get_samples, sensor_id=sensor_id,
+                               start=window_start, end=window_end,
+                               granularity=granularity, frequency=frequency,
+                               full=full):
+        # A sample on a window boundary may be returned by both windows.
+        ts = parse_timestamp(sample["timestamp"])
+        if last is None or ts > last:
+          last = ts
+          yield sample
+
+  with PartitionedExporter(root, format, chunk_size) as exporter:
+    for sensor_id in sensor_ids:
+      exporter.write_all(sensor_id, samples(sensor_id))
+  return exporter.paths
+
+def _windows(start, end, width):
+  """Splits a query range into formatted windows the API accepts."""
+  end = time.time() if end is None else parse_timestamp(end)
+  return [(format_timestamp(s), format_timestamp(e))
+          for s, e in split_range(parse_timestamp(start), end, width)]
+
+def export_appliance_events(client, location_id, start, end, root,
+                            min_power=None, format=None, chunk_size=10000):
+  """Streams ``get_appliance_event_by_location`` results to disk, partitioned
+  by location and day of each event's ``start``.
+
+  Args:
+    client (Client): authenticated Neurio client
+    location_id (string): location to export
+    start (string): ISO 8601 start time
+    end (string): ISO 8601 stop time; ranges over the API's limit of 1 day
+      are split into several requests
+    root (string): output directory
+    min_power (string, optional): see ``Client.get_appliance_event_by_location``
+    format (string, optional): "parquet", "arrow" or "csv"
+    chunk_size (int): rows per row group / CSV chunk
+
+  Returns:
+    list: paths of the files written
+  """
+  def events():
+    # Events spanning a window boundary are returned by consecutive windows,
+    # so only the previous window's ids are kept.
+    previous = set()
+    for window_start, window_end in _windows(start, end, DAY):
+      current = set()
+      for event in iter_pages(client.get_appliance_event_by_location,
+                              location_id=location_id, start=window_start,
+                              end=window_end, min_power=min_power):
+        event_id = event.get("id")
+        if event_id is not None:
+          if event_id in current:
+            continue
+          current.add(event_id)
+          if event_id in previous:
+            continue
+        yield event
+      previous = current
+
+  with PartitionedExporter(root, format, chunk_size,
+                           time_field="start") as exporter:
+    exporter.write_all(location_id, events())
+  return exporter.paths
@@ -0,0 +1,377 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import deque
+import json
+import threading
+import time
+
+try:
+  from http.server import BaseHTTPRequestHandler, HTTPServer
+  from socketserver import ThreadingMixIn
+except ImportError:
+  from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+  from SocketServer import ThreadingMixIn
+
+from neurio._samples import as_dict, parse_timestamp
+
+
+class Subscription(object):
+  """A subscriber's bounded queue of ``(key, sample)`` pairs.
+
+  Publishing never blocks: when the queue is full the oldest pair is
+  discarded (and counted in ``dropped``), so a slow consumer only loses its
+  own backlog and never stalls the poller.
+  """
+  def __init__(self, hub, key, maxsize):
+    self.key = key
+    self.maxsize = maxsize
+    self.dropped = 0
+    self.closed = False
+    self.__hub = hub
+    self.__items = deque()
+    self.__cond = threading.Condition()
+
+  def __len__(self):
+    return len(self.__items)
+
+  def _publish(self, key, sample):
+    with self.__cond:
+      if len(self.__items) >= self.maxsize:
+        self.__items.popleft()
+        self.dropped += 1
+      self.__items.append((key, sample))
+      self.__cond.notify()
+
+  def get(self, timeout=None):
+    """Returns the next ``(key, sample)`` pair, or None if ``timeout``
+    seconds pass or the subscription is closed first."""
+    with self.__cond:
+      if not self.__items and not self.closed:
+        self.__cond.wait(timeout)
+      if self.__items:
+        return self.__items.popleft()
+      return None
+
+  def __iter__(self):
+    while not self.closed:
+      item = self.get()
+      if item is not None:
+        yield item
+
+  def close(self):
+    """Unsubscribes; a blocked ``get`` returns None."""
+    self.__hub.unsubscribe(self)
+    with self.__cond:
+      self.closed = True
+      self.__cond.notify_all()
+
+
+class _Source(object):
+  """Polls one upstream (cloud sensor or local device) on its own thread."""
+  def __init__(self, hub, key, fetch, interval):
+    self.key = key
+    self.fetch = fetch
+    self.interval = interval
+    self.latest = None
+    self.updated = None
+    self.polls = 0
+    self.errors = 0
+    self.last_error = None
+    self.__hub = hub
+    self.__stop = threading.Event()
+    self.__thread = None
+
+  def poll(self):
+    try:
+      sample = self.fetch()
+    except Exception as e:
+      self.errors += 1
+      self.last_error = e
+      return
+    self.polls += 1
+    if isinstance(sample, list):
+      sample = sample[-1] if sample else None
+    sample = as_dict(sample)
+    if not isinstance(sample, dict) or "timestamp" not in sample:
+      self.errors += 1
+      self.last_error = ValueError("unexpected response: %r" % (sample,))
+      return
+    previous = self.latest
+    self.latest = sample
+    self.updated = time.time()
+    if previous is None or self.__is_new(previous, sample):
+      self.__hub._publish(self.key, sample)
+
+  @staticmethod
+  def __is_new(previous, sample):
+    try:
+      parse_timestamp(sample["timestamp"])
+    except (TypeError, ValueError):
+      # e.g. NOT_SYNCHRONIZED from a local device without a clock, which
+      # says nothing about whether the readings changed
+      return True
+    return previous.get("timestamp") != sample["timestamp"]
+
+  def __run(self):
+    while not self.__stop.is_set():
+      began = time.time()
+      self.poll()
+      self.__stop.wait(max(0, self.interval - (time.time() - began)))
+
+  def start(self):
+    self.__stop.clear()
+    self.__thread = threading.Thread(target=self.__run,
+                                     name="neurio-hub-%s" % (self.key,))
+    self.__thread.daemon = True
+    self.__thread.start()
+
+  def stop(self):
+    self.__stop.set()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+
+
+class Hub(object):
+  def __init__(self):
+    """Polls each upstream sensor once and republishes every new sample to
+    any number of subscribers.
+
+    Sources are either a cloud sensor polled with
+    ``Client.get_samples_live_last`` or a local device polled with
+    ``Client.get_local_current_sample``; only samples with a new timestamp
+    are published, or every sample while a device reports no valid time.
+    Use ``HubServer`` to make the stream available to other processes.
+    """
+    self.running = False
+    self.__sources = {}
+    self.__subscriptions = []
+    self.__lock = threading.Lock()
+
+  def add_sensor(self, sensor_id, client, interval=1.0):
+    """Polls a sensor through the Neurio cloud API.
+
+    Args:
+      sensor_id (string): hexadecimal id of the sensor
+      client (Client): authenticated client
+      interval (float): seconds between polls (default: 1)
+    """
+    return self.add_source(sensor_id,
+                           lambda: client.get_samples_live_last(sensor_id),
+                           interval)
+
+  def add_local(self, ip, interval=1.0):
+    """Polls a Neurio device on the local network.
+
+    Args:
+      ip (string): address of the local Neurio device
+      interval (float): seconds between polls (default: 1)
+    """
+    from neurio import Client
+    return self.add_source(ip, lambda: Client.get_local_current_sample(ip),
+                           interval)
+
+  def add_source(self, key, fetch, interval=1.0):
+    """Polls an arbitrary callable returning a sample dictionary.
+
+    Args:
+      key (string): name the samples are published under
+      fetch (callable): function of no arguments returning a sample
+      interval (float): seconds between polls
+    """
+    with self.__lock:
+      if key in self.__sources:
+        raise ValueError("source %r already added" % (key,))
+      source = self.__sources[key] = _Source(self, key, fetch, interval)
+    if self.running:
+      source.start()
+    return source
+
+  def remove_source(self, key):
+    with self.__lock:
+      source = self.__sources.pop(key, None)
+    if source is not None:
+      source.stop()
+
+  def keys(self):
+    return list(self.__sources)
+
+  def latest(self, key):
+    """Returns the most recent sample from a source, or None."""
+    source = self.__sources.get(key)
+    if source is None:
+      return None
+    return source.latest
+
+  def status(self):
+    """Returns poll counts and errors per source, with ``updated``, the
+    time (epoch seconds) of the last successful poll."""
+    return dict((key, {
+      "interval": s.interval,
+      "updated": s.updated,
+      "polls": s.polls,
+      "errors": s.errors,
+      "lastError": None if s.last_error is None else str(s.last_error),
+      "timestamp": None if s.latest is None else s.latest.get("timestamp"),
+    }) for key, s in list(self.__sources.items()))
+
+  def subscribe(self, key=None, maxsize=100):
+    """Subscribes to new samples.
+
+    Args:
+      key (string, optional): source to follow (default: all sources)
+      maxsize (int): samples buffered before the oldest is dropped
+
+    Returns:
+      Subscription: queue of ``(key, sample)`` pairs
+    """
+    subscription = Subscription(self, key, maxsize)
+    with self.__lock:
+      self.__subscriptions = self.__subscriptions + [subscription]
+    return subscription
+
+  def unsubscribe(self, subscription):
+    with self.__lock:
+      self.__subscriptions = [s for s in self.__subscriptions
+                              if s is not subscription]
+
+  def _publish(self, key, sample):
+    # The list is replaced, never mutated, so no lock is needed to iterate.
+    for subscription in self.__subscriptions:
+      if subscription.key is None or subscription.key == key:
+        subscription._publish(key, sample)
+
+  def start(self):
+    self.running = True
+    for source in list(self.__sources.values()):
+      source.start()
+    return self
+
+  def stop(self):
+    self.running = False
+    for source in list(self.__sources.values()):
+      source.stop()
+    for subscription in list(self.__subscriptions):
+      subscription.close()
+
+
+class _HubRequestHandler(BaseHTTPRequestHandler):
+  def log_message(self, format, *args):
+    pass
+
+  def __send_json(self, status, body):
+    data = json.dumps(body).encode()
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def do_GET(self):
+    hub = self.server.hub
+    parts = [p for p in self.path.split("?")[0].split("/") if p]
+    if parts == ["sensors"]:
+      return self.__send_json(200, hub.status())
+    if parts == ["events"]:
+      return self.__stream(None)
+    if len(parts) == 3 and parts[0] == "sensors" and parts[1] in hub.keys():
+      if parts[2] == "latest":
+        return self.__send_json(200, hub.latest(parts[1]))
+      if parts[2] == "events":
+        return self.__stream(parts[1])
+    self.__send_json(404, {"error": "not found"})
+
+  def __stream(self, key):
+    subscription = self.server.hub.subscribe(key, self.server.maxsize)
+    self.send_response(200)
+    self.send_header("Content-Type", "text/event-stream")
+    self.send_header("Cache-Control", "no-cache")
+    self.end_headers()
+    sequence = 0
+    try:
+      while not subscription.closed and self.server.serving:
+        item = subscription.get(timeout=self.server.keepalive)
+        if item is None:
+          self.wfile.write(b": keepalive\n\n")
+        else:
+          sequence += 1
+          data = dict(item[1], source=item[0])
+          self.wfile.write(("event: sample\nid: %d\ndata: %s\n\n" % (
+            sequence, json.dumps(data, separators=(",", ":")))).encode())
+        self.wfile.flush()
+    except (IOError, OSError):
+      pass
+    finally:
+      subscription.close()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+  daemon_threads = True
+
+
+class HubServer(object):
+  def __init__(self, hub, host="127.0.0.1", port=0, maxsize=100,
+               keepalive=15.0):
+    """Serves a ``Hub`` over HTTP.
+
+    Endpoints:
+      ``GET /sensors``: poll status per source
+      ``GET /sensors/<key>/latest``: most recent sample, as JSON
+      ``GET /sensors/<key>/events``: server-sent event stream of samples
+      ``GET /events``: server-sent event stream of samples from all sources
+
+    Each event is a sample with its source key added as ``source``; event
+    ids count the events sent on that stream.
+
+    Each event stream has its own bounded ``Subscription``, so a slow
+    client loses samples rather than delaying the poller or other clients.
+
+    Args:
+      hub (Hub): hub to serve
+      host (string): address to listen on (default: localhost only)
+      port (int): port to listen on (default: any free port)
+      maxsize (int): samples buffered per event stream
+      keepalive (float): seconds of silence before a keep-alive comment
+    """
+    self.hub = hub
+    self.__server = _ThreadingHTTPServer((host, port), _HubRequestHandler)
+    self.__server.hub = hub
+    self.__server.maxsize = maxsize
+    self.__server.keepalive = keepalive
+    self.__server.serving = False
+    self.__thread = None
+
+  @property
+  def address(self):
+    """The ``(host, port)`` the server is listening on."""
+    return self.__server.server_address
+
+  def start(self):
+    self.__server.serving = True
+    self.__thread = threading.Thread(target=self.__server.serve_forever,
+                                     name="neurio-hub-server")
+    self.__thread.daemon = True
+    self.__thread.start()
+    return self
+
+  def stop(self):
+    self.__server.serving = False
+    self.__server.shutdown()
+    self.__server.server_close()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
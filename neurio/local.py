@@ -0,0 +1,297 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from array import array
+from bisect import bisect_left
+import json
+import threading
+import time
+
+from neurio._samples import parse_timestamp
+
+CHANNEL_FIELDS = ("p_W", "q_VAR", "v_V", "eImp_Ws", "eExp_Ws")
+
+
+class SampleWindow(object):
+  """Zero-copy view of the most recent samples in a ``LocalSampleBuffer``.
+
+  Every accessor returns a ``memoryview`` (or NumPy array) over the buffer's
+  own storage. The poller keeps writing while a window is in use; call
+  ``is_valid`` after reading to confirm none of the viewed samples has been
+  overwritten in the meantime.
+  """
+  def __init__(self, buf, seq, start, count):
+    self.__buf = buf
+    self.__seq = seq
+    self.__start = start
+    self.count = count
+
+  def __len__(self):
+    return self.count
+
+  def is_valid(self):
+    """True if the viewed samples have not been overwritten since the
+    window was taken."""
+    return self.__buf._started <= self.__seq - self.count + self.__buf.capacity
+
+  @property
+  def timestamps(self):
+    """Sample times, as seconds since the epoch, oldest first."""
+    return self.__buf._view(None, None)[self.__start:self.__start + self.count]
+
+  def field(self, channel, name):
+    """Values of one field for one channel, oldest first.
+
+    Args:
+      channel (int or string): channel position in the sample's
+        ``channels`` list, or its ``type`` (e.g. ``CONSUMPTION``)
+      name (string): channel field, e.g. ``p_W``
+    """
+    view = self.__buf._view(channel, name)
+    return view[self.__start:self.__start + self.count]
+
+  def as_numpy(self, channel=None, name=None):
+    """Like ``timestamps``/``field``, as a NumPy array sharing memory with
+    the buffer. Requires NumPy."""
+    import numpy
+    if channel is None:
+      view = self.timestamps
+    else:
+      view = self.field(channel, name)
+    return numpy.frombuffer(view, dtype=numpy.float64)
+
+
+class LocalSampleBuffer(object):
+  def __init__(self, capacity, channels=None, fields=CHANNEL_FIELDS):
+    """Fixed-capacity ring buffer of local Neurio device samples.
+
+    Each (channel, field) pair is stored in its own preallocated array of
+    doubles, so writing a sample does not allocate. Every value is written
+    twice, at ``i`` and ``i + capacity``, which keeps the most recent samples
+    contiguous in memory; readers can therefore take zero-copy views without
+    locking out the writer.
+
+    A single writer is supported; any number of threads may read.
+
+    Args:
+      capacity (int): number of samples retained
+      channels (int, optional): number of channels per sample; when not
+        given, storage is allocated on the first write
+      fields (tuple): channel fields to retain
+    """
+    if capacity < 1:
+      raise ValueError("capacity must be at least 1")
+    self.capacity = capacity
+    self.fields = tuple(fields)
+    self.channel_types = None
+    self.sequence = 0
+    self._started = 0
+    self.__timestamps = array("d", [0.0]) * (2 * capacity)
+    self.__columns = None
+    self.__views = {(None, None): memoryview(self.__timestamps)}
+    if channels is not None:
+      self.__allocate(channels)
+
+  def __len__(self):
+    return min(self.sequence, self.capacity)
+
+  def __allocate(self, channels):
+    self.__columns = [
+      dict((f, array("d", [0.0]) * (2 * self.capacity)) for f in self.fields)
+      for _ in range(channels)
+    ]
+    for i, columns in enumerate(self.__columns):
+      for f, column in columns.items():
+        self.__views[(i, f)] = memoryview(column)
+
+  def _view(self, channel, name):
+    if channel is not None and not isinstance(channel, int):
+      try:
+        channel = self.channel_types.index(channel)
+      except (AttributeError, ValueError):
+        raise KeyError("unknown channel %r" % (channel,))
+    return self.__views[(channel, name)]
+
+  def write(self, sample):
+    """Copies a sample from ``Client.get_local_current_sample`` into the
+    buffer, overwriting the oldest sample once full.
+
+    The device reports ``NOT_SYNCHRONIZED`` as its timestamp until it has
+    synchronized its clock; the local time of the write is used instead.
+    """
+    channels = sample["channels"]
+    if self.__columns is None:
+      self.__allocate(len(channels))
+    if self.channel_types is None:
+      self.channel_types = [c.get("type") for c in channels]
+
+    try:
+      ts = parse_timestamp(sample["timestamp"])
+    except (KeyError, ValueError):
+      ts = time.time()
+
+    # Mark the write as begun before any slot is touched, so readers can tell
+    # whether their window may have been overwritten.
+    self._started = self.sequence + 1
+    i = self.sequence % self.capacity
+    j = i + self.capacity
+    self.__timestamps[i] = self.__timestamps[j] = ts
+    for columns, channel in zip(self.__columns, channels):
+      for f, column in columns.items():
+        column[i] = column[j] = channel.get(f, 0.0)
+
+    # Publish only after every field is written.
+    self.sequence += 1
+
+  def latest(self, count=None, seconds=None):
+    """Returns a ``SampleWindow`` over the most recent samples.
+
+    Args:
+      count (int, optional): number of samples (default: all retained)
+      seconds (float, optional): only samples within this many seconds of
+        the newest one
+    """
+    seq = self.sequence
+    n = min(seq, self.capacity)
+    if count is not None:
+      n = min(n, count)
+    start = (seq - n) % self.capacity
+    if seconds is not None and n:
+      ts = memoryview(self.__timestamps)[start:start + n]
+      skip = bisect_left(ts, ts[n - 1] - seconds)
+      start += skip
+      n -= skip
+    return SampleWindow(self, seq, start, n)
+
+
+class LocalPoller(object):
+  def __init__(self, ip, buf, interval=0.25, fetch=None):
+    """Polls a local Neurio device on a background thread and writes each
+    sample into a ``LocalSampleBuffer``.
+
+    Args:
+      ip (string): address of the local Neurio device
+      buf (LocalSampleBuffer): buffer to write into
+      interval (float): seconds between polls (default: 0.25)
+      fetch (callable, optional): function of ``ip`` returning a sample
+        (default: ``Client.get_local_current_sample``)
+    """
+    if fetch is None:
+      from neurio import Client
+      fetch = Client.get_local_current_sample
+    self.ip = ip
+    self.buffer = buf
+    self.interval = interval
+    self.errors = 0
+    self.last_error = None
+    self.__fetch = fetch
+    self.__stop = threading.Event()
+    self.__thread = None
+
+  def poll(self):
+    """Fetches and stores one sample; errors are counted, not raised."""
+    try:
+      self.buffer.write(self.__fetch(self.ip))
+    except Exception as e:
+      self.errors += 1
+      self.last_error = e
+
+  def __run(self):
+    next_poll = time.time()
+    while not self.__stop.is_set():
+      self.poll()
+      next_poll += self.interval
+      delay = next_poll - time.time()
+      if delay < 0:
+        next_poll = time.time()
+        delay = 0
+      self.__stop.wait(delay)
+
+  def start(self):
+    self.__stop.clear()
+    self.__thread = threading.Thread(target=self.__run,
+                                     name="neurio-local-%s" % (self.ip,))
+    self.__thread.daemon = True
+    self.__thread.start()
+    return self
+
+  def stop(self):
+    self.__stop.set()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+
+
+class LocalConnection(object):
+  def __init__(self, host, timeout=None):
+    """Keep-alive HTTP connection to a local Neurio device, using only the
+    standard library.
+
+    The connection is opened on the first request and reused afterwards; if
+    the device has closed it in the meantime, it is reopened once.
+
+    Args:
+      host (string): address of the device, optionally with ``:port``
+      timeout (float, optional): seconds to wait for a connection or for
+        response data (default: wait indefinitely)
+    """
+    self.host = host
+    self.timeout = timeout
+    self.__conn = None
+
+  def get(self, path):
+    """Sends a GET request and returns the decoded JSON response."""
+    try:
+      from http.client import HTTPConnection, HTTPException
+    except ImportError:
+      from httplib import HTTPConnection, HTTPException
+    import socket
+
+    headers = {"Content-Type": "application/json"}
+    for attempt in (0, 1):
+      reused = self.__conn is not None
+      if not reused:
+        self.__conn = HTTPConnection(self.host, timeout=self.timeout)
+      try:
+        self.__conn.request("GET", path, headers=headers)
+        body = self.__conn.getresponse().read()
+        break
+      except (HTTPException, socket.error):
+        self.close()
+        if not reused or attempt:
+          raise
+    return json.loads(body.decode("utf-8"))
+
+  def current_sample(self):
+    """Gets the current sample, see ``Client.get_local_current_sample``."""
+    return self.get("/current-sample")
+
+  def close(self):
+    if self.__conn is not None:
+      self.__conn.close()
+      self.__conn = None
+
+
+_connections = threading.local()
+
+def get_current_sample(ip):
+  """Gets the current sample from a local device over a connection kept
+  open per thread, so repeated polls skip the TCP handshake."""
+  pool = _connections.__dict__.setdefault("pool", {})
+  conn = pool.get(ip)
+  if conn is None:
+    conn = pool[ip] = LocalConnection(ip)
+  return conn.current_sample()
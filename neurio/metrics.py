@@ -0,0 +1,276 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import deque
+
+from neurio._samples import normalize_local_sample
+
+class RingBuffer(object):
+  """Fixed-capacity buffer of numbers that keeps a running sum.
+
+  Appending is O(1); once the buffer is full the oldest value is evicted.
+  """
+  def __init__(self, capacity):
+    """
+    Args:
+      capacity (int): maximum number of values held
+    """
+    if capacity < 1:
+      raise ValueError("capacity must be at least 1")
+    self.capacity = capacity
+    self.__values = [0.0] * capacity
+    self.__head = 0
+    self.__count = 0
+    self.__sum = 0.0
+    self.__writes = 0
+
+  def __len__(self):
+    return self.__count
+
+  def append(self, value):
+    """Adds a value, returning the evicted value or None."""
+    evicted = None
+    if self.__count == self.capacity:
+      evicted = self.__values[self.__head]
+      self.__sum -= evicted
+    else:
+      self.__count += 1
+    self.__values[self.__head] = value
+    self.__sum += value
+    self.__head = (self.__head + 1) % self.capacity
+
+    # Re-derive the sum once per lap so float error cannot accumulate.
+    self.__writes += 1
+    if self.__writes == self.capacity:
+      self.__writes = 0
+      self.__sum = float(sum(self.values()))
+
+    return evicted
+
+  @property
+  def sum(self):
+    return self.__sum
+
+  @property
+  def mean(self):
+    if self.__count == 0:
+      return None
+    return self.__sum / self.__count
+
+  def values(self):
+    """Returns the buffered values, oldest first."""
+    if self.__count < self.capacity:
+      return self.__values[:self.__count]
+    return self.__values[self.__head:] + self.__values[:self.__head]
+
+
+class SlidingMaximum(object):
+  """Maximum over the last ``capacity`` values in amortized O(1) per value."""
+  def __init__(self, capacity):
+    self.capacity = capacity
+    self.__index = 0
+    self.__candidates = deque()
+
+  def append(self, value, tag=None):
+    """Adds a value with an optional tag (e.g. its timestamp)."""
+    candidates = self.__candidates
+    while candidates and candidates[-1][1] <= value:
+      candidates.pop()
+    candidates.append((self.__index, value, tag))
+    if candidates[0][0] <= self.__index - self.capacity:
+      candidates.popleft()
+    self.__index += 1
+
+  @property
+  def maximum(self):
+    if not self.__candidates:
+      return None
+    return self.__candidates[0][1]
+
+  @property
+  def tag(self):
+    if not self.__candidates:
+      return None
+    return self.__candidates[0][2]
+
+
+class CounterDelta(object):
+  """Turns readings of a cumulative energy counter into per-sample deltas.
+
+  A reading lower than the previous one is treated as a counter reset (e.g.
+  a sensor reboot), in which case the new reading itself is the delta.
+  """
+  def __init__(self):
+    self.last = None
+    self.resets = 0
+
+  def update(self, value):
+    if value is None:
+      return 0
+    last, self.last = self.last, value
+    if last is None:
+      return 0
+    if value < last:
+      self.resets += 1
+      return value
+    return value - last
+
+
+class SlidingMetrics(object):
+  def __init__(self, window=60):
+    """Incrementally maintained metrics over the last ``window`` samples of
+    a single sample stream.
+
+    Each call to ``update`` costs O(1) regardless of the window size.
+
+    Args:
+      window (int): number of samples in the sliding window (default: 60,
+        i.e. one minute of live samples)
+    """
+    self.window = window
+    self.count = 0
+    self.__consumption = RingBuffer(window)
+    self.__generation = RingBuffer(window)
+    self.__net = RingBuffer(window)
+    self.__consumption_energy = RingBuffer(window)
+    self.__generation_energy = RingBuffer(window)
+    self.__consumption_counter = CounterDelta()
+    self.__generation_counter = CounterDelta()
+    self.__peak = SlidingMaximum(window)
+    self.__last = None
+
+  @property
+  def counter_resets(self):
+    """Number of cumulative energy counter resets observed."""
+    return self.__consumption_counter.resets + self.__generation_counter.resets
+
+  def update(self, sample):
+    """Feeds a sample into the window.
+
+    Args:
+      sample (dict): a sample as returned by ``get_samples_live``,
+        ``get_samples_live_last``, ``get_samples`` or
+        ``get_local_current_sample``
+
+    Returns:
+      dict: the current metrics, see ``snapshot``
+    """
+    sample = normalize_local_sample(sample)
+    consumption = sample.get("consumptionPower") or 0
+    generation = sample.get("generationPower") or 0
+    net = consumption - generation
+
+    self.__consumption.append(consumption)
+    self.__generation.append(generation)
+    self.__net.append(net)
+    self.__peak.append(consumption, sample.get("timestamp"))
+
+    consumption_delta = self.__consumption_counter.update(
+      sample.get("consumptionEnergy"))
+    generation_delta = self.__generation_counter.update(
+      sample.get("generationEnergy"))
+    self.__consumption_energy.append(consumption_delta)
+    self.__generation_energy.append(generation_delta)
+
+    self.count += 1
+    self.__last = {
+      "timestamp": sample.get("timestamp"),
+      "consumptionPower": consumption,
+      "generationPower": generation,
+      "netPower": net,
+      "consumptionEnergyDelta": consumption_delta,
+      "generationEnergyDelta": generation_delta,
+    }
+    return self.snapshot()
+
+  def snapshot(self):
+    """Returns the current metrics.
+
+    Returns:
+      dict: the latest ``timestamp``, ``consumptionPower``,
+        ``generationPower``, ``netPower`` (consumption minus generation) and
+        energy deltas since the previous sample, plus window aggregates
+        ``meanConsumptionPower``, ``meanGenerationPower``, ``meanNetPower``,
+        ``peakConsumptionPower``, ``peakTimestamp``,
+        ``windowConsumptionEnergy``, ``windowGenerationEnergy`` and
+        ``windowSize``; None if no sample has been seen yet
+    """
+    if self.__last is None:
+      return None
+
+    snapshot = dict(self.__last)
+    snapshot.update({
+      "meanConsumptionPower": self.__consumption.mean,
+      "meanGenerationPower": self.__generation.mean,
+      "meanNetPower": self.__net.mean,
+      "peakConsumptionPower": self.__peak.maximum,
+      "peakTimestamp": self.__peak.tag,
+      "windowConsumptionEnergy": self.__consumption_energy.sum,
+      "windowGenerationEnergy": self.__generation_energy.sum,
+      "windowSize": len(self.__consumption),
+    })
+    return snapshot
+
+
+class MetricsPipeline(object):
+  def __init__(self, window=60):
+    """Maintains ``SlidingMetrics`` for any number of sample streams, keyed
+    by sensor id.
+
+    Args:
+      window (int): number of samples in each sliding window
+    """
+    self.window = window
+    self.__streams = {}
+
+  def __contains__(self, sensor_id):
+    return sensor_id in self.__streams
+
+  def __len__(self):
+    return len(self.__streams)
+
+  def update(self, sensor_id, sample):
+    """Feeds one sample for a sensor and returns its current metrics."""
+    metrics = self.__streams.get(sensor_id)
+    if metrics is None:
+      metrics = self.__streams[sensor_id] = SlidingMetrics(self.window)
+    return metrics.update(sample)
+
+  def process(self, sensor_id, samples):
+    """Feeds an iterable of samples for a sensor, yielding the metrics after
+    each one.
+
+    Args:
+      sensor_id (string): id of the sensor the samples belong to
+      samples (iterable): samples, oldest first, e.g. the result of
+        ``get_samples_live``
+
+    Yields:
+      dict: metrics, see ``SlidingMetrics.snapshot``
+    """
+    for sample in samples:
+      yield self.update(sensor_id, sample)
+
+  def snapshot(self, sensor_id):
+    """Returns the current metrics for a sensor, or None if unknown."""
+    metrics = self.__streams.get(sensor_id)
+    if metrics is None:
+      return None
+    return metrics.snapshot()
+
+  def remove(self, sensor_id):
+    """Stops tracking a sensor."""
+    self.__streams.pop(sensor_id, None)
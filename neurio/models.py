@@ -0,0 +1,214 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Typed results, returned by ``Client`` when created with ``typed=True``.
+
+Each class keeps the fields it knows in ``__slots__`` instead of the response
+dictionary, and converts a field (e.g. an ISO 8601 string to a ``datetime``)
+only the first time it is read, caching the result.
+"""
+
+from datetime import datetime, timedelta
+
+from neurio._samples import parse_timestamp
+
+try:
+  from datetime import timezone
+  _UTC = timezone.utc
+except ImportError:
+  _UTC = None
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=_UTC)
+
+def to_datetime(value):
+  """Converts an API timestamp to a ``datetime`` in UTC."""
+  return _EPOCH + timedelta(seconds=parse_timestamp(value))
+
+
+class Field(object):
+  """A lazily converted model attribute.
+
+  Args:
+    key (string): name of the field in the API response
+    convert (callable, optional): applied to the raw value on first access;
+      None values are never converted
+  """
+  def __init__(self, key, convert=None):
+    self.key = key
+    self.convert = convert
+    self.slot = None
+    self.bit = 0
+
+  def __get__(self, obj, owner=None):
+    if obj is None:
+      return self
+    value = getattr(obj, self.slot)
+    if self.convert is None or obj._decoded & self.bit:
+      return value
+    if value is not None:
+      value = self.convert(value)
+      setattr(obj, self.slot, value)
+    obj._decoded |= self.bit
+    return value
+
+
+class _ModelType(type):
+  """Gives every ``Field`` of a model its own slot."""
+  def __new__(mcs, name, bases, namespace):
+    fields = []
+    for base in bases:
+      fields.extend(getattr(base, "_fields", ()))
+    slots = list(namespace.get("__slots__", ()))
+    for attr in sorted(namespace):
+      value = namespace[attr]
+      if isinstance(value, Field):
+        value.slot = "_" + attr
+        value.bit = 1 << len(fields)
+        slots.append(value.slot)
+        fields.append(value)
+    namespace["__slots__"] = tuple(slots)
+    namespace["_fields"] = tuple(fields)
+    return type.__new__(mcs, name, bases, namespace)
+
+
+class _ModelBase(object):
+  __slots__ = ("_decoded",)
+  _fields = ()
+
+  def __init__(self, data):
+    """
+    Args:
+      data (dict): one object from an API response
+    """
+    self._decoded = 0
+    get = data.get
+    for field in self._fields:
+      setattr(self, field.slot, get(field.key))
+
+  def __repr__(self):
+    return "<%s %s>" % (type(self).__name__, " ".join(
+      "%s=%r" % (f.slot[1:], getattr(self, f.slot)) for f in self._fields
+      if getattr(self, f.slot) is not None))
+
+  def __eq__(self, other):
+    if type(self) is not type(other):
+      return NotImplemented
+    return all(f.__get__(self) == f.__get__(other) for f in self._fields)
+
+  def __ne__(self, other):
+    result = self.__eq__(other)
+    return result if result is NotImplemented else not result
+
+  __hash__ = None
+
+  def to_dict(self):
+    """Returns the fields under their API names, converted."""
+    return dict((f.key, f.__get__(self)) for f in self._fields)
+
+  @classmethod
+  def from_list(cls, items):
+    return [cls(item) for item in items]
+
+
+Model = _ModelType("Model", (_ModelBase,), {
+  "__slots__": (),
+  "__doc__": "Base class of typed API results.",
+})
+
+
+class Sample(Model):
+  """A sample from ``get_samples``, ``get_samples_live`` or
+  ``get_samples_live_last``; power in watts, energy in watt-seconds."""
+  timestamp = Field("timestamp", to_datetime)
+  consumption_power = Field("consumptionPower", float)
+  consumption_energy = Field("consumptionEnergy", float)
+  generation_power = Field("generationPower", float)
+  generation_energy = Field("generationEnergy", float)
+
+
+class ChannelSample(Model):
+  """One channel of a ``FullSample``."""
+  channel = Field("channel", int)
+  channel_type = Field("channelType")
+  power = Field("power", float)
+  reactive_power = Field("reactivePower", float)
+  voltage = Field("voltage", float)
+  energy_imported = Field("energyImported", float)
+  energy_exported = Field("energyExported", float)
+
+
+class FullSample(Sample):
+  """A sample from ``get_samples(..., full=True)``."""
+  channel_samples = Field("channelSamples", ChannelSample.from_list)
+
+
+class SampleStats(Model):
+  """An interval from ``get_samples_stats``; energy in watt-seconds."""
+  start = Field("start", to_datetime)
+  end = Field("end", to_datetime)
+  consumption_energy = Field("consumptionEnergy", float)
+  generation_energy = Field("generationEnergy", float)
+  imported_energy = Field("importedEnergy", float)
+  exported_energy = Field("exportedEnergy", float)
+
+
+class Appliance(Model):
+  """An appliance from ``get_appliance`` or ``get_appliances``."""
+  id = Field("id")
+  name = Field("name")
+  label = Field("label")
+  tags = Field("tags")
+  location_id = Field("locationId")
+  created_at = Field("createdAt", to_datetime)
+  updated_at = Field("updatedAt", to_datetime)
+
+
+class ApplianceEvent(Model):
+  """An event from the ``get_appliance_event_*`` methods."""
+  id = Field("id")
+  appliance = Field("appliance", Appliance)
+  status = Field("status")
+  start = Field("start", to_datetime)
+  end = Field("end", to_datetime)
+  energy = Field("energy", float)
+  average_power = Field("averagePower", float)
+  cycle_count = Field("cycleCount", int)
+  is_running = Field("isRunning", bool)
+  created_at = Field("createdAt", to_datetime)
+  updated_at = Field("updatedAt", to_datetime)
+
+
+class UserInfo(Model):
+  """The current user, from ``get_user_information``. ``locations`` is
+  left as returned by the API."""
+  id = Field("id")
+  name = Field("name")
+  email = Field("email")
+  status = Field("status")
+  created_at = Field("createdAt", to_datetime)
+  locations = Field("locations")
+
+
+def decode(data, model):
+  """Wraps an API response in ``model``.
+
+  Lists become lists of ``model`` and dictionaries a single ``model``;
+  error responses (dictionaries with ``errors``) are returned unchanged.
+  """
+  if isinstance(data, list):
+    return [model(item) for item in data]
+  if isinstance(data, dict) and "errors" not in data:
+    return model(data)
+  return data
@@ -0,0 +1,262 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+OpenMetrics (Prometheus) exposition of the samples polled by a ``Hub``.
+
+Scrapes never reach the Neurio API or a device: they are answered from the
+latest sample of each hub source, so any number of scrapers cost one
+upstream poll per source and interval.
+"""
+
+import threading
+import time
+
+try:
+  from http.server import BaseHTTPRequestHandler, HTTPServer
+  from socketserver import ThreadingMixIn
+except ImportError:
+  from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+  from SocketServer import ThreadingMixIn
+
+from neurio._samples import parse_timestamp
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Metric families: name, type, unit and help. Counter samples are exposed
+# with a _total suffix.
+_READINGS = (
+  ("neurio_power_watts", "gauge", "watts", "Real power."),
+  ("neurio_reactive_power_vars", "gauge", "vars", "Reactive power."),
+  ("neurio_voltage_volts", "gauge", "volts", "RMS voltage."),
+  ("neurio_energy_imported_joules", "counter", "joules",
+   "Cumulative energy imported (consumed, or generated on generation "
+   "channels)."),
+  ("neurio_energy_exported_joules", "counter", "joules",
+   "Cumulative energy exported."),
+  ("neurio_sample_timestamp_seconds", "gauge", "seconds",
+   "Time the latest sample was taken, as reported by the sensor."),
+)
+_HEALTH = (
+  ("neurio_up", "gauge", None,
+   "Whether the latest sample is fresh (1) or stale (0)."),
+  ("neurio_sample_age_seconds", "gauge", "seconds",
+   "Seconds since the latest successful poll."),
+  ("neurio_polls", "counter", None, "Successful polls."),
+  ("neurio_poll_errors", "counter", None, "Failed polls."),
+)
+
+# Local channel fields, by metric family.
+_CHANNEL_FIELDS = (
+  ("neurio_power_watts", "p_W"),
+  ("neurio_reactive_power_vars", "q_VAR"),
+  ("neurio_voltage_volts", "v_V"),
+  ("neurio_energy_imported_joules", "eImp_Ws"),
+  ("neurio_energy_exported_joules", "eExp_Ws"),
+)
+# Cloud sample fields: family, channel label and field.
+_CLOUD_FIELDS = (
+  ("neurio_power_watts", "consumption", "consumptionPower"),
+  ("neurio_power_watts", "generation", "generationPower"),
+  ("neurio_energy_imported_joules", "consumption", "consumptionEnergy"),
+  ("neurio_energy_imported_joules", "generation", "generationEnergy"),
+)
+
+
+def _escape(value):
+  return str(value).replace("\\", "\\\\").replace("\"", "\\\"") \
+    .replace("\n", "\\n")
+
+def _labels(**labels):
+  return "{%s}" % ",".join('%s="%s"' % (k, _escape(v))
+                           for k, v in sorted(labels.items()))
+
+def _value(value):
+  return repr(float(value))
+
+def _sample_name(name, kind):
+  return name + "_total" if kind == "counter" else name
+
+def _header(name, kind, unit, help):
+  lines = ["# TYPE %s %s" % (name, kind)]
+  if unit:
+    lines.append("# UNIT %s %s" % (name, unit))
+  lines.append("# HELP %s %s" % (name, help))
+  return lines
+
+def _render_sample(key, sample):
+  """Returns the exposition lines of one sample, by family."""
+  kinds = dict((name, kind) for name, kind, _, _ in _READINGS)
+  lines = dict((name, []) for name in kinds)
+
+  def add(family, channel, value):
+    if value is None:
+      return
+    lines[family].append("%s%s %s" % (
+      _sample_name(family, kinds[family]),
+      _labels(sensor=key, channel=channel), _value(value)))
+
+  if "channels" in sample:
+    for channel in sample["channels"]:
+      name = (channel.get("type") or str(channel.get("ch"))).lower()
+      for family, field in _CHANNEL_FIELDS:
+        add(family, name, channel.get(field))
+  else:
+    for family, name, field in _CLOUD_FIELDS:
+      add(family, name, sample.get(field))
+
+  try:
+    taken = parse_timestamp(sample.get("timestamp"))
+  except (TypeError, ValueError):
+    # e.g. NOT_SYNCHRONIZED from a local device without a clock
+    taken = None
+  if taken is not None:
+    lines["neurio_sample_timestamp_seconds"].append("%s%s %s" % (
+      "neurio_sample_timestamp_seconds", _labels(sensor=key), _value(taken)))
+  return lines
+
+
+class OpenMetricsCollector(object):
+  def __init__(self, hub, stale_after=None):
+    """Renders the latest samples of a ``Hub`` in the OpenMetrics text
+    format.
+
+    Readings are exposed per sensor (the hub source key) and channel: for
+    cloud sources the ``consumption`` and ``generation`` totals, for local
+    devices every channel by its lowercased type. A source whose last
+    successful poll is older than ``stale_after`` seconds reports
+    ``neurio_up 0`` and no readings, so that Prometheus marks its series
+    stale instead of repeating old values.
+
+    Each source's readings are rendered once per new sample and reused by
+    every scrape until the next one arrives.
+
+    Args:
+      hub (Hub): hub polling the sources
+      stale_after (float, optional): seconds after which a source is stale
+        (default: three poll intervals)
+    """
+    self.hub = hub
+    self.stale_after = stale_after
+    self.__cache = {}
+
+  def __readings(self, key):
+    sample = self.hub.latest(key)
+    if sample is None:
+      # Removed from the hub since its status was read.
+      return {}
+    cached = self.__cache.get(key)
+    if cached is None or cached[0] is not sample:
+      cached = self.__cache[key] = (sample, _render_sample(key, sample))
+    return cached[1]
+
+  def render(self, now=None):
+    """Returns the exposition, ending with ``# EOF``, as a string."""
+    if now is None:
+      now = time.time()
+    status = self.hub.status()
+    for key in list(self.__cache):
+      if key not in status:
+        del self.__cache[key]
+
+    health = dict((name, []) for name, _, _, _ in _HEALTH)
+    fresh = []
+    for key in sorted(status):
+      s = status[key]
+      labels = _labels(sensor=key)
+      stale_after = self.stale_after
+      if stale_after is None:
+        stale_after = 3 * s["interval"]
+      age = None if s["updated"] is None else now - s["updated"]
+      up = age is not None and age <= stale_after
+      if up:
+        fresh.append(key)
+      health["neurio_up"].append("neurio_up%s %d" % (labels, up))
+      if age is not None:
+        health["neurio_sample_age_seconds"].append(
+          "neurio_sample_age_seconds%s %s" % (labels, _value(age)))
+      health["neurio_polls"].append(
+        "neurio_polls_total%s %d" % (labels, s["polls"]))
+      health["neurio_poll_errors"].append(
+        "neurio_poll_errors_total%s %d" % (labels, s["errors"]))
+
+    readings = [self.__readings(key) for key in fresh]
+    out = []
+    for name, kind, unit, help in _READINGS:
+      lines = [line for r in readings for line in r.get(name, ())]
+      if lines:
+        out.extend(_header(name, kind, unit, help))
+        out.extend(lines)
+    for name, kind, unit, help in _HEALTH:
+      if health[name]:
+        out.extend(_header(name, kind, unit, help))
+        out.extend(health[name])
+    out.append("# EOF")
+    return "\n".join(out) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+  def log_message(self, format, *args):
+    pass
+
+  def do_GET(self):
+    if self.path.split("?")[0] != "/metrics":
+      self.send_error(404)
+      return
+    data = self.server.collector.render().encode("utf-8")
+    self.send_response(200)
+    self.send_header("Content-Type", CONTENT_TYPE)
+    self.send_header("Content-Length", str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+  daemon_threads = True
+
+
+class OpenMetricsServer(object):
+  def __init__(self, hub, host="127.0.0.1", port=0, stale_after=None):
+    """Serves ``GET /metrics`` for Prometheus from an
+    ``OpenMetricsCollector``.
+
+    Args:
+      hub (Hub): hub polling the sources; start it separately
+      host (string): address to listen on (default: localhost only)
+      port (int): port to listen on (default: any free port)
+      stale_after (float, optional): see ``OpenMetricsCollector``
+    """
+    self.collector = OpenMetricsCollector(hub, stale_after)
+    self.__server = _ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    self.__server.collector = self.collector
+    self.__thread = None
+
+  @property
+  def address(self):
+    """The ``(host, port)`` the server is listening on."""
+    return self.__server.server_address
+
+  def start(self):
+    self.__thread = threading.Thread(target=self.__server.serve_forever,
+                                     name="neurio-openmetrics")
+    self.__thread.daemon = True
+    self.__thread.start()
+    return self
+
+  def stop(self):
+    self.__server.shutdown()
+    self.__server.server_close()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
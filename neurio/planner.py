@@ -0,0 +1,241 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Choosing ``granularity`` and ``frequency`` for ``get_samples`` and
+``get_samples_stats`` from a point budget.
+
+A granularity and frequency combination is legal when its step (e.g. 15
+minutes for ``minutes`` at frequency 15) fits in the granularity's range cap,
+and, for ``minutes``, the frequency is a multiple of 5. The planner finds the
+finest legal step that yields at most ``max_points`` points over the range,
+then, among the combinations with a step up to ``slack`` times that one,
+picks the one needing the fewest requests (then the finest step). A year at
+500 points, for instance, is fetched as 365 ``days`` in 14 requests rather
+than as 18-hour steps in one request per day.
+
+The range is then split into windows within the cap, each a whole number of
+steps long so that points stay on one grid across windows, and each window is
+fetched with a page larger than its point count, so a window costs exactly
+one request (a full page would make ``iter_pages`` ask for another one).
+"""
+
+import calendar
+import math
+import time
+
+from neurio._samples import MAX_RANGE, parse_timestamp, format_timestamp
+
+GRANULARITIES = ("minutes", "hours", "days", "weeks", "months", "years")
+
+# Nominal widths, in seconds; months and years are calendar units, so their
+# widths only estimate point counts.
+_WIDTHS = {
+  "minutes": 60,
+  "hours": 3600,
+  "days": 86400,
+  "weeks": 604800,
+  "months": 2629746,
+  "years": 31556952,
+}
+
+# Calendar granularities: months per unit and the most units per request
+# that stay within MAX_RANGE in any year (12 months or 10 years can include
+# one leap day too many).
+_CALENDAR = {"months": (1, 11), "years": (12, 9)}
+
+_MAX_PER_PAGE = 500
+
+# Rough size of one result in a JSON response, to estimate transfer sizes.
+_BYTES_PER_POINT = {"samples": 150, "stats": 200}
+
+
+def _add_months(ts, months):
+  t = time.gmtime(ts)
+  year, month = divmod(t.tm_mon - 1 + months, 12)
+  return calendar.timegm((t.tm_year + year, month + 1, t.tm_mday,
+                          t.tm_hour, t.tm_min, t.tm_sec))
+
+def _frequencies(granularity, step):
+  """Returns the smallest legal frequency with a step of at least ``step``
+  seconds, or None."""
+  frequency = max(1, int(math.ceil(float(step) / _WIDTHS[granularity])))
+  if granularity == "minutes":
+    frequency = max(5, int(math.ceil(frequency / 5.0)) * 5)
+  if granularity in _CALENDAR:
+    if frequency > _CALENDAR[granularity][1]:
+      return None
+  elif frequency * _WIDTHS[granularity] > MAX_RANGE[granularity]:
+    return None
+  return frequency
+
+def _months_between(start, end):
+  """Calendar months from ``start`` to ``end``, counting a partial month."""
+  a = time.gmtime(start)
+  b = time.gmtime(end)
+  months = (b.tm_year - a.tm_year) * 12 + b.tm_mon - a.tm_mon
+  if _add_months(start, months) < end:
+    months += 1
+  return months
+
+def _count(granularity, frequency, start, end):
+  """Points in one window."""
+  if granularity in _CALENDAR:
+    months = _CALENDAR[granularity][0] * frequency
+    return int(math.ceil(_months_between(start, end) / float(months)))
+  return int(math.ceil((end - start) / float(_WIDTHS[granularity] *
+                                             frequency)))
+
+def _windows(granularity, frequency, lo, hi):
+  if granularity in _CALENDAR:
+    months, most = _CALENDAR[granularity]
+    span = (most // frequency) * frequency * months
+    advance = lambda ts: _add_months(ts, span)
+  else:
+    step = frequency * _WIDTHS[granularity]
+    span = (MAX_RANGE[granularity] // step) * step
+    advance = lambda ts: ts + span
+  windows = []
+  start = lo
+  while start < hi:
+    end = min(advance(start), hi)
+    windows.append((start, end))
+    start = end
+  return windows
+
+
+class QueryPlan(object):
+  def __init__(self, sensor_id, start, end, granularity, frequency,
+               stats=False, full=False):
+    """The requests that fetch a sensor's samples over ``[start, end)`` at
+    one granularity and frequency; usually created by ``plan_query``.
+
+    Attributes:
+      step (float): seconds between points (nominal for months and years)
+      windows (list): ``(start, end)`` epoch seconds of each request
+      per_page (int): page size of each request
+      points (int): estimated number of points
+      requests (int): estimated number of requests
+      bytes (int): estimated response size, in bytes
+    """
+    self.sensor_id = sensor_id
+    self.start = parse_timestamp(start)
+    self.end = parse_timestamp(end)
+    self.granularity = granularity
+    self.frequency = frequency
+    self.stats = stats
+    self.full = full
+    self.step = _WIDTHS[granularity] * frequency
+    self.windows = _windows(granularity, frequency, self.start, self.end)
+
+    counts = [_count(granularity, frequency, s, e) for s, e in self.windows]
+    largest = max(counts) if counts else 0
+    # Room for a point at the window's end, which may be included, and one
+    # more so that the page is never full.
+    self.per_page = min(_MAX_PER_PAGE, largest + 2)
+    self.points = sum(counts)
+    self.requests = sum(c // self.per_page + 1 for c in counts)
+    self.bytes = self.points * _BYTES_PER_POINT["stats" if stats else
+                                                "samples"]
+
+  def __repr__(self):
+    return "<QueryPlan %s x%d: %d points, %d requests>" % (
+      self.granularity, self.frequency, self.points, self.requests)
+
+  def execute(self, client):
+    """Runs the plan, yielding each point once, oldest first.
+
+    Points outside ``[start, end)`` and points repeated at window boundaries
+    are dropped.
+
+    Args:
+      client (Client): authenticated client
+    """
+    from neurio.export import iter_pages
+    if self.stats:
+      fetch = client.get_samples_stats
+      field = "start"
+      kwargs = {}
+    else:
+      fetch = client.get_samples
+      field = "timestamp"
+      kwargs = {"full": True} if self.full else {}
+    last = None
+    for start, end in self.windows:
+      for point in iter_pages(fetch, per_page=self.per_page,
+                              sensor_id=self.sensor_id,
+                              start=format_timestamp(start),
+                              end=format_timestamp(end),
+                              granularity=self.granularity,
+                              frequency=self.frequency, **kwargs):
+        ts = parse_timestamp(point[field])
+        if ts < self.start or ts >= self.end:
+          continue
+        if last is not None and ts <= last:
+          continue
+        last = ts
+        yield point
+
+
+def plan_query(sensor_id, start, end, max_points=500, stats=False,
+               full=False, slack=2.0):
+  """Plans fetching a sensor's samples over ``[start, end)`` at the finest
+  resolution giving at most ``max_points`` points.
+
+  Args:
+    sensor_id (string): hexadecimal id of the sensor to query
+    start (string or float): ISO 8601 time or epoch seconds
+    end (string or float): ISO 8601 time or epoch seconds
+    max_points (int): largest acceptable number of points
+    stats (bool): plan ``get_samples_stats`` instead of ``get_samples``
+    full (bool): request full samples, see ``get_samples``
+    slack (float): coarsest acceptable step, relative to the finest one
+      within ``max_points``, when a coarser step saves requests (default: 2;
+      1 always uses the finest step)
+
+  Returns:
+    QueryPlan: the plan; call ``execute`` to run it
+  """
+  lo = parse_timestamp(start)
+  hi = parse_timestamp(end)
+  if hi <= lo:
+    raise ValueError("end must be later than start")
+  if max_points < 1:
+    raise ValueError("max_points must be at least 1")
+  needed = (hi - lo) / float(max_points)
+
+  plans = []
+  for granularity in GRANULARITIES:
+    frequency = _frequencies(granularity, needed)
+    if frequency is not None:
+      plans.append(QueryPlan(sensor_id, lo, hi, granularity, frequency,
+                             stats, full))
+  plans = [p for p in plans if p.points <= max_points]
+  if not plans:
+    raise ValueError("no granularity fits %d points over this range" %
+                     (max_points,))
+  finest = min(p.step for p in plans)
+  # Ties go to the later, i.e. coarser, granularity.
+  return min(reversed([p for p in plans if p.step <= finest * slack]),
+             key=lambda p: (p.requests, p.step))
+
+def query_samples(client, sensor_id, start, end, max_points=500, stats=False,
+                  full=False):
+  """Plans and runs a query, see ``plan_query``.
+
+  Returns:
+    list: samples (or stats with ``stats=True``), oldest first
+  """
+  plan = plan_query(sensor_id, start, end, max_points, stats, full)
+  return list(plan.execute(client))
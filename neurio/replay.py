@@ -0,0 +1,367 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Recording and replaying the requests a ``Client`` makes.
+
+A recording is a newline-delimited JSON file (gzip-compressed when its name
+ends in ``.gz``) with one record per request: ``t`` (seconds since recording
+started), ``method``, ``url`` (without query string), ``params``, ``data``,
+``status``, ``elapsed`` (seconds), ``size`` (response bytes) and, if
+requested, the response ``body``. Request headers, which carry credentials,
+are never recorded, and access tokens in recorded bodies are redacted.
+"""
+
+import gzip
+import json
+import threading
+import time
+
+try:
+  from queue import Queue
+except ImportError:
+  from Queue import Queue
+
+try:
+  from urlparse import urlparse, parse_qsl, urlunparse
+  from urllib import urlencode
+except ImportError:
+  from urllib.parse import urlparse, parse_qsl, urlunparse, urlencode
+
+try:
+  from http.server import BaseHTTPRequestHandler, HTTPServer
+  from socketserver import ThreadingMixIn
+except ImportError:
+  from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+  from SocketServer import ThreadingMixIn
+
+from neurio.transport import Transport, get_transport
+
+
+def _open(path, mode):
+  if path.endswith(".gz"):
+    return gzip.open(path, mode + "b")
+  return open(path, mode + "b")
+
+def _split_url(url):
+  parts = urlparse(url)
+  base = urlunparse((parts.scheme, parts.netloc, parts.path, "", "", ""))
+  return base, dict(parse_qsl(parts.query))
+
+def _join_url(base, params):
+  return base + "?" + urlencode(sorted(params.items())) if params else base
+
+_SECRETS = ("access_token", "refresh_token")
+
+def _redact(body):
+  """Replaces tokens in a JSON response body, e.g. from /oauth2/token."""
+  try:
+    data = json.loads(body)
+  except ValueError:
+    return body
+  if not isinstance(data, dict) or not any(k in data for k in _SECRETS):
+    return body
+  for key in _SECRETS:
+    if key in data:
+      data[key] = "REDACTED"
+  return json.dumps(data)
+
+def _content(r):
+  content = getattr(r, "content", None)
+  return content if content is not None else b""
+
+
+class RecordingTransport(Transport):
+  def __init__(self, path, transport=None, bodies=False):
+    """Transport that passes requests to another one and records each of
+    them to ``path``.
+
+    Args:
+      path (string): recording file, overwritten
+      transport (Transport or string, optional): transport doing the actual
+        requests, see ``neurio.transport.get_transport``
+      bodies (bool): also record response bodies, so that ``StandInServer``
+        can serve them back (default: False)
+    """
+    super(RecordingTransport, self).__init__()
+    self.transport = get_transport(transport)
+    self.bodies = bodies
+    self.count = 0
+    self.__file = _open(path, "w")
+    self.__lock = threading.Lock()
+    self.__started = time.time()
+
+  def request(self, method, url, headers=None, data=None):
+    base, params = _split_url(url)
+    started = time.time()
+    r = self.transport.request(method, url, headers=headers, data=data)
+    elapsed = time.time() - started
+    content = _content(r)
+    record = {
+      "t": round(started - self.__started, 4),
+      "method": method,
+      "url": base,
+      "params": params,
+      "data": data,
+      "status": r.status_code,
+      "elapsed": round(elapsed, 4),
+      "size": len(content),
+    }
+    if self.bodies:
+      record["body"] = _redact(content.decode("utf-8", "replace"))
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    with self.__lock:
+      self.__file.write(line.encode("utf-8"))
+      self.count += 1
+    return r
+
+  def close(self):
+    with self.__lock:
+      self.__file.close()
+    self.transport.close()
+
+
+def read_recording(path):
+  """Yields the records of a recording, in the order they were made."""
+  with _open(path, "r") as f:
+    for line in f:
+      if line.strip():
+        yield json.loads(line.decode("utf-8"))
+
+
+def _percentile(ordered, q):
+  """Nearest-rank percentile of an ascending list."""
+  if not ordered:
+    return None
+  rank = int(round(q / 100.0 * (len(ordered) - 1)))
+  return ordered[rank]
+
+
+class Replayer(object):
+  def __init__(self, records, transport=None, speed=1.0, workers=8,
+               base_url=None, headers=None):
+    """Re-issues recorded requests with their original timing, scaled by
+    ``speed``.
+
+    Requests are sent by a pool of ``workers`` threads, so a slow target
+    delays later requests only once every worker is busy; how late requests
+    were sent is reported as ``lag``.
+
+    Args:
+      records (iterable): records, e.g. from ``read_recording``
+      transport (Transport or string, optional): transport to send with, see
+        ``neurio.transport.get_transport``
+      speed (float): rate multiplier; 2 replays twice as fast (default: 1)
+      workers (int): concurrent requests at most (default: 8)
+      base_url (string, optional): scheme and host replacing the recorded
+        ones, e.g. ``StandInServer.url``
+      headers (dict, optional): headers for every request, e.g. a Client's
+        ``{"Authorization": "Bearer <token>"}`` when replaying against the
+        Neurio API
+    """
+    if speed <= 0:
+      raise ValueError("speed must be positive")
+    self.records = sorted(records, key=lambda r: r["t"])
+    self.transport = get_transport(transport)
+    self.speed = speed
+    self.workers = workers
+    self.base_url = base_url
+    self.headers = headers
+
+  def __url(self, record):
+    url = record["url"]
+    if self.base_url is not None:
+      parts = urlparse(url)
+      url = self.base_url.rstrip("/") + urlunparse(
+        ("", "", parts.path, "", "", ""))
+    return _join_url(url, record.get("params"))
+
+  def __worker(self, queue, results, lock):
+    while True:
+      item = queue.get()
+      if item is None:
+        return
+      record, lag = item
+      started = time.time()
+      try:
+        r = self.transport.request(record["method"], self.__url(record),
+                                   headers=self.headers,
+                                   data=record.get("data"))
+        result = (r.status_code, time.time() - started, len(_content(r)), lag)
+      except Exception:
+        result = (None, time.time() - started, 0, lag)
+      with lock:
+        results.append(result)
+
+  def run(self):
+    """Replays every record and waits for the responses.
+
+    Returns:
+      dict: ``requests``, ``errors`` (connection errors and 4xx/5xx
+        responses), ``statuses`` (count per status code), ``duration`` and
+        ``throughput`` (requests per second), ``bytes`` received,
+        ``latency`` and ``lag`` (``p50``, ``p90``, ``p99`` and ``max``, in
+        seconds)
+    """
+    queue = Queue()
+    results = []
+    lock = threading.Lock()
+    threads = [threading.Thread(target=self.__worker,
+                                args=(queue, results, lock))
+               for _ in range(self.workers)]
+    for thread in threads:
+      thread.daemon = True
+      thread.start()
+
+    started = time.time()
+    first = self.records[0]["t"] if self.records else 0
+    for record in self.records:
+      due = started + (record["t"] - first) / self.speed
+      delay = due - time.time()
+      if delay > 0:
+        time.sleep(delay)
+      queue.put((record, max(0.0, time.time() - due)))
+    for _ in threads:
+      queue.put(None)
+    for thread in threads:
+      thread.join()
+    duration = time.time() - started
+
+    statuses = {}
+    for status, _, _, _ in results:
+      statuses[status] = statuses.get(status, 0) + 1
+
+    def summary(values):
+      values = sorted(values)
+      return {
+        "p50": _percentile(values, 50),
+        "p90": _percentile(values, 90),
+        "p99": _percentile(values, 99),
+        "max": values[-1] if values else None,
+      }
+
+    return {
+      "requests": len(results),
+      "errors": sum(1 for r in results if r[0] is None or r[0] >= 400),
+      "statuses": statuses,
+      "duration": duration,
+      "throughput": len(results) / duration if duration > 0 else None,
+      "bytes": sum(r[2] for r in results),
+      "latency": summary(r[1] for r in results),
+      "lag": summary(r[3] for r in results),
+    }
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+
+  def log_message(self, format, *args):
+    pass
+
+  def __respond(self, method):
+    length = int(self.headers.get("Content-Length") or 0)
+    if length:
+      self.rfile.read(length)
+    base, params = _split_url(self.path)
+    record = self.server.lookup(method, base, params)
+    if record is None:
+      status, body, delay = 404, b"", 0
+    else:
+      status = record["status"]
+      delay = record["elapsed"] if self.server.latency else 0
+      if "body" in record:
+        body = record["body"].encode("utf-8")
+      else:
+        body = b" " * record["size"]
+    if delay:
+      time.sleep(delay)
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self):
+    self.__respond("GET")
+
+  def do_POST(self):
+    self.__respond("POST")
+
+
+class _StandInHTTPServer(ThreadingMixIn, HTTPServer):
+  daemon_threads = True
+
+  def lookup(self, method, path, params):
+    key = (method, path, tuple(sorted(params.items())))
+    with self.lock:
+      matches = self.responses.get(key)
+      if not matches:
+        return None
+      # Repeated requests get the recorded responses in turn.
+      record = matches[self.next.get(key, 0) % len(matches)]
+      self.next[key] = self.next.get(key, 0) + 1
+      return record
+
+
+class StandInServer(object):
+  def __init__(self, records, host="127.0.0.1", port=0, latency=True):
+    """Local HTTP server answering recorded requests with their recorded
+    status, response (the body if it was recorded, otherwise filler of the
+    recorded size) and, optionally, latency.
+
+    Requests are matched on method, path and query parameters; anything else
+    gets a 404.
+
+    Args:
+      records (iterable): records, e.g. from ``read_recording``
+      host (string): address to listen on (default: localhost only)
+      port (int): port to listen on (default: any free port)
+      latency (bool): delay each response by its recorded ``elapsed``
+    """
+    responses = {}
+    for record in records:
+      path = urlparse(record["url"]).path
+      key = (record["method"], path,
+             tuple(sorted((record.get("params") or {}).items())))
+      responses.setdefault(key, []).append(record)
+    self.__server = _StandInHTTPServer((host, port), _StandInHandler)
+    self.__server.responses = responses
+    self.__server.next = {}
+    self.__server.lock = threading.Lock()
+    self.__server.latency = latency
+    self.__thread = None
+
+  @property
+  def address(self):
+    """The ``(host, port)`` the server is listening on."""
+    return self.__server.server_address
+
+  @property
+  def url(self):
+    """Base URL to pass to ``Replayer`` as ``base_url``."""
+    return "http://%s:%d" % self.address
+
+  def start(self):
+    self.__thread = threading.Thread(target=self.__server.serve_forever,
+                                     name="neurio-stand-in")
+    self.__thread.daemon = True
+    self.__thread.start()
+    return self
+
+  def stop(self):
+    self.__server.shutdown()
+    self.__server.server_close()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
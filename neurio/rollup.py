@@ -0,0 +1,335 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from bisect import bisect_right
+import calendar
+import time
+
+from neurio._samples import (MAX_RANGE, parse_timestamp, format_timestamp,
+                             normalize_local_sample)
+from neurio.metrics import CounterDelta
+
+# Tiers from finest to coarsest; names match get_samples granularities.
+# Months vary in length, so their width is only used to estimate point counts.
+TIERS = ("minutes", "hours", "days", "months")
+_WIDTHS = {"minutes": 60, "hours": 3600, "days": 86400, "months": 2629746}
+
+# Tiers that can be filled from get_samples, one sample per bucket. Minutes
+# cannot: the API only returns them at frequencies of 5 or more (see
+# neurio.planner), so queries fall back to hours instead.
+_FETCHABLE = ("hours", "days", "months")
+
+def bucket_start(ts, tier):
+  """Returns the start (epoch seconds, UTC) of the tier bucket holding
+  ``ts``."""
+  if tier == "months":
+    t = time.gmtime(ts)
+    return calendar.timegm((t.tm_year, t.tm_mon, 1, 0, 0, 0))
+  width = _WIDTHS[tier]
+  return int(ts // width) * width
+
+def bucket_end(start, tier):
+  """Returns the end of the tier bucket starting at ``start``."""
+  if tier == "months":
+    t = time.gmtime(start)
+    year, month = divmod(t.tm_year * 12 + t.tm_mon, 12)
+    return calendar.timegm((year, month + 1, 1, 0, 0, 0))
+  return start + _WIDTHS[tier]
+
+def _fetch_step(start, tier, steps=1):
+  """Moves ``steps`` buckets from the bucket starting at ``start``;
+  ``steps`` may be negative."""
+  if tier == "months":
+    t = time.gmtime(start)
+    year, month = divmod(t.tm_year * 12 + t.tm_mon - 1 + steps, 12)
+    return calendar.timegm((year, month + 1, 1, 0, 0, 0))
+  return start + steps * _WIDTHS[tier]
+
+
+class _Aggregate(object):
+  __slots__ = ("count", "c_sum", "c_min", "c_max", "g_sum", "g_min", "g_max",
+               "c_energy", "g_energy")
+
+  def __init__(self):
+    self.count = 0
+    self.c_sum = self.g_sum = 0
+    self.c_min = self.c_max = self.g_min = self.g_max = None
+    self.c_energy = self.g_energy = 0
+
+  def add(self, consumption, generation, c_energy, g_energy):
+    if self.count == 0:
+      self.c_min = self.c_max = consumption
+      self.g_min = self.g_max = generation
+    else:
+      self.c_min = min(self.c_min, consumption)
+      self.c_max = max(self.c_max, consumption)
+      self.g_min = min(self.g_min, generation)
+      self.g_max = max(self.g_max, generation)
+    self.count += 1
+    self.c_sum += consumption
+    self.g_sum += generation
+    self.c_energy += c_energy
+    self.g_energy += g_energy
+
+  def point(self, start, end):
+    return {
+      "start": format_timestamp(start),
+      "end": format_timestamp(end),
+      "count": self.count,
+      "meanConsumptionPower": float(self.c_sum) / self.count,
+      "minConsumptionPower": self.c_min,
+      "maxConsumptionPower": self.c_max,
+      "meanGenerationPower": float(self.g_sum) / self.count,
+      "minGenerationPower": self.g_min,
+      "maxGenerationPower": self.g_max,
+      "consumptionEnergy": self.c_energy,
+      "generationEnergy": self.g_energy,
+    }
+
+
+class _Coverage(object):
+  """Sorted, merged list of covered ``[start, end)`` intervals."""
+  def __init__(self):
+    self.intervals = []
+
+  def add(self, start, end):
+    intervals = self.intervals
+    # Fast path: extending the most recent interval, as ingestion usually does.
+    if intervals and intervals[-1][0] <= start <= intervals[-1][1]:
+      intervals[-1][1] = max(intervals[-1][1], end)
+      return
+    merged = [start, end]
+    kept = []
+    for interval in intervals:
+      if interval[1] < merged[0] or interval[0] > merged[1]:
+        kept.append(interval)
+      else:
+        merged = [min(merged[0], interval[0]), max(merged[1], interval[1])]
+    kept.append(merged)
+    kept.sort()
+    self.intervals = kept
+
+  def contains(self, start, end):
+    i = bisect_right(self.intervals, [start, float("inf")]) - 1
+    return i >= 0 and self.intervals[i][0] <= start and \
+      self.intervals[i][1] >= end
+
+
+class _Tier(object):
+  def __init__(self, name):
+    self.name = name
+    self.buckets = {}
+    self.coverage = _Coverage()
+
+  def add(self, ts, consumption, generation, c_energy, g_energy):
+    start = bucket_start(ts, self.name)
+    aggregate = self.buckets.get(start)
+    if aggregate is None:
+      aggregate = self.buckets[start] = _Aggregate()
+    aggregate.add(consumption, generation, c_energy, g_energy)
+
+  def complete(self, start):
+    """True if the bucket starting at ``start`` is covered end to end."""
+    return self.coverage.contains(start, bucket_end(start, self.name))
+
+
+class RollupStore(object):
+  def __init__(self, sensor_id=None):
+    """Minute, hour, day and month aggregates of a sensor's samples,
+    maintained as samples are ingested.
+
+    Every tier keeps, per UTC-aligned bucket, the sample count, min/max/mean
+    consumption and generation power, and the energy consumed and generated
+    (from the cumulative energy counters, allowing for counter resets).
+
+    ``query`` serves a time range from the finest tier whose number of
+    buckets fits a point budget, fetching from ``Client.get_samples`` at the
+    matching granularity when the tier has no data for part of the range.
+
+    Args:
+      sensor_id (string, optional): sensor queried on fallback
+    """
+    self.sensor_id = sensor_id
+    self.tiers = dict((name, _Tier(name)) for name in TIERS)
+    self.__consumption = CounterDelta()
+    self.__generation = CounterDelta()
+    self.__last = None
+    self.__step = None
+
+  def __cover(self, ts):
+    """Marks the span of ingested samples as covered. Each sample stands for
+    the shortest interval seen between samples, so a gap in the data is not
+    covered."""
+    last, self.__last = self.__last, ts
+    if last is None or ts <= last:
+      return
+    first = self.__step is None
+    if first or ts - last < self.__step:
+      self.__step = ts - last
+    spans = [(ts, ts + self.__step)]
+    if first:
+      spans.append((last, last + self.__step))
+    for tier in self.tiers.values():
+      for start, end in spans:
+        tier.coverage.add(start, end)
+
+  def ingest(self, sample):
+    """Adds a sample, oldest first, to every tier.
+
+    A bucket counts as covered (see ``covers``) only once the ingested
+    samples span all of it.
+
+    Args:
+      sample (dict): from ``get_samples``, ``get_samples_live`` or
+        ``get_local_current_sample``
+    """
+    sample = normalize_local_sample(sample)
+    ts = parse_timestamp(sample["timestamp"])
+    values = (
+      sample.get("consumptionPower") or 0,
+      sample.get("generationPower") or 0,
+      self.__consumption.update(sample.get("consumptionEnergy")),
+      self.__generation.update(sample.get("generationEnergy")),
+    )
+    for tier in self.tiers.values():
+      tier.add(ts, *values)
+    self.__cover(ts)
+
+  def ingest_many(self, samples):
+    for sample in samples:
+      self.ingest(sample)
+
+  def points(self, tier, start, end):
+    """Returns the aggregates of one tier for buckets overlapping
+    ``[start, end)``, oldest first.
+
+    Args:
+      tier (string): "minutes", "hours", "days" or "months"
+      start (string or float): ISO 8601 time or epoch seconds
+      end (string or float): ISO 8601 time or epoch seconds
+
+    Returns:
+      list: dictionaries with ``start``, ``end``, ``count``,
+        ``meanConsumptionPower``, ``minConsumptionPower``,
+        ``maxConsumptionPower``, the same for generation, and the
+        ``consumptionEnergy`` and ``generationEnergy`` of each bucket
+    """
+    lo = bucket_start(parse_timestamp(start), tier)
+    hi = parse_timestamp(end)
+    buckets = self.tiers[tier].buckets
+    return [buckets[s].point(s, bucket_end(s, tier))
+            for s in sorted(buckets) if lo <= s < hi]
+
+  def covers(self, tier, start, end):
+    """True if a tier holds data for the whole of ``[start, end)``."""
+    lo = bucket_start(parse_timestamp(start), tier)
+    return self.tiers[tier].coverage.contains(lo, parse_timestamp(end))
+
+  def choose_tier(self, start, end, max_points):
+    """Returns the finest tier with at most ``max_points`` buckets over
+    ``[start, end)``, or the coarsest tier if none fits."""
+    span = parse_timestamp(end) - parse_timestamp(start)
+    for tier in TIERS:
+      if span / _WIDTHS[tier] <= max_points:
+        return tier
+    return TIERS[-1]
+
+  def __fetch_samples(self, client, tier, lo, hi):
+    """Yields samples in ``[lo, hi]`` once each, in windows within the
+    API's range cap."""
+    from neurio.export import iter_pages
+    last = None
+    window = lo
+    while window < hi:
+      window_end = min(window + MAX_RANGE[tier], hi)
+      for sample in iter_pages(client.get_samples, sensor_id=self.sensor_id,
+                               start=format_timestamp(window),
+                               end=format_timestamp(window_end),
+                               granularity=tier, frequency=1):
+        ts = parse_timestamp(sample["timestamp"])
+        if last is None or ts > last:
+          last = ts
+          yield ts, sample
+      window = window_end
+
+  def fetch(self, client, tier, start, end):
+    """Fills the hours, days or months tier from ``Client.get_samples`` at
+    the matching granularity, splitting the range to respect the API's
+    limits.
+
+    Each fetched sample becomes one bucket; its energy is the counter
+    increase up to the next sample, so one extra sample is fetched on each
+    side of the range. Buckets fully covered by ingested samples are kept;
+    partial ones are replaced.
+    """
+    if self.sensor_id is None:
+      raise ValueError("sensor_id is required to fetch samples")
+    if tier not in _FETCHABLE:
+      raise ValueError("tier must be one of %s" % (", ".join(_FETCHABLE),))
+    lo = bucket_start(parse_timestamp(start), tier)
+    hi = parse_timestamp(end)
+    target = self.tiers[tier]
+    consumption = CounterDelta()
+    generation = CounterDelta()
+    previous = None
+    replaced = set()
+    for ts, sample in self.__fetch_samples(client, tier,
+                                           _fetch_step(lo, tier, -1),
+                                           _fetch_step(hi, tier)):
+      c_energy = consumption.update(sample.get("consumptionEnergy"))
+      g_energy = generation.update(sample.get("generationEnergy"))
+      if previous is not None:
+        self.__add_fetched(target, replaced, previous, c_energy, g_energy)
+      previous = (ts, sample) if lo <= ts < hi else None
+    if previous is not None:
+      # Nothing after it yet, e.g. the current bucket.
+      self.__add_fetched(target, replaced, previous, 0, 0)
+    target.coverage.add(lo, hi)
+
+  @staticmethod
+  def __add_fetched(target, replaced, previous, c_energy, g_energy):
+    ts, sample = previous
+    start = bucket_start(ts, target.name)
+    if start in target.buckets and start not in replaced:
+      if target.complete(start):
+        return
+      del target.buckets[start]
+    replaced.add(start)
+    target.add(ts, sample.get("consumptionPower") or 0,
+               sample.get("generationPower") or 0, c_energy, g_energy)
+
+  def query(self, start, end, max_points=500, client=None):
+    """Returns aggregates for ``[start, end)`` at the finest resolution
+    within ``max_points``.
+
+    Args:
+      start (string or float): ISO 8601 time or epoch seconds
+      end (string or float): ISO 8601 time or epoch seconds
+      max_points (int): largest acceptable number of points
+      client (Client, optional): used to fetch the range at the chosen
+        granularity when the local tier does not cover it; ranges missing
+        from the minutes tier are fetched, and returned, as hours
+
+    Returns:
+      tuple: the tier used and its points, see ``points``
+    """
+    tier = self.choose_tier(start, end, max_points)
+    if client is not None and not self.covers(tier, start, end):
+      if tier not in _FETCHABLE:
+        tier = _FETCHABLE[0]
+      if not self.covers(tier, start, end):
+        self.fetch(client, tier, start, end)
+    return tier, self.points(tier, start, end)
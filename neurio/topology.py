@@ -0,0 +1,198 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import threading
+import time
+
+from neurio._samples import as_dict
+
+def _checked(response, what):
+  if isinstance(response, dict) and "errors" in response:
+    raise ValueError("%s failed: %s" % (what, response["errors"]))
+  return response
+
+def _sensor_id(sensor):
+  return sensor.get("sensorId") or sensor.get("id")
+
+
+class _Index(object):
+  """One immutable snapshot of the topology; replaced, never modified."""
+  __slots__ = ("user", "locations", "sensors", "sensor_location",
+               "location_sensors", "appliances", "appliance_location",
+               "location_appliances", "ips")
+
+  def __init__(self, user, appliances_by_location):
+    self.user = user
+    self.locations = {}
+    self.sensors = {}
+    self.sensor_location = {}
+    self.location_sensors = {}
+    self.appliances = {}
+    self.appliance_location = {}
+    self.location_appliances = {}
+    self.ips = {}
+    for location in user.get("locations") or []:
+      location_id = location["id"]
+      self.locations[location_id] = location
+      sensor_ids = []
+      for sensor in location.get("sensors") or []:
+        sensor_id = _sensor_id(sensor)
+        sensor_ids.append(sensor_id)
+        self.sensors[sensor_id] = sensor
+        self.sensor_location[sensor_id] = location_id
+        if sensor.get("ipAddress"):
+          self.ips[sensor_id] = sensor["ipAddress"]
+      self.location_sensors[location_id] = tuple(sensor_ids)
+      appliances = appliances_by_location.get(location_id, ())
+      self.location_appliances[location_id] = tuple(appliances)
+      for appliance in appliances:
+        self.appliances[appliance["id"]] = appliance
+        self.appliance_location[appliance["id"]] = location_id
+
+
+class Topology(object):
+  def __init__(self, client, appliances=True):
+    """Index of the current user's locations, sensors and appliances, built
+    from ``get_user_information`` and ``get_appliances``.
+
+    The topology is loaded by the first lookup, or by ``refresh`` or
+    ``start``. After that, lookups are dictionary reads on a snapshot that
+    ``refresh`` replaces as a whole, so they make no API calls and never
+    wait for a refresh in progress.
+
+    Refreshes are incremental: user information is fetched every time, but
+    appliances are fetched right away only for new locations, and otherwise
+    for one location per refresh, in turn.
+
+    Args:
+      client (Client): authenticated client
+      appliances (bool): also index each location's appliances (default:
+        True)
+    """
+    self.client = client
+    self.with_appliances = appliances
+    self.refreshes = 0
+    self.errors = 0
+    self.last_error = None
+    self.updated = None
+    self.__index = None
+    self.__next = 0
+    self.__lock = threading.Lock()
+    self.__stop = threading.Event()
+    self.__thread = None
+
+  def __fetch_appliances(self, location_id):
+    return [as_dict(a) for a in _checked(
+      self.client.get_appliances(location_id), "get_appliances")]
+
+  def refresh(self):
+    """Reloads the topology; raises ValueError if a request fails."""
+    with self.__lock:
+      user = as_dict(_checked(self.client.get_user_information(),
+                               "get_user_information"))
+      location_ids = [l["id"] for l in user.get("locations") or []]
+      previous = self.__index
+      known = previous.location_appliances if previous is not None else {}
+      appliances = {}
+      if self.with_appliances:
+        stale = None
+        old = [l for l in location_ids if l in known]
+        if old:
+          stale = old[self.__next % len(old)]
+          self.__next += 1
+        for location_id in location_ids:
+          if location_id in known and location_id != stale:
+            appliances[location_id] = known[location_id]
+          else:
+            appliances[location_id] = self.__fetch_appliances(location_id)
+      self.__index = _Index(user, appliances)
+      self.refreshes += 1
+      self.updated = time.time()
+    return self
+
+  def __get(self):
+    if self.__index is None:
+      self.refresh()
+    return self.__index
+
+  @property
+  def user(self):
+    return self.__get().user
+
+  def location_ids(self):
+    return list(self.__get().locations)
+
+  def sensor_ids(self):
+    return list(self.__get().sensors)
+
+  def location(self, location_id):
+    """Returns a location from ``get_user_information``, or None."""
+    return self.__get().locations.get(location_id)
+
+  def sensor(self, sensor_id):
+    """Returns a sensor from ``get_user_information``, or None."""
+    return self.__get().sensors.get(sensor_id)
+
+  def appliance(self, appliance_id):
+    """Returns an appliance from ``get_appliances``, or None."""
+    return self.__get().appliances.get(appliance_id)
+
+  def location_of(self, sensor_id):
+    """Returns the id of the location a sensor belongs to, or None."""
+    return self.__get().sensor_location.get(sensor_id)
+
+  def sensors_of(self, location_id):
+    """Returns the ids of a location's sensors."""
+    return list(self.__get().location_sensors.get(location_id, ()))
+
+  def appliances_of(self, location_id):
+    """Returns a location's appliances."""
+    return list(self.__get().location_appliances.get(location_id, ()))
+
+  def location_of_appliance(self, appliance_id):
+    """Returns the id of the location an appliance belongs to, or None."""
+    return self.__get().appliance_location.get(appliance_id)
+
+  def ip_of(self, sensor_id):
+    """Returns a sensor's local network address, or None."""
+    return self.__get().ips.get(sensor_id)
+
+  def __run(self, interval):
+    while not self.__stop.wait(interval):
+      try:
+        self.refresh()
+      except Exception as e:
+        self.errors += 1
+        self.last_error = e
+
+  def start(self, interval=300.0):
+    """Refreshes every ``interval`` seconds on a background thread, after
+    loading the topology now if it has not been loaded yet; failed
+    background refreshes are counted in ``errors`` and keep the previous
+    snapshot."""
+    self.__get()
+    self.__stop.clear()
+    self.__thread = threading.Thread(target=self.__run, args=(interval,),
+                                     name="neurio-topology")
+    self.__thread.daemon = True
+    self.__thread.start()
+    return self
+
+  def stop(self):
+    self.__stop.set()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
@@ -0,0 +1,155 @@
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import time
+
+# Responses worth retrying: rate limiting and transient gateway errors.
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class Transport(object):
+  def __init__(self, timeout=None, retries=0, backoff=0.5):
+    """Base class for the HTTP backends used by ``Client`` and
+    ``TokenProvider``.
+
+    Timeouts and retries are handled here rather than by the underlying HTTP
+    library, so every backend behaves the same way. Subclasses implement
+    ``_send`` and ``_errors``.
+
+    Args:
+      timeout (float, optional): seconds to wait for a connection or for
+        response data (default: wait indefinitely)
+      retries (int): times a request is retried after a connection error or
+        a 429, 502, 503 or 504 response (default: 0)
+      backoff (float): seconds before the first retry, doubling after each
+    """
+    self.timeout = timeout
+    self.retries = retries
+    self.backoff = backoff
+
+  def _send(self, method, url, headers, data):
+    """Sends one request and returns the backend's response object, which
+    must provide ``status_code`` and ``json()``."""
+    raise NotImplementedError
+
+  def _errors(self):
+    """Returns the exception classes that indicate a connection failure."""
+    return ()
+
+  def request(self, method, url, headers=None, data=None):
+    errors = self._errors()
+    attempt = 0
+    while True:
+      try:
+        r = self._send(method, url, headers, data)
+      except errors:
+        if attempt >= self.retries:
+          raise
+      else:
+        if r.status_code not in RETRY_STATUSES or attempt >= self.retries:
+          return r
+      time.sleep(self.backoff * (2 ** attempt))
+      attempt += 1
+
+  def get(self, url, headers=None):
+    return self.request("GET", url, headers=headers)
+
+  def post(self, url, data=None, headers=None):
+    return self.request("POST", url, headers=headers, data=data)
+
+  def close(self):
+    pass
+
+
+class RequestsTransport(Transport):
+  def __init__(self, session=None, timeout=None, retries=0, backoff=0.5):
+    """HTTP/1.1 transport backed by ``requests``; connections are pooled by
+    a ``requests.Session``.
+
+    Args:
+      session (requests.Session, optional): session to use (default: a new
+        one)
+      timeout, retries, backoff: see ``Transport``
+    """
+    super(RequestsTransport, self).__init__(timeout, retries, backoff)
+    import requests
+    self.__requests = requests
+    self.session = session if session is not None else requests.Session()
+
+  def _errors(self):
+    return (self.__requests.ConnectionError, self.__requests.Timeout)
+
+  def _send(self, method, url, headers, data):
+    return self.session.request(method, url, headers=headers, data=data,
+                                timeout=self.timeout)
+
+  def close(self):
+    self.session.close()
+
+
+class Http2Transport(Transport):
+  def __init__(self, timeout=None, retries=0, backoff=0.5, max_connections=10):
+    """HTTP/2 transport backed by ``httpx``, multiplexing concurrent
+    requests to the same host over a few connections. Requires
+    ``pip install httpx[http2]``.
+
+    A single instance may be shared by many threads.
+
+    Args:
+      timeout, retries, backoff: see ``Transport``
+      max_connections (int): upper bound on open connections
+    """
+    super(Http2Transport, self).__init__(timeout, retries, backoff)
+    try:
+      import httpx
+    except ImportError:
+      raise ImportError("the http2 transport requires httpx[http2]")
+    self.__httpx = httpx
+    self.client = httpx.Client(
+      http2=True, timeout=httpx.Timeout(timeout),
+      limits=httpx.Limits(max_connections=max_connections))
+
+  def _errors(self):
+    return (self.__httpx.TransportError,)
+
+  def _send(self, method, url, headers, data):
+    return self.client.request(method, url, headers=headers, data=data)
+
+  def close(self):
+    self.client.close()
+
+
+TRANSPORTS = {
+  "requests": RequestsTransport,
+  "http2": Http2Transport,
+}
+
+def get_transport(transport=None, **kwargs):
+  """Returns a ``Transport``.
+
+  Args:
+    transport (Transport or string, optional): a transport instance, which
+      is returned unchanged, or the name of a backend, "requests" or "http2"
+      (default: "requests")
+    **kwargs: arguments for a newly created transport, e.g. ``timeout``
+  """
+  if isinstance(transport, Transport):
+    return transport
+  name = transport or "requests"
+  if name not in TRANSPORTS:
+    raise ValueError("transport must be one of %s" %
+                     (", ".join(sorted(TRANSPORTS)),))
+  return TRANSPORTS[name](**kwargs)
@@ -18,4 +18,15 @@ setup(
   keywords = ['neurio', 'iot', 'energy', 'sensor', 'smarthome', 'automation'],
   classifiers = [],
   install_requires = ['requests'],
+  extras_require = {
+    'arrow': ['pyarrow'],
+    'http2': ['httpx[http2]'],
+    'numpy': ['numpy'],
+  },
+  entry_points = {
+    'console_scripts': [
+      'neurio = neurio.cli:main',
+      'neurio-backfill = neurio.backfill:main',
+    ],
+  },
 )
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio import align
+from neurio._samples import format_timestamp
+
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+START = 1451606400  # 2016-01-01T00:00:00Z
+
+def sample(t, power, energy, generation=0):
+    return {"timestamp": format_timestamp(START + t),
+            "consumptionPower": power, "generationPower": generation,
+            "consumptionEnergy": energy, "generationEnergy": 0}
+
+SERIES = {
+    # Offset from the grid by 10s, with a counter reset at t=190.
+    "a": [sample(10, 100, 1000), sample(70, 200, 7000),
+          sample(130, 300, 19000), sample(190, 300, 6000),
+          sample(250, 100, 12000)],
+    # On the grid, with a 3-minute hole.
+    "b": [sample(0, 50, 0), sample(60, 50, 3000), sample(240, 70, 12000),
+          sample(300, 70, 15000)],
+}
+
+class AlignTest(unittest.TestCase):
+    def test_previous_fill(self):
+        rows = list(align.align_streams(SERIES, 60, start=START))
+        self.assertEqual([r["timestamp"][-9:] for r in rows],
+                         ["00:00:00Z", "00:01:00Z", "00:02:00Z", "00:03:00Z",
+                          "00:04:00Z", "00:05:00Z"])
+        self.assertEqual(rows[0]["sensors"], 1)
+        self.assertEqual(rows[1]["consumptionPower"], 150)
+        self.assertEqual(rows[1]["bySensor"]["a"]["consumptionPower"], 100)
+        self.assertEqual(rows[5]["sensors"], 1)
+
+    def test_linear_fill(self):
+        rows = list(align.align_streams(SERIES, 60, start=START,
+                                        fill="linear"))
+        self.assertAlmostEqual(
+            rows[1]["bySensor"]["a"]["consumptionPower"], 100 + 100 * 50 / 60.)
+
+    def test_energy_across_reset(self):
+        rows = list(align.align_streams({"a": SERIES["a"]}, 60, start=START))
+        total = sum(r["consumptionEnergy"] for r in rows)
+        # Counter increase between the first and last grid point inside the
+        # samples (60s and 240s), with the reset at 190s undone: 6000 at 60s,
+        # 19000 + 6000 + 5000 at 240s.
+        self.assertAlmostEqual(total, 30000 - 6000)
+
+    def test_max_gap(self):
+        rows = list(align.align_streams(SERIES, 60, start=START,
+                                        max_gap=90, gap_value=0))
+        self.assertEqual(rows[2]["bySensor"]["b"]["consumptionPower"], 0)
+        self.assertEqual(rows[2]["sensors"], 1)
+
+    def test_streaming_is_incremental(self):
+        def endless(t0):
+            t = t0
+            while True:
+                yield sample(t, 1, t)
+                t += 30
+        rows = align.align_streams({"x": endless(0), "y": endless(15)}, 60)
+        first = [next(rows) for _ in range(3)]
+        self.assertEqual(first[2]["consumptionPower"], 2)
+
+    def test_finished_stream_does_not_hold_rows(self):
+        def endless():
+            t = 0
+            while True:
+                yield sample(t, 1, t)
+                t += 60
+        rows = align.align_streams({"x": endless(), "y": SERIES["b"],
+                                    "z": []}, 60)
+        first = [next(rows) for _ in range(10)]
+        self.assertEqual([r["sensors"] for r in first], [2] * 6 + [1] * 4)
+
+    @unittest.skipIf(numpy is None, "numpy not installed")
+    def test_numpy_matches_streams(self):
+        for fill in align.FILLS:
+            for max_gap in (None, 90):
+                columns = align.align(SERIES, 60, start=START, fill=fill,
+                                      max_gap=max_gap)
+                rows = list(align.align_streams(SERIES, 60, start=START,
+                                                fill=fill, max_gap=max_gap))
+                self.assertEqual(len(columns["timestamp"]), len(rows))
+                for name in ("consumptionPower", "netPower",
+                             "consumptionEnergy", "sensors"):
+                    for got, want in zip(columns[name], rows):
+                        self.assertAlmostEqual(got, want[name])
+                got = columns["bySensor"]["b"]["consumptionPower"]
+                want = [r["bySensor"]["b"]["consumptionPower"] for r in rows]
+                self.assertEqual([None if numpy.isnan(v) else v for v in got],
+                                 want)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio import backfill
+from neurio.transport import Transport
+
+import os
+import shutil
+import tempfile
+import unittest
+
+class FakeResponse(object):
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+class FakeTransport(Transport):
+    def _send(self, method, url, headers, data):
+        return FakeResponse([{"timestamp": "2016-01-01T00:00:00Z",
+                              "consumptionPower": 1}])
+
+class BackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.get_transport = backfill.get_transport
+        backfill.get_transport = lambda name: FakeTransport()
+
+    def tearDown(self):
+        backfill.get_transport = self.get_transport
+        shutil.rmtree(self.root)
+
+    def test_plan_aligns_to_days(self):
+        b = backfill.Backfill("k", "s", self.root, processes=1, format="csv")
+        units = b.plan(["a", "b"], "2016-01-01T12:00:00Z",
+                       "2016-01-03T06:00:00Z", granularity="minutes")
+        self.assertEqual(len(units), 6)
+        self.assertEqual(units[0]["end"], "2016-01-02T00:00:00Z")
+        self.assertEqual(units[2]["start"], "2016-01-03T00:00:00Z")
+        self.assertEqual(units[2]["end"], "2016-01-03T06:00:00Z")
+
+    def test_plan_invalid(self):
+        b = backfill.Backfill("k", "s", self.root, processes=1)
+        with self.assertRaises(ValueError):
+            b.plan(["a"], "2016-01-02T00:00:00Z", "2016-01-01T00:00:00Z")
+        with self.assertRaises(ValueError):
+            b.plan(["a"], "2016-01-01T00:00:00Z", "2016-01-02T00:00:00Z",
+                   granularity="seconds")
+
+    def test_run_and_resume(self):
+        b = backfill.Backfill("k", "s", self.root, processes=1, format="csv",
+                              token="t")
+        units = b.plan(["a"], "2016-01-01T00:00:00Z", "2016-01-03T00:00:00Z")
+        seen = []
+        summary = b.run(units, progress=lambda r, s: seen.append(r))
+        self.assertEqual(summary["units"], 2)
+        self.assertEqual(summary["rows"], 2)
+        self.assertEqual(len(seen), 2)
+        self.assertTrue(os.path.exists(seen[0]["path"]))
+
+        summary = b.run(units)
+        self.assertEqual(summary["units"], 0)
+        self.assertEqual(summary["skipped"], 2)
+
+    def test_rerun_with_later_end(self):
+        b = backfill.Backfill("k", "s", self.root, processes=1, format="csv",
+                              token="t")
+        b.run(b.plan(["a"], "2016-01-01T00:00:00Z", "2016-01-01T06:00:00Z"))
+        summary = b.run(b.plan(["a"], "2016-01-01T00:00:00Z",
+                               "2016-01-02T00:00:00Z"))
+        self.assertEqual(summary["units"], 1)
+        self.assertEqual(summary["skipped"], 0)
+        self.assertEqual(len(os.listdir(os.path.join(self.root, "a"))), 1)
+
+        summary = b.run(b.plan(["a"], "2016-01-01T00:00:00Z",
+                               "2016-01-01T12:00:00Z"))
+        self.assertEqual(summary["units"], 0)
+        self.assertEqual(summary["skipped"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+import neurio
+from neurio import cli
+from neurio._samples import MAX_RANGE, format_timestamp, parse_timestamp
+
+import io
+import json
+import os
+import subprocess
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOCAL_SAMPLE = {
+    "timestamp": "2016-01-01T00:00:00Z",
+    "channels": [{"type": "CONSUMPTION", "p_W": 500, "eImp_Ws": 10}],
+}
+
+class RangeClient(object):
+    """Returns one sample per hour, rejecting ranges the API would."""
+    def __init__(self):
+        self.calls = 0
+
+    def get_samples(self, sensor_id, start, granularity, end=None,
+                    frequency=None, per_page=None, page=None, full=False):
+        self.calls += 1
+        lo = parse_timestamp(start)
+        if sensor_id == "unknown" or end is None or \
+                parse_timestamp(end) - lo > MAX_RANGE[granularity]:
+            return {"status": 400, "errors": ["range too large"]}
+        return [{"timestamp": format_timestamp(t)}
+                for t in range(int(lo), int(parse_timestamp(end)) + 1, 3600)]
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        self.stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        self.get_local = neurio.Client.get_local_current_sample
+        neurio.Client.get_local_current_sample = staticmethod(
+            lambda ip: dict(LOCAL_SAMPLE))
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        neurio.Client.get_local_current_sample = staticmethod(self.get_local)
+
+    def test_local_ndjson(self):
+        rc = cli.main(["local", "--ip", "10.0.0.2", "--count", "2",
+                       "--interval", "0", "--normalize"])
+        self.assertEqual(rc, 0)
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])["consumptionPower"], 500)
+
+    def test_local_csv(self):
+        cli.main(["local", "--ip", "10.0.0.2", "--count", "1",
+                  "--output-format", "csv", "--normalize"])
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(lines[0].split(",")[0], "consumptionEnergy")
+        self.assertEqual(len(lines), 2)
+
+    def test_local_without_channels(self):
+        neurio.Client.get_local_current_sample = staticmethod(
+            lambda ip: {"timestamp": "2016-01-01T00:00:00Z"})
+        cli.main(["local", "--ip", "10.0.0.2", "--count", "1",
+                  "--normalize"])
+        self.assertEqual(json.loads(sys.stdout.getvalue()),
+                         {"timestamp": "2016-01-01T00:00:00Z"})
+
+    def test_parser_imports_nothing(self):
+        loaded = subprocess.check_output([sys.executable, "-c",
+            "import sys; from neurio import cli; cli.build_parser(); "
+            "print(' '.join(m for m in ('neurio.backfill', 'neurio.export', "
+            "'multiprocessing') if m in sys.modules))"],
+            cwd=ROOT).decode().strip()
+        self.assertEqual(loaded, "")
+
+    def test_samples_split_by_range(self):
+        client = RangeClient()
+        self.client, cli._client = cli._client, lambda args: client
+        try:
+            cli.main(["samples", "--sensor", "s",
+                      "--start", "2016-01-01T00:00:00Z",
+                      "--end", "2016-01-03T00:00:00Z"])
+        finally:
+            cli._client = self.client
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(client.calls, 2)
+        self.assertEqual(len(lines), 49)
+        self.assertEqual(len(set(lines)), 49)
+
+    def test_samples_api_error(self):
+        client = RangeClient()
+        self.client, cli._client = cli._client, lambda args: client
+        try:
+            with self.assertRaises(SystemExit):
+                cli.main(["samples", "--sensor", "unknown",
+                          "--start", "2016-01-01T00:00:00Z"])
+        finally:
+            cli._client = self.client
+
+    def test_missing_credentials(self):
+        with self.assertRaises(SystemExit):
+            cli.main(["samples", "--sensor", "s", "--start", "x",
+                      "--key", "", "--secret", ""])
+
+
+if __name__ == '__main__':
+    unittest.main()
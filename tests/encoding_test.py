@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio import encoding
+from neurio._samples import format_timestamp
+
+import json
+import unittest
+
+START = 1451606400  # 2016-01-01T00:00:00Z
+
+def minute_samples(n, start=START):
+    energy = 10 ** 10
+    samples = []
+    for i in range(n):
+        power = 400 + (i * 37) % 150
+        energy += power * 60
+        samples.append({
+            "timestamp": format_timestamp(start + 60 * i),
+            "consumptionPower": power,
+            "generationPower": 0,
+            "consumptionEnergy": energy,
+            "generationEnergy": 5,
+        })
+    return samples
+
+class EncodingTest(unittest.TestCase):
+    def test_round_trip(self):
+        samples = minute_samples(500)
+        block = encoding.encode_block(samples)
+        self.assertEqual(encoding.decode_block(block), samples)
+        size = len(json.dumps(samples))
+        self.assertLess(len(block) * 5, size)
+
+    def test_round_trip_floats_and_resets(self):
+        samples = minute_samples(10)
+        samples[3]["consumptionPower"] = 412.75
+        samples[6]["consumptionEnergy"] = 3
+        samples[7]["timestamp"] = "2016-01-01T00:07:00.250Z"
+        self.assertEqual(encoding.decode_block(encoding.encode_block(samples)),
+                         samples)
+
+    def test_block_index(self):
+        block = encoding.encode_block(minute_samples(10))
+        index = encoding.read_block_index(block)
+        self.assertEqual(index.count, 10)
+        self.assertEqual(index.start, START * 1000)
+        self.assertEqual(index.end, (START + 540) * 1000)
+        self.assertEqual(index.stats["generationEnergy"], (5, 5))
+
+    def test_store_query_and_serialize(self):
+        store = encoding.SeriesStore(block_size=100)
+        store.extend(minute_samples(250))
+        self.assertEqual(len(store.blocks), 2)
+        self.assertEqual(len(store), 250)
+        got = list(store.query(START + 60 * 150, START + 60 * 210))
+        self.assertEqual(len(got), 60)
+        self.assertEqual(got[0]["timestamp"],
+                         format_timestamp(START + 60 * 150))
+
+        copy = encoding.SeriesStore.loads(store.dumps())
+        self.assertEqual(list(copy.query()), list(store.query()))
+
+    def test_pending_samples_projected(self):
+        store = encoding.SeriesStore(block_size=2)
+        samples = minute_samples(3)
+        for sample in samples:
+            sample["sensorId"] = "0x1"
+            sample["timestamp"] = sample["timestamp"][:-1] + ".000Z"
+        store.extend(samples)
+        got = list(store.query())
+        self.assertEqual(len(store.blocks), 1)
+        self.assertEqual(sorted(got[2]), sorted(got[0]))
+        self.assertNotIn("sensorId", got[2])
+        self.assertEqual(got[2]["timestamp"], format_timestamp(START + 120))
+
+    def test_loads_rejects_garbage(self):
+        with self.assertRaises(ValueError):
+            encoding.SeriesStore.loads(b"garbage")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio import events
+from neurio._samples import format_timestamp
+
+import unittest
+
+START = 1451606400  # 2016-01-01T00:00:00Z
+
+# A kettle (2000 W) on at t=5 and off at t=15, over a noisy 300 W base load,
+# with a brief 400 W spike at t=20 that should not count.
+POWER = [300, 305, 298, 302, 300, 2300, 2310, 2295, 2305, 2300,
+         2302, 2298, 2300, 2305, 2301, 300, 302, 298, 301, 300,
+         700, 300, 301, 299, 300]
+TIMESTAMPS = [format_timestamp(START + t) for t in range(len(POWER))]
+
+class EventsTest(unittest.TestCase):
+    def test_edge_detector_cloud_samples(self):
+        detector = events.EdgeDetector(threshold=500, settle=3)
+        samples = [{"timestamp": t, "consumptionPower": p,
+                    "generationPower": 0} for t, p in zip(TIMESTAMPS, POWER)]
+        edges = list(detector.process(samples))
+        self.assertEqual([(e["type"], e["timestamp"]) for e in edges],
+                         [("on", TIMESTAMPS[5]), ("off", TIMESTAMPS[15])])
+        self.assertAlmostEqual(edges[0]["delta"], 2001.67, places=1)
+        self.assertEqual(edges[0]["channel"], "consumptionPower")
+
+    def test_edge_detector_local_channels(self):
+        detector = events.EdgeDetector(threshold=500, settle=1)
+        found = []
+        for t, p in zip(TIMESTAMPS, POWER):
+            found.extend(detector.update({"timestamp": t, "channels": [
+                {"type": "PHASE_A_CONSUMPTION", "ch": 1, "p_W": p},
+                {"type": "PHASE_B_CONSUMPTION", "ch": 2, "p_W": 100},
+            ]}))
+        # With settle=1 the edge is reported on the sample that caused it.
+        self.assertEqual(found[0]["timestamp"], TIMESTAMPS[5])
+        self.assertEqual(set(e["channel"] for e in found),
+                         set(["PHASE_A_CONSUMPTION"]))
+
+    def test_detect_edges_matches_streaming(self):
+        for settle in (1, 2, 3):
+            detector = events.EdgeDetector(threshold=300, settle=settle)
+            streamed = list(detector.process(
+                {"timestamp": t, "consumptionPower": p}
+                for t, p in zip(TIMESTAMPS, POWER)))
+            batch = events.detect_edges(TIMESTAMPS, POWER, threshold=300,
+                                        settle=settle,
+                                        channel="consumptionPower")
+            self.assertEqual(batch, streamed)
+
+    def test_match_events(self):
+        edges = events.detect_edges(TIMESTAMPS, POWER, threshold=500,
+                                    settle=3)
+        api_events = [
+            {"start": format_timestamp(START + 4),
+             "end": format_timestamp(START + 16)},
+            {"start": format_timestamp(START + 500),
+             "end": format_timestamp(START + 600)},
+        ]
+        result = events.match_events(edges, api_events, window=5)
+        self.assertEqual(len(result["matched"]), 2)
+        self.assertEqual(result["precision"], 1.0)
+        self.assertEqual(result["recall"], 0.5)
+        self.assertEqual(result["unmatched_events"], [api_events[1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
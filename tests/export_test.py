@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio import export
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+class FakeClient(object):
+    def __init__(self, n):
+        self.samples = [{
+            "timestamp": "2016-01-0%dT%02d:00:00Z" % (1 + i // 24, i % 24),
+            "consumptionPower": i,
+        } for i in range(n)]
+        self.calls = 0
+        self.ranges = []
+
+    def get_samples(self, sensor_id, start, granularity, end=None,
+                    frequency=None, per_page=None, page=None, full=False):
+        self.calls += 1
+        samples = self.samples
+        if start != "x":
+            self.ranges.append((start, end))
+            # Like the API, include a sample at the end of the range.
+            samples = [s for s in samples if start <= s["timestamp"] <= end]
+        return samples[(page - 1) * per_page:page * per_page]
+
+    def get_appliance_event_by_location(self, location_id, start, end,
+                                        per_page=None, page=None,
+                                        min_power=None):
+        self.ranges.append((start, end))
+        events = [{"id": "e%d" % i, "start": s["timestamp"],
+                   "energy": s["consumptionPower"]}
+                  for i, s in enumerate(self.samples)]
+        # An event starting at the end of the range is returned too.
+        events = [e for e in events if start <= e["start"] <= end]
+        return events[(page - 1) * per_page:page * per_page]
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_iter_pages(self):
+        client = FakeClient(25)
+        rows = list(export.iter_pages(client.get_samples, per_page=10,
+                                      sensor_id="s", start="x",
+                                      granularity="hours"))
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(client.calls, 3)
+
+    def test_iter_pages_error(self):
+        fetch = lambda **kwargs: {"status": 400, "errors": ["bad"]}
+        with self.assertRaises(ValueError):
+            list(export.iter_pages(fetch))
+
+    def test_export_csv_partitioned(self):
+        client = FakeClient(30)
+        paths = export.export_samples(client, "s1", "2016-01-01T00:00:00Z",
+                                      "hours", self.root,
+                                      end="2016-01-02T06:00:00Z",
+                                      format="csv", chunk_size=4)
+        self.assertEqual(paths, [
+            os.path.join(self.root, "s1", "2016-01-01.csv"),
+            os.path.join(self.root, "s1", "2016-01-02.csv"),
+        ])
+        with open(paths[0]) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 24)
+        self.assertEqual(rows[5]["consumptionPower"], "5")
+
+    def test_export_split_by_range(self):
+        client = FakeClient(30)
+        paths = export.export_samples(client, "s1", "2016-01-01T00:00:00Z",
+                                      "minutes", self.root,
+                                      end="2016-01-02T06:00:00Z",
+                                      format="csv")
+        self.assertEqual(client.ranges, [
+            ("2016-01-01T00:00:00Z", "2016-01-02T00:00:00Z"),
+            ("2016-01-02T00:00:00Z", "2016-01-02T06:00:00Z"),
+        ])
+        rows = []
+        for path in paths:
+            with open(path) as f:
+                rows.extend(csv.DictReader(f))
+        self.assertEqual([int(r["consumptionPower"]) for r in rows],
+                         list(range(30)))
+
+    def test_export_appliance_events(self):
+        client = FakeClient(30)
+        paths = export.export_appliance_events(
+            client, "loc", "2016-01-01T00:00:00Z", "2016-01-02T06:00:00Z",
+            self.root, format="csv")
+        self.assertEqual(len(client.ranges), 2)
+        rows = []
+        for path in paths:
+            with open(path) as f:
+                rows.extend(csv.DictReader(f))
+        self.assertEqual([r["id"] for r in rows],
+                         ["e%d" % i for i in range(30)])
+
+    def test_export_long_appliance_event(self):
+        class LongEventClient(object):
+            def get_appliance_event_by_location(self, location_id, start, end,
+                                                per_page=None, page=None,
+                                                min_power=None):
+                # One event running across every window, and one per window.
+                events = [{"id": "long", "start": "2016-01-01T12:00:00Z"},
+                          {"id": start, "start": start}]
+                return events if page == 1 else []
+        paths = export.export_appliance_events(
+            LongEventClient(), "loc", "2016-01-01T00:00:00Z",
+            "2016-01-04T00:00:00Z", self.root, format="csv")
+        rows = []
+        for path in paths:
+            with open(path) as f:
+                rows.extend(csv.DictReader(f))
+        self.assertEqual(sorted(r["id"] for r in rows), sorted(
+            ["long", "2016-01-01T00:00:00Z", "2016-01-02T00:00:00Z",
+             "2016-01-03T00:00:00Z"]))
+
+    def test_partitioned_out_of_order(self):
+        exporter = export.PartitionedExporter(self.root, "csv")
+        exporter.write("s1", {"timestamp": "2016-01-01T00:00:00Z"})
+        exporter.write("s1", {"timestamp": "2016-01-02T00:00:00Z"})
+        with self.assertRaises(ValueError):
+            exporter.write("s1", {"timestamp": "2016-01-01T01:00:00Z"})
+        exporter.write("s2", {"timestamp": "2016-01-01T00:00:00Z"})
+        exporter.close()
+        self.assertEqual(len(exporter.paths), 3)
+        with open(exporter.paths[0]) as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 1)
+
+    def test_csv_nested(self):
+        path = os.path.join(self.root, "out.csv")
+        w = export.CsvWriter(path)
+        w.write({"timestamp": "t", "channelSamples": [{"channel": 1}]})
+        w.close()
+        with open(path) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(rows[0]["channelSamples"], '[{"channel": 1}]')
+
+    def test_csv_flush_reaches_file(self):
+        path = os.path.join(self.root, "out.csv")
+        with open(path, "w") as target:
+            w = export.CsvWriter(target)
+            w.write({"timestamp": "t"})
+            w.flush()
+            with open(path) as f:
+                self.assertEqual(f.read().splitlines(), ["timestamp", "t"])
+
+    @unittest.skipIf(export.default_format() != "parquet",
+                     "pyarrow not installed")
+    def test_export_parquet(self):
+        import pyarrow.parquet
+        client = FakeClient(30)
+        paths = export.export_samples(client, "s1", "2016-01-01T00:00:00Z",
+                                      "hours", self.root,
+                                      end="2016-01-02T06:00:00Z",
+                                      format="parquet", chunk_size=4)
+        table = pyarrow.parquet.read_table(paths[0])
+        self.assertEqual(table.num_rows, 24)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio.hub import Hub, HubServer
+
+import json
+import unittest
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+class Counter(object):
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self):
+        self.n += 1
+        # Each timestamp is reported twice, as a sensor would between updates.
+        return {"timestamp": "2016-01-01T00:00:%02dZ" % (self.n // 2),
+                "consumptionPower": self.n}
+
+class HubTest(unittest.TestCase):
+    def test_dedupe_and_fan_out(self):
+        hub = Hub()
+        source = hub.add_source("s1", Counter())
+        a = hub.subscribe("s1")
+        b = hub.subscribe()
+        other = hub.subscribe("s2")
+        for _ in range(4):
+            source.poll()
+        self.assertEqual(len(a), 3)
+        self.assertEqual(len(b), 3)
+        self.assertEqual(len(other), 0)
+        self.assertEqual(a.get()[0], "s1")
+        self.assertEqual(hub.latest("s1")["consumptionPower"], 4)
+
+    def test_unsynchronized_always_new(self):
+        hub = Hub()
+        source = hub.add_source("ip", lambda: {"timestamp": "NOT_SYNCHRONIZED",
+                                               "channels": []})
+        sub = hub.subscribe()
+        for _ in range(5):
+            source.poll()
+        self.assertEqual(len(sub), 5)
+        self.assertEqual(hub.status()["ip"]["errors"], 0)
+
+    def test_typed_samples(self):
+        from neurio.models import Sample
+        hub = Hub()
+        source = hub.add_source("s1", lambda: [Sample(
+            {"timestamp": "2016-01-01T00:00:00.000Z", "consumptionPower": 5})])
+        source.poll()
+        source.poll()
+        self.assertEqual(hub.status()["s1"]["errors"], 0)
+        self.assertEqual(hub.latest("s1"), {
+            "timestamp": "2016-01-01T00:00:00.000Z", "consumptionPower": 5.0,
+            "consumptionEnergy": None, "generationPower": None,
+            "generationEnergy": None})
+        self.assertEqual(hub.status()["s1"]["polls"], 2)
+
+    def test_slow_consumer_drops_oldest(self):
+        hub = Hub()
+        source = hub.add_source("s1", Counter())
+        slow = hub.subscribe("s1", maxsize=2)
+        for _ in range(10):
+            source.poll()
+        self.assertEqual(len(slow), 2)
+        self.assertEqual(slow.dropped, 4)
+        self.assertEqual(slow.get()[1]["consumptionPower"], 8)
+
+    def test_errors_counted(self):
+        hub = Hub()
+        def fail():
+            raise IOError("unreachable")
+        source = hub.add_source("s1", fail)
+        source.poll()
+        self.assertEqual(hub.status()["s1"]["errors"], 1)
+
+    def test_close_unblocks(self):
+        hub = Hub()
+        sub = hub.subscribe()
+        sub.close()
+        self.assertIsNone(sub.get(timeout=1))
+        self.assertEqual(list(sub), [])
+
+    def test_server(self):
+        hub = Hub()
+        source = hub.add_source("s1", Counter())
+        server = HubServer(hub).start()
+        try:
+            host, port = server.address
+            base = "http://%s:%d" % (host, port)
+            source.poll()
+            latest = json.loads(urlopen(base + "/sensors/s1/latest").read())
+            self.assertEqual(latest["consumptionPower"], 1)
+
+            stream = urlopen(base + "/sensors/s1/events", timeout=5)
+            source.poll()
+            source.poll()
+            lines = [stream.readline() for _ in range(3)]
+            self.assertEqual(lines[0].strip(), b"event: sample")
+            self.assertEqual(lines[1].strip(), b"id: 1")
+            data = json.loads(lines[2][6:])
+            self.assertEqual(data["consumptionPower"], 2)
+            self.assertEqual(data["source"], "s1")
+            stream.close()
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
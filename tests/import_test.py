@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run(code):
+    return subprocess.check_output([sys.executable, "-c", code],
+                                   cwd=ROOT).decode().strip()
+
+def import_time(module):
+    """Best of five fresh-interpreter import times, in seconds."""
+    code = ("import time; t = time.time(); import %s; "
+            "print(time.time() - t)" % module)
+    return min(float(run(code)) for _ in range(5))
+
+class ImportTest(unittest.TestCase):
+    def test_http_stack_not_imported(self):
+        loaded = run("import sys, neurio, neurio.local; print(' '.join("
+                     "m for m in ('requests', 'urllib3', 'http.client', "
+                     "'httpx', 'numpy', 'pyarrow', 'neurio.models') "
+                     "if m in sys.modules))")
+        self.assertEqual(loaded, "")
+
+    def test_import_time(self):
+        try:
+            import requests
+        except ImportError:
+            self.skipTest("requests is not installed")
+        neurio_time = import_time("neurio")
+        requests_time = import_time("requests")
+        sys.stderr.write("\nimport neurio: %.1f ms, import requests: %.1f ms\n"
+                         % (neurio_time * 1000, requests_time * 1000))
+        # Importing neurio must stay well below what the HTTP stack costs.
+        self.assertLess(neurio_time, requests_time / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
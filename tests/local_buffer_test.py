@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio.local import LocalSampleBuffer, LocalPoller, LocalConnection
+
+import json
+import threading
+import time
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+def make_sample(second, power):
+    return {
+        "timestamp": "2016-01-01T00:00:%02dZ" % second,
+        "channels": [
+            {"type": "PHASE_A_CONSUMPTION", "ch": 1, "p_W": power / 2},
+            {"type": "CONSUMPTION", "ch": 2, "p_W": power, "eImp_Ws": second},
+        ],
+    }
+
+class LocalBufferTest(unittest.TestCase):
+    def test_latest_after_wrap(self):
+        buf = LocalSampleBuffer(4)
+        for i in range(10):
+            buf.write(make_sample(i, 100 * i))
+        window = buf.latest()
+        self.assertEqual(len(window), 4)
+        self.assertEqual(list(window.field("CONSUMPTION", "p_W")),
+                         [600, 700, 800, 900])
+        self.assertEqual(list(window.field(0, "p_W")), [300, 350, 400, 450])
+        self.assertTrue(window.is_valid())
+
+    def test_latest_seconds(self):
+        buf = LocalSampleBuffer(10)
+        for i in range(8):
+            buf.write(make_sample(i, i))
+        window = buf.latest(seconds=2)
+        self.assertEqual(list(window.field("CONSUMPTION", "eImp_Ws")),
+                         [5, 6, 7])
+
+    def test_window_invalidated_by_writer(self):
+        buf = LocalSampleBuffer(4)
+        for i in range(4):
+            buf.write(make_sample(i, i))
+        window = buf.latest(count=2)
+        buf.write(make_sample(4, 4))
+        buf.write(make_sample(5, 5))
+        self.assertTrue(window.is_valid())
+        buf.write(make_sample(6, 6))
+        self.assertFalse(window.is_valid())
+
+    def test_unsynchronized_timestamp(self):
+        buf = LocalSampleBuffer(2)
+        sample = make_sample(0, 1)
+        sample["timestamp"] = "NOT_SYNCHRONIZED"
+        buf.write(sample)
+        self.assertAlmostEqual(buf.latest().timestamps[0], time.time(),
+                               delta=5)
+
+    def test_poller(self):
+        buf = LocalSampleBuffer(100)
+        calls = []
+        def fetch(ip):
+            calls.append(ip)
+            if len(calls) == 2:
+                raise IOError("timeout")
+            return make_sample(len(calls), 1)
+        poller = LocalPoller("10.0.0.2", buf, interval=0.01, fetch=fetch)
+        poller.start()
+        time.sleep(0.1)
+        poller.stop()
+        self.assertGreater(len(buf), 2)
+        self.assertEqual(poller.errors, 1)
+
+
+class DeviceServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class DeviceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    drop_idle = False
+
+    def do_GET(self):
+        DeviceHandler.connections.add(self.client_address)
+        # Close without telling the client, like a device timing out an idle
+        # keep-alive connection.
+        self.close_connection = DeviceHandler.drop_idle
+        body = json.dumps(make_sample(1, 500)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class LocalConnectionTest(unittest.TestCase):
+    def setUp(self):
+        DeviceHandler.connections = set()
+        DeviceHandler.drop_idle = False
+        self.server = DeviceServer(("127.0.0.1", 0), DeviceHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.host = "127.0.0.1:%d" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused(self):
+        conn = LocalConnection(self.host, timeout=5)
+        for _ in range(3):
+            sample = conn.current_sample()
+        self.assertEqual(sample["channels"][1]["p_W"], 500)
+        self.assertEqual(len(DeviceHandler.connections), 1)
+        conn.close()
+
+    def test_reconnect_after_close(self):
+        DeviceHandler.drop_idle = True
+        conn = LocalConnection(self.host, timeout=5)
+        for _ in range(3):
+            self.assertEqual(conn.current_sample()["timestamp"],
+                             "2016-01-01T00:00:01Z")
+            time.sleep(0.05)
+        self.assertEqual(len(DeviceHandler.connections), 3)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio.metrics import MetricsPipeline, SlidingMetrics, RingBuffer
+
+import unittest
+
+def make_sample(ts, consumption, generation=0, c_energy=0, g_energy=0):
+    return {
+        "timestamp": "2016-01-01T00:00:%02dZ" % ts,
+        "consumptionPower": consumption,
+        "generationPower": generation,
+        "consumptionEnergy": c_energy,
+        "generationEnergy": g_energy,
+    }
+
+class MetricsTest(unittest.TestCase):
+    def test_ring_buffer(self):
+        rb = RingBuffer(3)
+        for v in (1, 2, 3, 4):
+            rb.append(v)
+        self.assertEqual(rb.values(), [2, 3, 4])
+        self.assertEqual(rb.sum, 9)
+        self.assertEqual(rb.mean, 3)
+
+    def test_rolling_mean_and_net(self):
+        m = SlidingMetrics(window=2)
+        m.update(make_sample(0, 100, 50))
+        m.update(make_sample(1, 200, 50))
+        snap = m.update(make_sample(2, 400, 100))
+        self.assertEqual(snap["netPower"], 300)
+        self.assertEqual(snap["meanConsumptionPower"], 300)
+        self.assertEqual(snap["meanNetPower"], 225)
+        self.assertEqual(snap["windowSize"], 2)
+
+    def test_peak_leaves_window(self):
+        m = SlidingMetrics(window=2)
+        m.update(make_sample(0, 900))
+        snap = m.update(make_sample(1, 100))
+        self.assertEqual(snap["peakConsumptionPower"], 900)
+        snap = m.update(make_sample(2, 200))
+        self.assertEqual(snap["peakConsumptionPower"], 200)
+        self.assertEqual(snap["peakTimestamp"], "2016-01-01T00:00:02Z")
+
+    def test_energy_deltas_with_reset(self):
+        m = SlidingMetrics(window=10)
+        m.update(make_sample(0, 0, c_energy=1000))
+        snap = m.update(make_sample(1, 0, c_energy=1500))
+        self.assertEqual(snap["consumptionEnergyDelta"], 500)
+        snap = m.update(make_sample(2, 0, c_energy=200))
+        self.assertEqual(snap["consumptionEnergyDelta"], 200)
+        self.assertEqual(snap["windowConsumptionEnergy"], 700)
+        self.assertEqual(m.counter_resets, 1)
+
+    def test_local_sample(self):
+        m = SlidingMetrics()
+        snap = m.update({
+            "timestamp": "2016-01-01T00:00:00Z",
+            "channels": [
+                {"type": "CONSUMPTION", "p_W": 1200, "eImp_Ws": 10},
+                {"type": "GENERATION", "p_W": 300, "eImp_Ws": 5},
+            ],
+        })
+        self.assertEqual(snap["netPower"], 900)
+
+    def test_pipeline(self):
+        p = MetricsPipeline(window=5)
+        out = list(p.process("a", [make_sample(i, i) for i in range(3)]))
+        p.update("b", make_sample(0, 7))
+        self.assertEqual(len(out), 3)
+        self.assertEqual(len(p), 2)
+        self.assertEqual(p.snapshot("a")["meanConsumptionPower"], 1)
+        self.assertIsNone(p.snapshot("c"))
+
+
+if __name__ == '__main__':
+    unittest.main()
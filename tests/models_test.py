@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+import neurio
+from neurio import models
+from neurio._samples import as_dict
+from neurio.export import iter_pages
+from neurio.metrics import SlidingMetrics
+from neurio.rollup import RollupStore
+from neurio.transport import Transport
+
+import unittest
+
+SAMPLE = {
+    "timestamp": "2016-01-01T00:05:00.000Z",
+    "consumptionPower": "1250",
+    "consumptionEnergy": 123456789,
+    "generationPower": 0,
+    "generationEnergy": 0,
+}
+
+class FakeResponse(object):
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+class FakeTransport(Transport):
+    def __init__(self, responses):
+        super(FakeTransport, self).__init__()
+        self.responses = list(responses)
+
+    def _send(self, method, url, headers, data):
+        return FakeResponse(self.responses.pop(0))
+
+class ModelsTest(unittest.TestCase):
+    def test_lazy_conversion(self):
+        s = models.Sample(SAMPLE)
+        self.assertEqual(s._consumption_power, "1250")
+        self.assertEqual(s.consumption_power, 1250.0)
+        self.assertEqual(s._consumption_power, 1250.0)
+        self.assertEqual(s.consumption_power, 1250.0)
+        self.assertEqual(s.timestamp.isoformat(), "2016-01-01T00:05:00+00:00")
+
+    def test_slots(self):
+        s = models.Sample(SAMPLE)
+        self.assertFalse(hasattr(s, "__dict__"))
+        with self.assertRaises(AttributeError):
+            s.other = 1
+
+    def test_nested(self):
+        full = models.FullSample(dict(SAMPLE, channelSamples=[
+            {"channel": "1", "channelType": "phase_a", "power": 600},
+        ]))
+        self.assertEqual(full.consumption_power, 1250.0)
+        self.assertEqual(full.channel_samples[0].channel, 1)
+        self.assertEqual(full.channel_samples[0].channel_type, "phase_a")
+
+        event = models.ApplianceEvent({
+            "id": "e1", "start": "2016-01-01T00:00:00Z", "end": None,
+            "energy": 5000, "appliance": {"id": "a1", "label": "Kettle"}})
+        self.assertIsNone(event.end)
+        self.assertEqual(event.appliance.label, "Kettle")
+        self.assertEqual(event.to_dict()["energy"], 5000.0)
+
+    def test_decode(self):
+        self.assertIsInstance(models.decode([SAMPLE], models.Sample)[0],
+                              models.Sample)
+        error = {"status": 400, "errors": ["bad"]}
+        self.assertIs(models.decode(error, models.Sample), error)
+
+    def test_typed_client(self):
+        t = FakeTransport([{"access_token": "abc"}, [SAMPLE], [SAMPLE]])
+        tp = neurio.TokenProvider(key="k", secret="s", transport=t)
+        typed = neurio.Client(token_provider=tp, transport=t, typed=True)
+        samples = typed.get_samples_live("0x1")
+        self.assertEqual(samples[0].consumption_energy, 123456789.0)
+        plain = neurio.Client(token_provider=tp, transport=t)
+        self.assertEqual(plain.get_samples_live("0x1"), [SAMPLE])
+
+    def test_as_dict(self):
+        full = models.FullSample(dict(SAMPLE, channelSamples=[
+            {"channel": "1", "power": 600}]))
+        full.timestamp
+        plain = as_dict(full)
+        self.assertEqual(plain["timestamp"], SAMPLE["timestamp"])
+        self.assertEqual(plain["consumptionPower"], 1250.0)
+        self.assertEqual(plain["channelSamples"][0]["channel"], 1)
+        self.assertIs(as_dict(SAMPLE), SAMPLE)
+
+    def test_typed_results_accepted(self):
+        typed = models.decode([SAMPLE, dict(SAMPLE,
+            timestamp="2016-01-01T00:10:00.000Z",
+            consumptionEnergy=123456789 + 3000)], models.Sample)
+        pages = [typed]
+        rows = list(iter_pages(lambda **kwargs: pages.pop(0), per_page=5))
+        self.assertEqual(rows[1]["timestamp"], "2016-01-01T00:10:00.000Z")
+
+        metrics = SlidingMetrics(10)
+        for sample in typed:
+            snapshot = metrics.update(sample)
+        self.assertEqual(snapshot["consumptionEnergyDelta"], 3000.0)
+
+        store = RollupStore("0x1")
+        store.ingest_many(typed)
+        self.assertEqual(store.points("hours", "2016-01-01T00:00:00Z",
+                                      "2016-01-01T01:00:00Z")[0]["count"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio.hub import Hub
+from neurio.openmetrics import OpenMetricsCollector, OpenMetricsServer
+
+import time
+import unittest
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+CLOUD = {
+    "timestamp": "2016-01-01T00:00:00Z",
+    "consumptionPower": 1200,
+    "consumptionEnergy": 5000,
+    "generationPower": 300,
+    "generationEnergy": 700,
+}
+LOCAL = {
+    "timestamp": "NOT_SYNCHRONIZED",
+    "channels": [
+        {"type": "PHASE_A_CONSUMPTION", "ch": 1, "p_W": 600, "q_VAR": 10,
+         "v_V": 121.5, "eImp_Ws": 100, "eExp_Ws": 0},
+    ],
+}
+
+def failing():
+    raise IOError("unreachable")
+
+class OpenMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.hub = Hub()
+        self.cloud = self.hub.add_source("0x1", lambda: [CLOUD], interval=5)
+        self.local = self.hub.add_source("10.0.0.2", lambda: LOCAL,
+                                         interval=1)
+        self.down = self.hub.add_source("0x2", failing, interval=5)
+        for source in (self.cloud, self.local, self.down):
+            source.poll()
+
+    def test_render(self):
+        text = OpenMetricsCollector(self.hub).render()
+        lines = text.splitlines()
+        self.assertEqual(lines[-1], "# EOF")
+        self.assertIn('neurio_power_watts{channel="consumption",'
+                      'sensor="0x1"} 1200.0', lines)
+        self.assertIn('neurio_energy_imported_joules_total{'
+                      'channel="generation",sensor="0x1"} 700.0', lines)
+        self.assertIn('neurio_voltage_volts{channel="phase_a_consumption",'
+                      'sensor="10.0.0.2"} 121.5', lines)
+        self.assertIn('neurio_sample_timestamp_seconds{sensor="0x1"} '
+                      '1451606400.0', lines)
+        self.assertNotIn('neurio_sample_timestamp_seconds{'
+                         'sensor="10.0.0.2"}', text)
+        self.assertIn('neurio_up{sensor="0x1"} 1', lines)
+        self.assertIn('neurio_up{sensor="0x2"} 0', lines)
+        self.assertIn('neurio_poll_errors_total{sensor="0x2"} 1', lines)
+        self.assertEqual(lines.count("# TYPE neurio_power_watts gauge"), 1)
+
+    def test_stale(self):
+        collector = OpenMetricsCollector(self.hub)
+        # Three intervals later the local device is stale, the cloud
+        # sensor is not.
+        text = collector.render(now=time.time() + 4)
+        self.assertIn('neurio_up{sensor="10.0.0.2"} 0', text)
+        self.assertNotIn('sensor="10.0.0.2"} 600.0', text)
+        self.assertIn('neurio_up{sensor="0x1"} 1', text)
+        text = OpenMetricsCollector(self.hub, stale_after=60).render(
+            now=time.time() + 4)
+        self.assertIn('neurio_up{sensor="10.0.0.2"} 1', text)
+
+    def test_removed_source(self):
+        collector = OpenMetricsCollector(self.hub)
+        first = collector.render()
+        self.hub.remove_source("0x1")
+        second = collector.render()
+        self.assertIn('sensor="0x1"', first)
+        self.assertNotIn('sensor="0x1"', second)
+
+    def test_server(self):
+        server = OpenMetricsServer(self.hub).start()
+        try:
+            r = urlopen("http://%s:%d/metrics" % server.address)
+            self.assertTrue(r.headers["Content-Type"].startswith(
+                "application/openmetrics-text"))
+            body = r.read().decode()
+        finally:
+            server.stop()
+        self.assertTrue(body.endswith("# EOF\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()
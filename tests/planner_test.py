@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio._samples import MAX_RANGE, parse_timestamp, format_timestamp
+from neurio.planner import plan_query, query_samples
+
+import unittest
+
+START = parse_timestamp("2016-01-01T00:00:00Z")
+DAY = 86400
+
+class FakeClient(object):
+    """Serves points every ``frequency`` units, including ``end`` like the
+    API does, and checks the range caps."""
+    widths = {"minutes": 60, "hours": 3600, "days": DAY}
+
+    def __init__(self):
+        self.calls = []
+
+    def get_samples(self, sensor_id, start, granularity, end=None,
+                    frequency=None, per_page=None, page=None, full=False):
+        self.calls.append((start, end, granularity, frequency, per_page,
+                           page))
+        lo = parse_timestamp(start)
+        hi = parse_timestamp(end)
+        if hi - lo > MAX_RANGE[granularity]:
+            return {"status": 400, "errors": ["range too large"]}
+        step = self.widths[granularity] * frequency
+        points = []
+        t = lo
+        while t <= hi:
+            points.append({"timestamp": format_timestamp(t),
+                           "consumptionPower": t})
+            t += step
+        first = (page - 1) * per_page
+        return points[first:first + per_page]
+
+class PlannerTest(unittest.TestCase):
+    def test_choices(self):
+        plan = plan_query("0x1", START, START + DAY, max_points=500)
+        self.assertEqual((plan.granularity, plan.frequency), ("minutes", 5))
+        plan = plan_query("0x1", START, START + DAY, max_points=24)
+        self.assertEqual((plan.granularity, plan.frequency), ("hours", 1))
+        plan = plan_query("0x1", START, START + 30 * DAY, max_points=500)
+        self.assertEqual((plan.granularity, plan.frequency), ("minutes", 90))
+        self.assertEqual(plan.requests, 30)
+        # 18-hour steps would need a request per day; days need 14.
+        plan = plan_query("0x1", START, START + 365 * DAY, max_points=500)
+        self.assertEqual((plan.granularity, plan.frequency), ("days", 1))
+        self.assertEqual(plan.requests, 14)
+        plan = plan_query("0x1", START, START + 365 * DAY, max_points=500,
+                          slack=1)
+        self.assertEqual(plan.granularity, "minutes")
+        plan = plan_query("0x1", START, START + 20 * 365 * DAY, max_points=10)
+        self.assertEqual((plan.granularity, plan.frequency), ("years", 2))
+        self.assertEqual(plan.points, 10)
+
+    def test_windows_within_caps(self):
+        for days, max_points in ((3, 500), (90, 200), (400, 50), (4000, 30)):
+            plan = plan_query("0x1", START, START + days * DAY, max_points)
+            self.assertLessEqual(plan.points, max_points)
+            for start, end in plan.windows:
+                self.assertLessEqual(end - start,
+                                     MAX_RANGE[plan.granularity])
+            self.assertEqual(plan.windows[0][0], START)
+            self.assertEqual(plan.windows[-1][1], START + days * DAY)
+
+    def test_execute(self):
+        client = FakeClient()
+        samples = query_samples(client, "0x1", START, START + 3 * DAY,
+                                max_points=100)
+        times = [parse_timestamp(s["timestamp"]) for s in samples]
+        self.assertEqual(len(client.calls), 3)
+        self.assertTrue(all(c[2:4] == ("minutes", 45) for c in client.calls))
+        self.assertEqual(times, [START + i * 2700 for i in range(96)])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            plan_query("0x1", START, START, 10)
+        with self.assertRaises(ValueError):
+            plan_query("0x1", START, START + 100 * 365 * DAY, max_points=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
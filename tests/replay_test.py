@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+import neurio
+from neurio.replay import (RecordingTransport, Replayer, StandInServer,
+                           read_recording)
+from neurio.transport import Transport, get_transport
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+class FakeResponse(object):
+    status_code = 200
+
+    def __init__(self, data):
+        self.content = json.dumps(data).encode()
+
+    def json(self):
+        return json.loads(self.content.decode())
+
+class FakeTransport(Transport):
+    def _send(self, method, url, headers, data):
+        if url.endswith("/oauth2/token"):
+            return FakeResponse({"access_token": "abc"})
+        return FakeResponse([{"timestamp": "2016-01-01T00:00:00Z",
+                              "consumptionPower": 100}])
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def record(self, name, bodies):
+        path = os.path.join(self.dir, name)
+        t = RecordingTransport(path, FakeTransport(), bodies=bodies)
+        tp = neurio.TokenProvider(key="k", secret="s", transport=t)
+        nc = neurio.Client(token_provider=tp, transport=t)
+        nc.get_samples_live("0x1")
+        nc.get_samples("0x1", "2016-01-01T00:00:00Z", "minutes")
+        t.close()
+        self.assertEqual(t.count, 3)
+        return list(read_recording(path))
+
+    def test_record(self):
+        records = self.record("trace.jsonl.gz", bodies=False)
+        self.assertEqual([r["method"] for r in records],
+                         ["POST", "GET", "GET"])
+        self.assertEqual(records[1]["url"],
+                         "https://api.neur.io/v1/samples/live")
+        self.assertEqual(records[1]["params"], {"sensorId": "0x1"})
+        self.assertEqual(records[2]["params"]["granularity"], "minutes")
+        self.assertEqual(records[1]["size"], len(json.dumps(
+            [{"timestamp": "2016-01-01T00:00:00Z", "consumptionPower": 100}])))
+        self.assertNotIn("body", records[1])
+        self.assertNotIn("abc", json.dumps(records[1:]))
+
+    def test_tokens_redacted(self):
+        records = self.record("trace.jsonl", bodies=True)
+        self.assertEqual(json.loads(records[0]["body"])["access_token"],
+                         "REDACTED")
+        self.assertNotIn("abc", json.dumps(records))
+
+    def test_replay_against_stand_in(self):
+        records = self.record("trace.jsonl", bodies=True) * 5
+        for i, record in enumerate(records):
+            record["t"] = i * 0.02
+        server = StandInServer(records, latency=False).start()
+        try:
+            report = Replayer(records, speed=4, workers=2,
+                              base_url=server.url).run()
+            r = get_transport().get(
+                server.url + "/v1/samples/live?sensorId=0x1")
+            self.assertEqual(r.json()[0]["consumptionPower"], 100)
+            self.assertEqual(get_transport().get(
+                server.url + "/v1/unknown").status_code, 404)
+        finally:
+            server.stop()
+        self.assertEqual(report["requests"], 15)
+        self.assertEqual(report["errors"], 0)
+        self.assertEqual(report["statuses"], {200: 15})
+        # Token bodies are served as recorded, i.e. redacted.
+        self.assertEqual(report["bytes"],
+                         sum(len(r["body"]) for r in records))
+        self.assertLess(report["duration"], 1.0)
+        self.assertLessEqual(report["latency"]["p50"],
+                             report["latency"]["max"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio import rollup
+from neurio._samples import format_timestamp, parse_timestamp
+
+import unittest
+
+START = 1451606400  # 2016-01-01T00:00:00Z
+
+def minute_samples(n, start=START):
+    return [{
+        "timestamp": format_timestamp(start + 60 * i),
+        "consumptionPower": 100 + i % 60,
+        "generationPower": 0,
+        "consumptionEnergy": 1000 + 6000 * i,
+        "generationEnergy": 0,
+    } for i in range(n)]
+
+class FakeClient(object):
+    def __init__(self):
+        self.calls = []
+
+    def get_samples(self, sensor_id, start, granularity, end=None,
+                    frequency=None, per_page=None, page=None, full=False):
+        self.calls.append((start, end, granularity, frequency))
+        t = parse_timestamp(start)
+        samples = []
+        while t < parse_timestamp(end):
+            samples.append({"timestamp": format_timestamp(t),
+                            "consumptionPower": 50,
+                            "consumptionEnergy": int(t)})
+            t += 3600 if granularity == "hours" else 86400
+        return samples[(page - 1) * per_page:page * per_page]
+
+class RollupTest(unittest.TestCase):
+    def test_tiers(self):
+        store = rollup.RollupStore()
+        store.ingest_many(minute_samples(180))
+        hours = store.points("hours", START, START + 3 * 3600)
+        self.assertEqual(len(hours), 3)
+        self.assertEqual(hours[1]["count"], 60)
+        self.assertEqual(hours[1]["minConsumptionPower"], 100)
+        self.assertEqual(hours[1]["maxConsumptionPower"], 159)
+        self.assertEqual(hours[1]["meanConsumptionPower"], 129.5)
+        self.assertEqual(hours[1]["consumptionEnergy"], 60 * 6000)
+        days = store.points("days", START, START + 86400)
+        self.assertEqual(days[0]["count"], 180)
+        months = store.points("months", START, START + 86400)
+        self.assertEqual(months[0]["end"], "2016-02-01T00:00:00Z")
+
+    def test_choose_tier(self):
+        store = rollup.RollupStore()
+        self.assertEqual(store.choose_tier(START, START + 3600, 100),
+                         "minutes")
+        self.assertEqual(store.choose_tier(START, START + 86400, 100),
+                         "hours")
+        self.assertEqual(store.choose_tier(START, START + 365 * 86400, 500),
+                         "days")
+        self.assertEqual(store.choose_tier(START, START + 365 * 86400, 20),
+                         "months")
+
+    def test_query_local(self):
+        store = rollup.RollupStore("s")
+        store.ingest_many(minute_samples(24 * 60))
+        client = FakeClient()
+        tier, points = store.query(START, START + 86400, 24, client=client)
+        self.assertEqual(tier, "hours")
+        self.assertEqual(len(points), 24)
+        self.assertEqual(client.calls, [])
+
+    def test_coverage(self):
+        store = rollup.RollupStore()
+        store.ingest(minute_samples(1, START + 10 * 3600 + 30)[0])
+        self.assertFalse(store.covers("days", START, START + 86400))
+        self.assertFalse(store.covers("minutes", START + 10 * 3600,
+                                      START + 10 * 3600 + 60))
+        store.ingest_many(minute_samples(60, START + 10 * 3600 + 90))
+        # Covered from 10:00:30, so the 10:00 hour is still partial.
+        self.assertFalse(store.covers("hours", START + 10 * 3600,
+                                      START + 11 * 3600))
+        self.assertTrue(store.covers("minutes", START + 10 * 3600 + 60,
+                                     START + 11 * 3600))
+
+        store = rollup.RollupStore()
+        store.ingest_many(minute_samples(60, START + 10 * 3600))
+        self.assertTrue(store.covers("hours", START + 10 * 3600,
+                                     START + 11 * 3600))
+        self.assertFalse(store.covers("days", START, START + 86400))
+
+    def test_query_fallback(self):
+        store = rollup.RollupStore("s")
+        store.ingest_many(minute_samples(60))
+        client = FakeClient()
+        end = START + 60 * 86400
+        tier, points = store.query(START, end, 100, client=client)
+        self.assertEqual(tier, "days")
+        self.assertEqual(len(points), 60)
+        # The first day was only partly ingested, so the API's day replaces
+        # it.
+        self.assertEqual(points[0]["count"], 1)
+        self.assertEqual(points[0]["meanConsumptionPower"], 50)
+        self.assertEqual([p["consumptionEnergy"] for p in points],
+                         [86400] * 60)
+        self.assertTrue(all(c[2:] == ("days", 1) for c in client.calls))
+        self.assertEqual(len(client.calls), 3)
+        store.query(START, end, 100, client=client)
+        self.assertEqual(len(client.calls), 3)
+
+    def test_complete_bucket_kept(self):
+        store = rollup.RollupStore("s")
+        store.ingest_many(minute_samples(24 * 60 + 1))
+        client = FakeClient()
+        tier, points = store.query(START, START + 30 * 86400, 100,
+                                   client=client)
+        self.assertEqual(tier, "days")
+        self.assertEqual(points[0]["count"], 24 * 60)
+        self.assertEqual(points[1]["meanConsumptionPower"], 50)
+
+    def test_minutes_fall_back_to_hours(self):
+        store = rollup.RollupStore("s")
+        client = FakeClient()
+        tier, points = store.query(START, START + 3600 * 6, 500,
+                                   client=client)
+        self.assertEqual(tier, "hours")
+        self.assertEqual(len(points), 6)
+        self.assertEqual(points[0]["end"], format_timestamp(START + 3600))
+        self.assertEqual([p["consumptionEnergy"] for p in points],
+                         [3600] * 6)
+        self.assertTrue(all(c[2:] == ("hours", 1) for c in client.calls))
+        self.assertEqual(store.points("minutes", START, START + 3600), [])
+        with self.assertRaises(ValueError):
+            store.fetch(client, "minutes", START, START + 3600)
+
+
+if __name__ == '__main__':
+    unittest.main()
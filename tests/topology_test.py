@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+from neurio.topology import Topology
+
+import time
+import unittest
+
+def user_info(locations):
+    return {"id": "u1", "name": "User", "locations": [
+        {"id": loc, "name": loc, "sensors": [
+            {"id": "s-%s-%d" % (loc, n), "sensorId": sensor,
+             "sensorType": "neurio", "ipAddress": "10.0.0.%d" % n}
+            for n, sensor in enumerate(sensors, 1)]}
+        for loc, sensors in locations]}
+
+class FakeClient(object):
+    def __init__(self):
+        self.locations = [("loc1", ["0x1", "0x2"]), ("loc2", ["0x3"])]
+        self.calls = []
+
+    def get_user_information(self):
+        self.calls.append("user")
+        return user_info(self.locations)
+
+    def get_appliances(self, location_id):
+        self.calls.append(location_id)
+        if location_id == "bad":
+            return {"status": 500, "errors": ["unavailable"]}
+        return [{"id": "%s-a%d" % (location_id, n), "label": "Kettle"}
+                for n in range(2)]
+
+class TopologyTest(unittest.TestCase):
+    def test_lookups(self):
+        client = FakeClient()
+        topology = Topology(client)
+        self.assertEqual(topology.location_of("0x2"), "loc1")
+        self.assertEqual(topology.sensors_of("loc1"), ["0x1", "0x2"])
+        self.assertEqual(topology.ip_of("0x3"), "10.0.0.1")
+        self.assertEqual([a["id"] for a in topology.appliances_of("loc2")],
+                         ["loc2-a0", "loc2-a1"])
+        self.assertEqual(topology.location_of_appliance("loc1-a1"), "loc1")
+        self.assertEqual(topology.appliance("loc1-a1")["label"], "Kettle")
+        self.assertIsNone(topology.location_of("0x9"))
+        self.assertEqual(topology.sensors_of("loc9"), [])
+        self.assertEqual(client.calls, ["user", "loc1", "loc2"])
+
+    def test_typed_client(self):
+        from neurio import models
+        client = FakeClient()
+        plain_user = client.get_user_information
+        plain_appliances = client.get_appliances
+        client.get_user_information = lambda: models.UserInfo(
+            dict(plain_user(), createdAt="2016-01-01T00:00:00.000Z"))
+        client.get_appliances = lambda location_id: [
+            models.Appliance(dict(a, createdAt="2016-01-01T00:00:00.000Z"))
+            for a in plain_appliances(location_id)]
+        topology = Topology(client)
+        self.assertEqual(topology.location_of("0x2"), "loc1")
+        self.assertEqual(topology.user["createdAt"],
+                         "2016-01-01T00:00:00.000Z")
+        self.assertEqual(topology.appliance("loc1-a1")["createdAt"],
+                         "2016-01-01T00:00:00.000Z")
+
+    def test_incremental_refresh(self):
+        client = FakeClient()
+        topology = Topology(client).refresh()
+        client.calls = []
+        client.locations.append(("loc3", ["0x4"]))
+        topology.refresh()
+        # The new location, plus one known location in turn.
+        self.assertEqual(client.calls, ["user", "loc1", "loc3"])
+        client.calls = []
+        topology.refresh()
+        self.assertEqual(client.calls, ["user", "loc2"])
+        self.assertEqual(topology.location_of("0x4"), "loc3")
+        client.locations.pop(0)
+        topology.refresh()
+        self.assertIsNone(topology.location_of("0x1"))
+        self.assertIsNone(topology.location_of_appliance("loc1-a0"))
+
+    def test_errors(self):
+        client = FakeClient()
+        topology = Topology(client).refresh()
+        client.locations.append(("bad", []))
+        with self.assertRaises(ValueError):
+            topology.refresh()
+        # The previous snapshot is kept.
+        self.assertEqual(topology.location_of("0x1"), "loc1")
+        self.assertEqual(topology.refreshes, 1)
+
+    def test_background_refresh(self):
+        client = FakeClient()
+        topology = Topology(client, appliances=False).start(interval=0.01)
+        try:
+            client.locations.append(("loc3", ["0x4"]))
+            deadline = time.time() + 5
+            while topology.location_of("0x4") is None and \
+                    time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            topology.stop()
+        self.assertEqual(topology.location_of("0x4"), "loc3")
+        self.assertNotIn("loc1", client.calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Copyright 2015, 2016 Jordan Husney <jordan.husney@gmail.com>
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+sys.path.append(".")
+sys.path.append("..")
+
+import neurio
+from neurio import transport
+
+import unittest
+
+class FakeResponse(object):
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+class ScriptedTransport(transport.Transport):
+    """Replays a list of responses (or exceptions) in order."""
+    def __init__(self, script, **kwargs):
+        super(ScriptedTransport, self).__init__(backoff=0, **kwargs)
+        self.script = list(script)
+        self.sent = []
+
+    def _errors(self):
+        return (IOError,)
+
+    def _send(self, method, url, headers, data):
+        self.sent.append((method, url, headers, data))
+        result = self.script.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+class TransportTest(unittest.TestCase):
+    def test_retries_transient_status(self):
+        t = ScriptedTransport([FakeResponse(503), FakeResponse(200, [])],
+                              retries=2)
+        self.assertEqual(t.get("http://x").status_code, 200)
+        self.assertEqual(len(t.sent), 2)
+
+    def test_retries_exhausted(self):
+        t = ScriptedTransport([FakeResponse(429), FakeResponse(429)],
+                              retries=1)
+        self.assertEqual(t.get("http://x").status_code, 429)
+
+    def test_connection_error(self):
+        t = ScriptedTransport([IOError("reset"), FakeResponse(200)],
+                              retries=1)
+        self.assertEqual(t.get("http://x").status_code, 200)
+        t = ScriptedTransport([IOError("reset")])
+        with self.assertRaises(IOError):
+            t.get("http://x")
+
+    def test_no_retry_on_client_error(self):
+        t = ScriptedTransport([FakeResponse(400)], retries=3)
+        self.assertEqual(t.get("http://x").status_code, 400)
+
+    def test_get_transport(self):
+        t = ScriptedTransport([])
+        self.assertIs(transport.get_transport(t), t)
+        self.assertIsInstance(transport.get_transport(),
+                              transport.RequestsTransport)
+        with self.assertRaises(ValueError):
+            transport.get_transport("carrier-pigeon")
+
+    def test_client_uses_transport(self):
+        t = ScriptedTransport([
+            FakeResponse(200, {"access_token": "abc"}),
+            FakeResponse(200, {"status": "active"}),
+        ])
+        tp = neurio.TokenProvider(key="k", secret="s", transport=t)
+        nc = neurio.Client(token_provider=tp, transport=t)
+        self.assertEqual(nc.get_user_information(), {"status": "active"})
+        self.assertEqual(t.sent[0][0], "POST")
+        self.assertEqual(t.sent[1][2]["Authorization"], "Bearer abc")
+
+
+if __name__ == '__main__':
+    unittest.main()